@@ -12,5 +12,15 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'school_system.settings')
+# Read by the database settings: no persistent connections under ASGI (school_system/database.py).
+os.environ['DJANGO_ASGI'] = '1'
 
 application = get_asgi_application()
+
+# Import the URLconf, compile templates and prime caches before the first request (value/warmup.py).
+from django.conf import settings  # noqa: E402
+
+if settings.WARM_UP:
+    from value.warmup import warm_up
+
+    warm_up()
@@ -0,0 +1,116 @@
+"""
+Database settings for school_system.
+
+SQLite is tuned for many concurrent readers and short writes: WAL lets
+readers and the single writer proceed side by side, busy_timeout makes
+writers wait for the lock instead of failing with "database is locked",
+and IMMEDIATE transactions take the write lock up front so two writers
+cannot deadlock upgrading from a read lock. Connections are kept open
+between requests (CONN_MAX_AGE) so the pragmas run once per connection,
+except under ASGI (see conn_max_age()).
+
+Setting DB_BACKEND=postgres switches to PostgreSQL (needs psycopg 3, plus
+psycopg[pool] when DB_POOL_MAX_SIZE is set). Connection details come from the
+usual PGDATABASE / PGUSER / PGPASSWORD / PGHOST / PGPORT variables.
+Migrations and the test suite run on both; run `manage.py test value` with
+DB_BACKEND=postgres (and DB_POOL_MAX_SIZE for the pooled profile) after
+changing anything that writes SQL by hand.
+"""
+import os
+
+# Applied to every new SQLite connection, in this order.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',      # durable at checkpoints; safe with WAL
+    'busy_timeout': 5000,         # milliseconds
+    'cache_size': -20000,         # negative: KiB, i.e. ~20 MB page cache
+    'mmap_size': 134217728,       # 128 MB of the file memory-mapped
+    'temp_store': 'MEMORY',
+}
+
+CONN_MAX_AGE = 600
+
+
+def conn_max_age(environ=os.environ):
+    # school_system/asgi.py sets DJANGO_ASGI. There each request's sync code runs
+    # on a new thread and persistent connections would pile up, one per thread
+    # that has served a request, so connections are closed after every request.
+    if environ.get('DJANGO_ASGI') == '1':
+        return 0
+    return int(environ.get('DB_CONN_MAX_AGE', CONN_MAX_AGE))
+
+
+def pragma_init_command(pragmas):
+    return ';'.join(f'PRAGMA {name}={value}' for name, value in pragmas.items())
+
+
+def sqlite_database(path, pragmas=None, conn_max_age=CONN_MAX_AGE):
+    pragmas = SQLITE_PRAGMAS if pragmas is None else pragmas
+    return {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': path,
+        'CONN_MAX_AGE': conn_max_age,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'init_command': pragma_init_command(pragmas),
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': pragmas.get('busy_timeout', 5000) / 1000,
+        },
+    }
+
+
+def postgres_database(environ=os.environ):
+    pool_max = int(environ.get('DB_POOL_MAX_SIZE', 0))
+    options = {
+        # Fail fast instead of queueing behind a stuck query.
+        'options': f"-c statement_timeout={environ.get('DB_STATEMENT_TIMEOUT', 30000)}",
+    }
+    if pool_max:
+        # psycopg's pool replaces Django's persistent connections; the two
+        # can't be combined, so CONN_MAX_AGE is left at 0 below.
+        options['pool'] = {
+            'min_size': int(environ.get('DB_POOL_MIN_SIZE', 2)),
+            'max_size': pool_max,
+            'timeout': float(environ.get('DB_POOL_TIMEOUT', 10)),
+        }
+    return {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': environ.get('PGDATABASE', 'school_system'),
+        'USER': environ.get('PGUSER', ''),
+        'PASSWORD': environ.get('PGPASSWORD', ''),
+        'HOST': environ.get('PGHOST', ''),
+        'PORT': environ.get('PGPORT', ''),
+        'CONN_MAX_AGE': 0 if pool_max else conn_max_age(environ),
+        'CONN_HEALTH_CHECKS': not pool_max,
+        # .iterator() streams through server-side cursors, which only survive
+        # session pooling; set this behind PgBouncer in transaction mode.
+        'DISABLE_SERVER_SIDE_CURSORS': environ.get('DB_DISABLE_SERVER_SIDE_CURSORS', '') == '1',
+        'OPTIONS': options,
+    }
+
+
+def replica_from_env(primary, environ=os.environ):
+    """
+    Settings for a read replica of ``primary``, or None. SQLITE_REPLICA_PATH
+    points at a second SQLite file (e.g. kept in sync with litestream or
+    .backup); PGREPLICA_HOST/PGREPLICA_PORT at a PostgreSQL standby.
+    """
+    if primary['ENGINE'].endswith('sqlite3'):
+        path = environ.get('SQLITE_REPLICA_PATH')
+        replica = sqlite_database(path, conn_max_age=conn_max_age(environ)) if path else None
+    else:
+        host = environ.get('PGREPLICA_HOST')
+        replica = {**primary, 'HOST': host, 'PORT': environ.get('PGREPLICA_PORT', primary['PORT'])} if host else None
+    if replica is not None:
+        # Tests run against the primary's test database only.
+        replica['TEST'] = {'MIRROR': 'default'}
+    return replica
+
+
+def database_from_env(sqlite_path, environ=os.environ):
+    backend = environ.get('DB_BACKEND', 'sqlite')
+    if backend == 'postgres':
+        return postgres_database(environ)
+    if backend == 'sqlite':
+        return sqlite_database(environ.get('SQLITE_PATH', sqlite_path), conn_max_age=conn_max_age(environ))
+    raise ValueError(f"Unknown DB_BACKEND {backend!r}; use 'sqlite' or 'postgres'.")
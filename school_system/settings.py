@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from .database import database_from_env, replica_from_env
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -41,11 +44,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'value.middleware.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'value.middleware.ReplicaPinningMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'value.middleware.PrincipalMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -56,8 +62,14 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # Compiled templates are kept in memory; in DEBUG runserver reloads them on change.
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug', # Added this line
                 'django.template.context_processors.request',
@@ -74,12 +86,50 @@ WSGI_APPLICATION = 'school_system.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# DB_BACKEND=sqlite (default) or postgres; see school_system/database.py for the
+# SQLite pragmas and the PostgreSQL environment variables.
+
 DATABASES = {
+    'default': database_from_env(BASE_DIR / 'db.sqlite3'),
+}
+
+# Optional read replica for the dashboard list views (value/routers.py).
+DATABASE_ROUTERS = ['value.routers.PrimaryReplicaRouter']
+REPLICA_DATABASE = None
+REPLICA_PIN_SECONDS = 5
+
+_replica = replica_from_env(DATABASES['default'])
+if _replica is not None:
+    DATABASES['replica'] = _replica
+    REPLICA_DATABASE = 'replica'
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Holds template fragments and the per-table data versions (value/versions.py).
+# Set REDIS_URL (needs the redis package) when running several worker processes:
+# with the per-process default, the API and calendar feed send no ETags.
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'school-system',
     }
 }
+if os.environ.get('REDIS_URL'):
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ['REDIS_URL'],
+    }
+
+
+# Sessions & authentication
+# Sessions are read from the cache and written through to the database;
+# request.user is cached too (value/backends.py).
+
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+AUTHENTICATION_BACKENDS = ['value.backends.CachedModelBackend']
 
 
 # Password validation
@@ -125,3 +175,54 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # ...existing code...
 AUTH_USER_MODEL = 'value.User'
 # ...existing code...
+
+# Audit log (value/audit.py): CriticalHistory entries are queued in-process and
+# written in batches by a background thread. ON_FULL: 'sync', 'drop' or 'block'.
+AUDIT_LOG = {
+    'ASYNC': True,
+    'QUEUE_SIZE': 10000,
+    'BATCH_SIZE': 500,
+    'FLUSH_INTERVAL': 1.0,
+    'ON_FULL': 'sync',
+}
+
+# Default lifetime, in seconds, of value.Temporary rows (see value/temporary.py).
+TEMPORARY_TTL = 24 * 60 * 60
+
+# Background task queue (see value/tasks.py); jobs run in `manage.py run_tasks`.
+TASK_QUEUE = {
+    'EAGER': False,
+    'HEARTBEAT': 30,
+    'STALE_AFTER': 600,
+}
+
+# Report cards (value/reportcards.py): archives built by the build_report_cards
+# task are written to DIR. WORKERS render processes; None means one per CPU.
+# FONT and BOLD_FONT are TrueType files for names outside Windows-1252, e.g.
+# /usr/share/fonts/truetype/dejavu/DejaVuSans.ttf; without them such cards fail.
+REPORT_CARDS = {
+    'DIR': BASE_DIR / 'report_cards',
+    'WORKERS': None,
+    'FONT': os.environ.get('REPORT_CARD_FONT'),
+    'BOLD_FONT': os.environ.get('REPORT_CARD_BOLD_FONT'),
+}
+
+# Academic years start on the 1st of this month (value/archive.py).
+ACADEMIC_YEAR_START_MONTH = 9
+
+# Request profiling (value/profiling.py): requests to the views named in
+# URL_NAMES, or carrying a signed ?_profile= link from /profiles/, are
+# profiled into DIR. MODE 'sample' (speedscope + collapsed stacks) or 'cprofile'.
+PROFILING = {
+    'URL_NAMES': [],
+    'DIR': BASE_DIR / 'profiles',
+    'MODE': 'sample',
+    'INTERVAL': 0.001,
+    'KEEP': 100,
+    'TOKEN_MAX_AGE': 15 * 60,
+}
+
+# Warm-up when a WSGI/ASGI worker starts (value/warmup.py): load the URLconf,
+# compile templates and prime caches before the first request. WARM_UP=0 in
+# the environment turns it off.
+WARM_UP = os.environ.get('WARM_UP', '1') != '0'
@@ -14,3 +14,11 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'school_system.settings')
 
 application = get_wsgi_application()
+
+# Import the URLconf, compile templates and prime caches before the first request (value/warmup.py).
+from django.conf import settings  # noqa: E402
+
+if settings.WARM_UP:
+    from value.warmup import warm_up
+
+    warm_up()
@@ -0,0 +1,32 @@
+#!/bin/sh
+# Start a throwaway PostgreSQL server for running the benchmarks against
+# PostgreSQL, e.g.:
+#
+#   eval "$(scripts/local_postgres.sh start)"
+#   python manage.py migrate
+#   python manage.py bench_concurrency
+#   scripts/local_postgres.sh stop
+#
+# Needs initdb/pg_ctl on PATH. Data lives in $PGDATA_DIR (default /tmp/school_system_pg).
+set -e
+
+PGDATA_DIR=${PGDATA_DIR:-/tmp/school_system_pg}
+PGPORT=${PGPORT:-54329}
+
+case "$1" in
+start)
+    if [ ! -f "$PGDATA_DIR/PG_VERSION" ]; then
+        initdb -D "$PGDATA_DIR" -U postgres --auth=trust >/dev/null
+    fi
+    pg_ctl -D "$PGDATA_DIR" -o "-p $PGPORT -k /tmp -c fsync=off" -l "$PGDATA_DIR/server.log" -w start >/dev/null
+    createdb -h /tmp -p "$PGPORT" -U postgres school_system 2>/dev/null || true
+    echo "export DB_BACKEND=postgres PGHOST=/tmp PGPORT=$PGPORT PGUSER=postgres PGDATABASE=school_system"
+    ;;
+stop)
+    pg_ctl -D "$PGDATA_DIR" -m fast stop
+    ;;
+*)
+    echo "usage: $0 start|stop" >&2
+    exit 1
+    ;;
+esac
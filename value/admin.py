@@ -1,37 +1,438 @@
+from datetime import datetime
+from functools import cached_property
+
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections, transaction
+from django.utils import timezone
+
+from . import audit
+from .archive import date_range, year_bounds, year_start
 from .models import *
 
-admin.site.register(User)
-admin.site.register(Classroom)
-admin.site.register(Subject)
-admin.site.register(Teacher)
-admin.site.register(Student)
-admin.site.register(Parent)
-admin.site.register(TeacherAttendance)
-admin.site.register(StudentAttendance)
-admin.site.register(TeacherSalary)
-admin.site.register(TeacherSalaryHistory)
-admin.site.register(Exam)
-admin.site.register(StudentExam)
-admin.site.register(ExamGrade)
-admin.site.register(ExamTimetable)
-admin.site.register(StudentGrade)
-admin.site.register(EventCategory)
-admin.site.register(EventCategoryType)
-admin.site.register(Event)
-admin.site.register(StudentPayment)
-admin.site.register(StudentPaymentHistory)
-admin.site.register(PaymentNotifications)
-admin.site.register(Chat)
-admin.site.register(GroupMessage)
-admin.site.register(MyFriends)
-admin.site.register(MainNotification)
-admin.site.register(NotificationHistory)
-admin.site.register(OnlineChat)
-admin.site.register(CriticalHistory)
-admin.site.register(Temporary)
-admin.site.register(SubjectRoutine)
-admin.site.register(PettyCash)
-admin.site.register(PettyCashHistory)
-admin.site.register(Grade)
-admin.site.register(Timetable)
\ No newline at end of file
+
+class EstimatedCountPaginator(Paginator):
+    # On PostgreSQL an unfiltered COUNT(*) scans the whole table; the planner's
+    # row estimate is good enough for page links. SQLite counts from the
+    # smallest index, which is fast, so it keeps the exact count.
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor == 'postgresql' and not queryset.query.where:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT reltuples FROM pg_class WHERE relname = %s', [queryset.model._meta.db_table])
+                row = cursor.fetchone()
+            if row and row[0] > 10000:
+                return int(row[0])
+        return super().count
+
+
+def academic_year_filter(field):
+    """
+    List filter by academic year on a date(time) ``field``, for tables too big
+    for date_hierarchy: its year list is a SELECT DISTINCT over every row,
+    while this reads the two ends of the index on ``field``.
+    """
+    class AcademicYearFilter(admin.SimpleListFilter):
+        title = 'academic year'
+        parameter_name = 'academic_year'
+
+        def lookups(self, request, model_admin):
+            rows = model_admin.get_queryset(request)
+            ends = [rows.order_by(order).values_list(field, flat=True).first() for order in (field, f'-{field}')]
+            if ends[0] is None:
+                return []
+            first, last = (timezone.localtime(day).date() if isinstance(day, datetime) else day for day in ends)
+            years = range(year_start(last).year, year_start(first).year - 1, -1)
+            return [(str(year), f'{year}/{str(year + 1)[-2:]}') for year in years]
+
+        def queryset(self, request, queryset):
+            if not (self.value() or '').isdigit():
+                return queryset
+            return queryset.filter(**date_range(queryset.model, field, *year_bounds(int(self.value()))))
+
+    return AcademicYearFilter
+
+
+class BaseAdmin(admin.ModelAdmin):
+    # Don't count the whole table again on every page just to show "of N total".
+    show_full_result_count = False
+    list_per_page = 50
+
+
+class LargeTableAdmin(BaseAdmin):
+    # Tables that grow by the day (attendance, marks, chat, payments, logs).
+    paginator = EstimatedCountPaginator
+
+
+class AuditedAdminMixin:
+    """Write add_/edit_/delete_<audit_name> entries to the audit log (value/audit.py)."""
+    audit_name = None
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        action = 'edit' if change else 'add'
+        audit.log(f'{action}_{self.audit_name}', actor=request.user, obj=obj, diff=audit.form_diff(form) if change else None)
+
+    def delete_model(self, request, obj):
+        # The delete view runs in a transaction; the entry is written if it commits.
+        audit.log(f'delete_{self.audit_name}', actor=request.user, obj=obj)
+        super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic(using=queryset.db):
+            for obj in queryset:
+                audit.log(f'delete_{self.audit_name}', actor=request.user, obj=obj)
+            super().delete_queryset(request, queryset)
+
+
+# --- People and classes ---
+
+@admin.register(User)
+class UserAdmin(BaseAdmin):
+    list_display = ('username', 'first_name', 'last_name', 'role', 'is_staff', 'is_active')
+    list_filter = ('role', 'is_staff', 'is_active')
+    search_fields = ('username', 'first_name', 'last_name', 'email')
+    ordering = ('username',)
+
+
+@admin.register(Classroom)
+class ClassroomAdmin(BaseAdmin):
+    list_display = ('name', 'enrolled_count', 'capacity', 'fee')
+    readonly_fields = ('enrolled_count',)  # set through value.enrollment
+    search_fields = ('name',)
+    ordering = ('name',)
+
+
+@admin.register(Subject)
+class SubjectAdmin(BaseAdmin):
+    search_fields = ('name',)
+    ordering = ('name',)
+
+
+@admin.register(Teacher)
+class TeacherAdmin(BaseAdmin):
+    list_display = ('__str__', 'Grade', 'base_salary')
+    list_select_related = ('user',)
+    autocomplete_fields = ('user', 'subjects', 'classes')
+    search_fields = ('user__username', 'user__first_name', 'user__last_name')
+
+
+@admin.register(Student)
+class StudentAdmin(BaseAdmin):
+    list_display = ('__str__', 'student_class')
+    list_select_related = ('user', 'student_class')
+    list_filter = ('student_class',)
+    # The class is changed through value.enrollment, which keeps the counts right.
+    readonly_fields = ('student_class',)
+    autocomplete_fields = ('user',)
+    search_fields = ('user__username', 'user__first_name', 'user__last_name')
+
+
+@admin.register(Parent)
+class ParentAdmin(BaseAdmin):
+    list_select_related = ('user',)
+    autocomplete_fields = ('user', 'students')
+    search_fields = ('user__username', 'user__first_name', 'user__last_name')
+
+
+# --- Attendance and salary ---
+
+@admin.register(TeacherAttendance)
+class TeacherAttendanceAdmin(LargeTableAdmin):
+    list_display = ('teacher', 'date', 'present')
+    list_select_related = ('teacher__user',)
+    list_filter = (academic_year_filter('date'),)
+    autocomplete_fields = ('teacher',)
+
+
+@admin.register(StudentAttendance)
+class StudentAttendanceAdmin(LargeTableAdmin):
+    list_display = ('student', 'date', 'present')
+    list_select_related = ('student__user',)
+    list_filter = (academic_year_filter('date'),)
+    autocomplete_fields = ('student',)
+
+
+@admin.register(PayrollRun)
+class PayrollRunAdmin(BaseAdmin):
+    list_display = ('__str__', 'working_days', 'teacher_count', 'total', 'run_at')
+
+
+@admin.register(TeacherSalary)
+class TeacherSalaryAdmin(LargeTableAdmin):
+    list_display = ('teacher', 'amount', 'date', 'payroll_run')
+    list_select_related = ('teacher__user', 'payroll_run')
+    list_filter = ('payroll_run',)
+    autocomplete_fields = ('teacher',)
+    raw_id_fields = ('payroll_run',)
+
+
+@admin.register(TeacherSalaryHistory)
+class TeacherSalaryHistoryAdmin(LargeTableAdmin):
+    list_display = ('teacher_salary_id', 'old_amount', 'new_amount', 'changed_at')
+    raw_id_fields = ('teacher_salary',)
+
+
+# --- Exams ---
+
+@admin.register(Exam)
+class ExamAdmin(BaseAdmin):
+    list_display = ('name', 'date')
+    date_hierarchy = 'date'
+    search_fields = ('name',)
+
+
+@admin.register(StudentExam)
+class StudentExamAdmin(LargeTableAdmin):
+    list_display = ('student', 'exam', 'marks')
+    list_select_related = ('student__user', 'exam')
+    list_filter = ('exam',)
+    autocomplete_fields = ('student', 'exam')
+
+
+@admin.register(ExamGrade)
+class ExamGradeAdmin(BaseAdmin):
+    list_display = ('exam', 'grade')
+    list_select_related = ('exam',)
+    autocomplete_fields = ('exam',)
+
+
+@admin.register(ExamTimetable)
+class ExamTimetableAdmin(BaseAdmin):
+    list_display = ('exam', 'notes')
+    list_select_related = ('exam',)
+    autocomplete_fields = ('exam',)
+
+
+@admin.register(StudentGrade)
+class StudentGradeAdmin(LargeTableAdmin):
+    list_display = ('student_exam_id', 'grade')
+    raw_id_fields = ('student_exam',)
+
+
+# --- Events ---
+
+@admin.register(EventCategory)
+class EventCategoryAdmin(BaseAdmin):
+    search_fields = ('name',)
+
+
+@admin.register(EventCategoryType)
+class EventCategoryTypeAdmin(BaseAdmin):
+    list_display = ('name', 'category')
+    list_select_related = ('category',)
+    autocomplete_fields = ('category',)
+
+
+@admin.register(Event)
+class EventAdmin(BaseAdmin):
+    list_display = ('title', 'date')
+    date_hierarchy = 'date'
+    search_fields = ('title',)
+
+
+# --- Payments ---
+
+@admin.register(StudentPayment)
+class StudentPaymentAdmin(AuditedAdminMixin, LargeTableAdmin):
+    audit_name = 'payment'
+    list_display = ('student', 'amount', 'date')
+    list_select_related = ('student__user',)
+    list_filter = (academic_year_filter('date'),)
+    autocomplete_fields = ('student',)
+
+
+@admin.register(StudentPaymentHistory)
+class StudentPaymentHistoryAdmin(LargeTableAdmin):
+    list_display = ('payment_id', 'old_amount', 'new_amount', 'changed_at')
+    raw_id_fields = ('payment',)
+
+
+@admin.register(PaymentNotifications)
+class PaymentNotificationsAdmin(LargeTableAdmin):
+    list_display = ('payment_id', 'approved_by', 'approved_at')
+    list_select_related = ('approved_by',)
+    raw_id_fields = ('payment',)
+    autocomplete_fields = ('approved_by',)
+
+
+# --- Chat and notifications ---
+
+@admin.register(Chat)
+class ChatAdmin(LargeTableAdmin):
+    list_display = ('sender', 'receiver', 'sent_at')
+    list_select_related = ('sender', 'receiver')
+    list_filter = (academic_year_filter('sent_at'),)
+    autocomplete_fields = ('sender', 'receiver')
+
+
+@admin.register(GroupMessage)
+class GroupMessageAdmin(LargeTableAdmin):
+    list_display = ('sender', 'sent_at')
+    list_select_related = ('sender',)
+    list_filter = (academic_year_filter('sent_at'),)
+    autocomplete_fields = ('sender',)
+
+
+@admin.register(MyFriends)
+class MyFriendsAdmin(LargeTableAdmin):
+    list_display = ('user', 'friend')
+    list_select_related = ('user', 'friend')
+    autocomplete_fields = ('user', 'friend')
+
+
+@admin.register(MainNotification)
+class MainNotificationAdmin(BaseAdmin):
+    list_display = ('title', 'created_at')
+    search_fields = ('title',)
+
+
+@admin.register(NotificationHistory)
+class NotificationHistoryAdmin(LargeTableAdmin):
+    list_display = ('user', 'notification', 'read_at')
+    list_select_related = ('user', 'notification')
+    autocomplete_fields = ('user', 'notification')
+
+
+@admin.register(OnlineChat)
+class OnlineChatAdmin(BaseAdmin):
+    list_display = ('user', 'is_online')
+    list_select_related = ('user',)
+    autocomplete_fields = ('user',)
+
+
+# --- System ---
+
+@admin.register(CriticalHistory)
+class CriticalHistoryAdmin(LargeTableAdmin):
+    list_display = ('created_at', 'action', 'actor', 'object_type', 'object_repr')
+    list_select_related = ('actor',)
+    list_filter = ('action', academic_year_filter('created_at'))
+    raw_id_fields = ('actor',)
+
+
+@admin.register(Temporary)
+class TemporaryAdmin(LargeTableAdmin):
+    list_display = ('pk', 'created_at', 'expires_at')
+
+
+@admin.register(Task)
+class TaskAdmin(BaseAdmin):
+    list_display = ('__str__', 'status', 'priority', 'progress', 'run_after', 'finished_at')
+    list_filter = ('status',)
+    raw_id_fields = ('created_by',)
+
+
+# --- Timetables ---
+
+@admin.register(SubjectRoutine)
+class SubjectRoutineAdmin(BaseAdmin):
+    list_display = ('subject', 'teacher', 'student_class', 'day_of_week', 'start_time', 'end_time')
+    list_select_related = ('subject', 'teacher__user', 'student_class')
+    autocomplete_fields = ('subject', 'teacher', 'student_class')
+
+
+@admin.register(Timetable)
+class TimetableAdmin(BaseAdmin):
+    list_display = ('class_name', 'subject', 'teacher', 'day_of_week', 'start_time', 'end_time')
+    list_select_related = ('class_name', 'subject', 'teacher__user')
+    list_filter = ('class_name',)
+    autocomplete_fields = ('class_name', 'subject', 'teacher')
+
+
+@admin.register(Grade)
+class GradeAdmin(BaseAdmin):
+    search_fields = ('name',)
+
+
+# --- Petty cash ---
+
+@admin.register(PettyCash)
+class PettyCashAdmin(LargeTableAdmin):
+    list_display = ('date', 'amount', 'category', 'description')
+    list_filter = (academic_year_filter('date'),)
+
+
+@admin.register(PettyCashHistory)
+class PettyCashHistoryAdmin(LargeTableAdmin):
+    list_display = ('pettyCash_id', 'old_amount', 'new_amount', 'changed_at')
+    raw_id_fields = ('pettyCash',)
+
+
+@admin.register(PettyCashPeriod)
+class PettyCashPeriodAdmin(BaseAdmin):
+    list_display = ('__str__', 'opening_balance', 'closing_balance', 'closed_at')
+
+
+@admin.register(PettyCashPeriodCategory)
+class PettyCashPeriodCategoryAdmin(BaseAdmin):
+    list_display = ('period', 'category', 'total_in', 'total_out', 'entries')
+    list_select_related = ('period',)
+    raw_id_fields = ('period',)
+
+
+# --- Archive ---
+
+class ArchiveAdmin(LargeTableAdmin):
+    # Archived years can be browsed but not changed (see value.archive).
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(AcademicYear)
+class AcademicYearAdmin(ArchiveAdmin):
+    list_display = ('__str__', 'start', 'end', 'archived_at')
+
+
+@admin.register(ArchivedStudentAttendance)
+class ArchivedStudentAttendanceAdmin(ArchiveAdmin):
+    list_display = ('student', 'date', 'present')
+    list_select_related = ('student__user',)
+    list_filter = (academic_year_filter('date'),)
+
+
+@admin.register(ArchivedTeacherAttendance)
+class ArchivedTeacherAttendanceAdmin(ArchiveAdmin):
+    list_display = ('teacher', 'date', 'present')
+    list_select_related = ('teacher__user',)
+    list_filter = (academic_year_filter('date'),)
+
+
+@admin.register(ArchivedStudentPayment)
+class ArchivedStudentPaymentAdmin(ArchiveAdmin):
+    list_display = ('student', 'amount', 'date')
+    list_select_related = ('student__user',)
+    list_filter = (academic_year_filter('date'),)
+
+
+@admin.register(ArchivedStudentPaymentHistory)
+class ArchivedStudentPaymentHistoryAdmin(ArchiveAdmin):
+    list_display = ('payment_id', 'old_amount', 'new_amount', 'changed_at')
+
+
+@admin.register(ArchivedPaymentNotifications)
+class ArchivedPaymentNotificationsAdmin(ArchiveAdmin):
+    list_display = ('payment_id', 'approved_by', 'approved_at')
+    list_select_related = ('approved_by',)
+
+
+@admin.register(ArchivedChat)
+class ArchivedChatAdmin(ArchiveAdmin):
+    list_display = ('sender', 'receiver', 'sent_at')
+    list_select_related = ('sender', 'receiver')
+    list_filter = (academic_year_filter('sent_at'),)
+
+
+@admin.register(ArchivedGroupMessage)
+class ArchivedGroupMessageAdmin(ArchiveAdmin):
+    list_display = ('sender', 'sent_at')
+    list_select_related = ('sender',)
+    list_filter = (academic_year_filter('sent_at'),)
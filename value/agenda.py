@@ -0,0 +1,142 @@
+"""
+School calendar: events, exams and exam timetables as one date-ordered stream.
+
+between() runs one indexed date-range query per source and merges the
+already sorted results, so "what happens this week" never loads the whole
+tables. feed() renders the same stream as an iCalendar (.ics) document for
+calendar clients, which subscribe through a signed per-role URL since they
+carry no session.
+"""
+import heapq
+from collections import namedtuple
+from datetime import timedelta
+
+from django.core import signing
+
+from .models import Event, Exam, ExamTimetable
+
+Item = namedtuple('Item', 'date kind id title description')
+
+SOURCES = {
+    'event': lambda start, end: (
+        Event.objects.filter(date__gte=start, date__lt=end)
+        .order_by('date', 'id')
+        .values_list('date', 'id', 'title', 'description')
+    ),
+    'exam': lambda start, end: (
+        Exam.objects.filter(date__gte=start, date__lt=end)
+        .order_by('date', 'id')
+        .values_list('date', 'id', 'name')
+    ),
+    'exam_timetable': lambda start, end: (
+        ExamTimetable.objects.filter(exam__date__gte=start, exam__date__lt=end)
+        .order_by('exam__date', 'id')
+        .values_list('exam__date', 'id', 'exam__name', 'notes')
+    ),
+}
+
+# Which sources each role's feed includes; staff get every source.
+ROLE_KINDS = {
+    'admin': ('event', 'exam', 'exam_timetable'),
+    'teacher': ('event', 'exam', 'exam_timetable'),
+    'student': ('event', 'exam', 'exam_timetable'),
+    'parent': ('event', 'exam'),
+}
+TABLES = (Event, Exam, ExamTimetable)
+
+FEED_SALT = 'value.agenda.feed'
+UID_DOMAIN = 'school-management-system'
+FEED_PAST_DAYS = 30
+FEED_FUTURE_DAYS = 365
+
+
+def _items(kind, rows):
+    for row in rows:
+        if kind == 'exam':
+            day, pk, name = row
+            yield Item(day, kind, pk, name, '')
+        elif kind == 'exam_timetable':
+            day, pk, name, notes = row
+            yield Item(day, kind, pk, f'{name} timetable', notes)
+        else:
+            yield Item(row[0], kind, *row[1:])
+
+
+def between(start, end, kinds=None):
+    """Items dated ``start`` <= date < ``end``, in date order."""
+    kinds = kinds or SOURCES
+    streams = [_items(kind, SOURCES[kind](start, end)) for kind in kinds]
+    return heapq.merge(*streams, key=lambda item: (item.date, item.kind, item.id))
+
+
+def role_for(user):
+    if user.is_superuser or user.is_staff:
+        return 'admin'
+    return user.role if user.role in ROLE_KINDS else None
+
+
+def feed_token(role):
+    return signing.Signer(salt=FEED_SALT).sign(role)
+
+
+def role_from_token(token):
+    """The role a feed token was issued for, or None if it was tampered with."""
+    try:
+        role = signing.Signer(salt=FEED_SALT).unsign(token)
+    except signing.BadSignature:
+        return None
+    return role if role in ROLE_KINDS else None
+
+
+def feed_window(today):
+    return today - timedelta(days=FEED_PAST_DAYS), today + timedelta(days=FEED_FUTURE_DAYS)
+
+
+# --- iCalendar (RFC 5545) ---
+
+def _escape(text):
+    return (
+        text.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+        .replace('\r\n', '\\n').replace('\n', '\\n')
+    )
+
+
+def _fold(line):
+    """Split a content line into 75-octet pieces, continuation lines starting with a space."""
+    data = line.encode('utf-8')
+    if len(data) <= 75:
+        return line
+    parts, limit = [], 75
+    while data:
+        cut = min(limit, len(data))
+        while cut < len(data) and (data[cut] & 0xC0) == 0x80:  # don't split a UTF-8 sequence
+            cut -= 1
+        parts.append(data[:cut].decode('utf-8'))
+        data, limit = data[cut:], 74
+    return '\r\n '.join(parts)
+
+
+def feed(items, stamp):
+    """An iCalendar document for ``items``; ``stamp`` is the DTSTAMP of every entry."""
+    dtstamp = stamp.strftime('%Y%m%dT%H%M%SZ')
+    lines = [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        'PRODID:-//School Management System//Calendar//EN',
+        'CALSCALE:GREGORIAN',
+        'X-WR-CALNAME:School calendar',
+    ]
+    for item in items:
+        lines += [
+            'BEGIN:VEVENT',
+            f'UID:{item.kind}-{item.id}@{UID_DOMAIN}',
+            f'DTSTAMP:{dtstamp}',
+            f'DTSTART;VALUE=DATE:{item.date:%Y%m%d}',
+            f'DTEND;VALUE=DATE:{item.date + timedelta(days=1):%Y%m%d}',
+            f'SUMMARY:{_escape(item.title)}',
+        ]
+        if item.description:
+            lines.append(f'DESCRIPTION:{_escape(item.description)}')
+        lines += [f'CATEGORIES:{item.kind.upper()}', 'END:VEVENT']
+    lines.append('END:VCALENDAR')
+    return ''.join(_fold(line) + '\r\n' for line in lines)
@@ -0,0 +1,184 @@
+"""
+Read-only JSON API over the dashboard data.
+
+    GET /api/<resource>/?fields=id,name&after=<id>&limit=50
+    GET /api/<resource>/<id>/?fields=...
+
+Each resource lists the fields a client may ask for and the ORM path each one
+reads, so ?fields= becomes a values() query over just those columns. Lists
+are paginated by primary key (keyset: "after" is the last id of the previous
+page), which costs the same on page 1000 as on page 1.
+
+Responses carry an ETag and Last-Modified built from the version counters of
+the tables a resource reads (see value.versions); a client that sends them
+back gets a 304 without a single query being run. The ETag also covers the
+object id, the query string and the user, so pages, field selections and
+scoped results never share one. Neither is sent when the counters live in a
+per-process cache, where each worker would hand out its own; only then are
+rows read from the replica (value.routers), whose lag an ETag would hide.
+"""
+import hashlib
+from functools import wraps
+from urllib.parse import urlencode
+
+from django.db.models import Q
+from django.http import Http404, JsonResponse
+from django.views.decorators.http import condition, require_GET
+
+from .models import Chat, Classroom, Event, Exam, Student, StudentPayment, Teacher, User
+from .routers import use_replica
+from .versions import get_version, last_modified, shared
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+
+class Resource:
+    def __init__(self, model, fields, default=None, tables=(), roles=(), scope=None):
+        self.model = model
+        self.fields = fields  # public name -> ORM path
+        self.default = default or list(fields)
+        self.tables = (model, *tables)  # every table the fields read from
+        self.roles = roles
+        self.scope = scope
+
+    def queryset(self, request):
+        queryset = self.model.objects.all()
+        if self.scope and not request.principal.is_admin:
+            queryset = self.scope(queryset, request.user)
+        return queryset
+
+
+RESOURCES = {
+    'students': Resource(
+        Student,
+        {'id': 'id', 'username': 'user__username', 'first_name': 'user__first_name',
+         'last_name': 'user__last_name', 'email': 'user__email',
+         'classroom': 'student_class_id', 'classroom_name': 'student_class__name'},
+        default=['id', 'username', 'first_name', 'last_name', 'classroom'],
+        tables=(User, Classroom),
+    ),
+    'teachers': Resource(
+        Teacher,
+        {'id': 'id', 'username': 'user__username', 'first_name': 'user__first_name',
+         'last_name': 'user__last_name', 'email': 'user__email', 'grade': 'Grade'},
+        tables=(User,),
+    ),
+    'classrooms': Resource(Classroom, {'id': 'id', 'name': 'name', 'capacity': 'capacity', 'enrolled': 'enrolled_count'}),
+    'payments': Resource(
+        StudentPayment,
+        {'id': 'id', 'student': 'student_id', 'student_username': 'student__user__username',
+         'amount': 'amount', 'date': 'date'},
+        default=['id', 'student', 'amount', 'date'],
+        tables=(Student, User),
+    ),
+    'exams': Resource(Exam, {'id': 'id', 'name': 'name', 'date': 'date'}),
+    'events': Resource(Event, {'id': 'id', 'title': 'title', 'date': 'date', 'description': 'description'}),
+    'chats': Resource(
+        Chat,
+        {'id': 'id', 'sender': 'sender_id', 'receiver': 'receiver_id', 'message': 'message', 'sent_at': 'sent_at'},
+        tables=(User,),  # chats are deleted by cascade from their users (see value.versions)
+        roles=('teacher', 'student', 'parent'),
+        scope=lambda queryset, user: queryset.filter(Q(sender=user) | Q(receiver=user)),
+    ),
+}
+
+
+def get_resource(name):
+    try:
+        return RESOURCES[name]
+    except KeyError:
+        raise Http404(f"Unknown resource: {name}")
+
+
+def resource_etag(request, resource, pk=None):
+    if not shared():
+        return None
+    # Per user as well, since scoped resources differ between users.
+    query = urlencode(sorted(request.GET.lists()), doseq=True)
+    key = f'{resource}:{pk}:{query}:{request.user.pk}:{get_version(*get_resource(resource).tables)}'
+    return hashlib.md5(key.encode(), usedforsecurity=False).hexdigest()
+
+
+def resource_last_modified(request, resource, pk=None):
+    if not shared():
+        return None
+    return last_modified(*get_resource(resource).tables)
+
+
+def selected_fields(request, resource):
+    """Public name -> ORM path for ?fields=, or None if it names an unknown field."""
+    names = request.GET.get('fields')
+    names = [name.strip() for name in names.split(',') if name.strip()] if names else resource.default
+    if any(name not in resource.fields for name in names):
+        return None
+    return {name: resource.fields[name] for name in names}
+
+
+def bad_request(message):
+    return JsonResponse({'error': message}, status=400)
+
+
+def _rows(queryset, fields):
+    for row in queryset.values_list(*fields.values()):
+        yield dict(zip(fields, row))
+
+
+def api_view(view):
+    """
+    Role check against the resource, then either conditional GET or replica
+    reads: a body read from a lagging replica must not get the ETag of the
+    current version, so with validators (a shared cache) reads stay on the primary.
+    """
+    conditional = condition(etag_func=resource_etag, last_modified_func=resource_last_modified)(view)
+    replica = use_replica(view)
+
+    @require_GET
+    @wraps(view)
+    def wrapper(request, resource, *args, **kwargs):
+        # API clients get a 403 rather than the HTML views' login/home redirects.
+        if not request.principal.has_role(*get_resource(resource).roles):
+            return JsonResponse({'error': "You do not have permission to access this resource."}, status=403)
+        handler = conditional if shared() else replica
+        return handler(request, resource, *args, **kwargs)
+    return wrapper
+
+
+@api_view
+def resource_list(request, resource):
+    resource = get_resource(resource)
+    fields = selected_fields(request, resource)
+    if fields is None:
+        return bad_request(f"Unknown field; choose from: {', '.join(resource.fields)}")
+    try:
+        limit = min(int(request.GET.get('limit', DEFAULT_LIMIT)), MAX_LIMIT)
+        after = int(request.GET.get('after', 0))
+    except ValueError:
+        return bad_request("'limit' and 'after' must be integers.")
+    if limit < 1:
+        return bad_request("'limit' must be at least 1.")
+
+    queryset = resource.queryset(request).filter(pk__gt=after).order_by('pk')
+    select = {**fields, '_pk': 'pk'}
+    results = list(_rows(queryset[:limit + 1], select))
+    next_url = None
+    if len(results) > limit:
+        results = results[:limit]
+        query = request.GET.copy()
+        query['after'] = results[-1]['_pk']
+        next_url = f'{request.path}?{query.urlencode()}'
+    for row in results:
+        del row['_pk']
+    return JsonResponse({'results': results, 'next': next_url})
+
+
+@api_view
+def resource_detail(request, resource, pk):
+    resource = get_resource(resource)
+    fields = selected_fields(request, resource)
+    if fields is None:
+        return bad_request(f"Unknown field; choose from: {', '.join(resource.fields)}")
+    row = next(_rows(resource.queryset(request).filter(pk=pk), fields), None)
+    if row is None:
+        raise Http404("No such object.")
+    return JsonResponse(row)
@@ -1,6 +1,18 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class ValueConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'value'
+
+    def ready(self):
+        from . import backends, enrollment, pettycash, tasks, versions  # noqa: F401 (tasks registers the built-in tasks)
+        from .history import reinstall_triggers
+        from .search import reinstall_search
+        post_migrate.connect(reinstall_triggers, sender=self)
+        post_migrate.connect(reinstall_search, sender=self)
+        versions.connect_signals()
+        backends.connect_signals()
+        enrollment.connect_signals()
+        pettycash.connect_signals()
@@ -0,0 +1,183 @@
+"""
+Academic-year archive for the tables that grow every year.
+
+archive_years() moves the attendance, payment and chat rows of closed
+academic years into the Archived* tables. They stay in the same database and
+keep their ids. Rows move in batches, each in its own short transaction, as
+in value.temporary.purge_expired(). Afterwards the live tables hold only the
+open year, so their lists and aggregates stay the size of one year.
+
+records() is the year-scoped read API. It returns a queryset over whichever
+table holds that year, so callers don't need to know whether the year has
+been archived; rows entered late for an archived year are included until
+they are moved. Querysets over archived years are read-only.
+
+Payments take their approvals (PaymentNotifications) and amount history
+with them, into tables of their own. Archived chat messages drop out of full-text search (value.search),
+which only indexes the live tables.
+"""
+from collections import namedtuple
+from datetime import date, datetime, time
+
+from django.conf import settings
+from django.db import connection, models, transaction
+from django.utils import timezone
+
+from .models import (
+    AcademicYear, ArchivedChat, ArchivedGroupMessage, ArchivedPaymentNotifications, ArchivedStudentAttendance,
+    ArchivedStudentPayment, ArchivedStudentPaymentHistory, ArchivedTeacherAttendance, Chat, GroupMessage, PaymentNotifications,
+    StudentAttendance, StudentPayment, StudentPaymentHistory, TeacherAttendance,
+)
+from .versions import bump
+
+# dependents: (live model, archive model, FK column) rows referencing the
+# archived ones, moved along with them.
+Archive = namedtuple('Archive', 'model archive date_field dependents', defaults=((),))
+
+ARCHIVES = [
+    Archive(StudentAttendance, ArchivedStudentAttendance, 'date'),
+    Archive(TeacherAttendance, ArchivedTeacherAttendance, 'date'),
+    Archive(
+        StudentPayment, ArchivedStudentPayment, 'date',
+        dependents=[
+            (StudentPaymentHistory, ArchivedStudentPaymentHistory, 'payment_id'),
+            (PaymentNotifications, ArchivedPaymentNotifications, 'payment_id'),
+        ],
+    ),
+    Archive(Chat, ArchivedChat, 'sent_at'),
+    Archive(GroupMessage, ArchivedGroupMessage, 'sent_at'),
+]
+BY_MODEL = {archive.model: archive for archive in ARCHIVES}
+
+
+def year_start(day):
+    """First day of the academic year ``day`` falls in."""
+    month = settings.ACADEMIC_YEAR_START_MONTH
+    return date(day.year if day.month >= month else day.year - 1, month, 1)
+
+
+def year_bounds(year):
+    """(start, end) of an academic year given as its start year, a date in it or an AcademicYear; end is exclusive."""
+    if isinstance(year, AcademicYear):
+        return year.start, year.end
+    start = year_start(year) if isinstance(year, date) else date(year, settings.ACADEMIC_YEAR_START_MONTH, 1)
+    return start, start.replace(year=start.year + 1)
+
+
+def date_range(model, field, start, end):
+    """Lookups for start <= ``field`` < end, for date and datetime fields alike."""
+    if isinstance(model._meta.get_field(field), models.DateTimeField):
+        start, end = (timezone.make_aware(datetime.combine(day, time.min)) for day in (start, end))
+    return {f'{field}__gte': start, f'{field}__lt': end}
+
+
+def _in_range(archive, start, end):
+    return date_range(archive.model, archive.date_field, start, end)
+
+
+def is_archived(year):
+    return AcademicYear.objects.filter(start=year_bounds(year)[0]).exists()
+
+
+def records(model, year, **lookups):
+    """
+    Rows of ``model`` (a live model such as StudentAttendance) dated in the
+    academic ``year`` and matching ``lookups``. Once that year is archived,
+    they are read from the archive together with the rows entered for it
+    since (which the next archive_years() run moves), all as read-only
+    archive rows. That is a UNION, which can't be filtered any further, so
+    filters go in ``lookups``; ordering and counting still work.
+    """
+    archive = BY_MODEL[model]
+    start, end = year_bounds(year)
+    live = archive.model.objects.filter(**_in_range(archive, start, end), **lookups)
+    if not is_archived(start):
+        return live
+    archived = archive.archive.objects.filter(**_in_range(archive, start, end), **lookups)
+    columns = [field.attname for field in archive.archive._meta.concrete_fields]
+    return archived.union(live.values_list(*columns), all=True)
+
+
+def _shared_columns(model, archive_model):
+    live = {field.attname for field in model._meta.concrete_fields}
+    return [field.attname for field in archive_model._meta.concrete_fields if field.attname in live]
+
+
+def _insert_from(cursor, model, attnames, queryset):
+    columns = {field.attname: field.column for field in model._meta.concrete_fields}
+    sql, params = queryset.query.sql_with_params()
+    target = ', '.join(connection.ops.quote_name(columns[name]) for name in attnames)
+    cursor.execute(f'INSERT INTO {connection.ops.quote_name(model._meta.db_table)} ({target}) {sql}', params)
+
+
+def _delete(cursor, model, column, ids):
+    cursor.execute(
+        f'DELETE FROM {connection.ops.quote_name(model._meta.db_table)} '
+        f'WHERE {connection.ops.quote_name(column)} IN ({", ".join(["%s"] * len(ids))})',
+        ids,
+    )
+
+
+def _move(archive, start, end, batch_size):
+    """
+    Copy and delete in SQL, one batch of ids at a time. Going through
+    QuerySet.delete() would load every row that has cascades (payments, with
+    their history) into Python; versions are bumped once at the end.
+    """
+    # In index order, so each batch starts where the previous one left off.
+    pending = archive.model.objects.filter(**_in_range(archive, start, end)).order_by(archive.date_field, 'pk')
+    columns = _shared_columns(archive.model, archive.archive)
+    moved = 0
+    while True:
+        with transaction.atomic(), connection.cursor() as cursor:
+            ids = list(pending.values_list('pk', flat=True)[:batch_size])
+            if not ids:
+                break
+            _insert_from(cursor, archive.archive, columns, archive.model.objects.filter(pk__in=ids).values(*columns))
+            for model, archive_model, column in archive.dependents:
+                shared = _shared_columns(model, archive_model)
+                _insert_from(cursor, archive_model, shared, model.objects.filter(**{f'{column}__in': ids}).values(*shared))
+                _delete(cursor, model, column, ids)
+            _delete(cursor, archive.model, archive.model._meta.pk.column, ids)
+        moved += len(ids)
+    return moved
+
+
+def archive_years(through=None, batch_size=1000):
+    """
+    Archive every academic year up to and including the one starting in
+    ``through`` (a start year; default: the year before the current one).
+    Rows entered late for an already archived year stay live until the next
+    run, which moves them too. Returns the AcademicYear rows that received data.
+    """
+    current = year_start(timezone.localdate())
+    last = year_bounds(through)[0] if through is not None else current.replace(year=current.year - 1)
+    if last >= current:
+        raise ValueError("Only academic years that have ended can be archived.")
+
+    firsts = [
+        archive.model.objects.order_by(archive.date_field).values_list(archive.date_field, flat=True).first()
+        for archive in ARCHIVES
+    ]
+    firsts = [timezone.localtime(day).date() if isinstance(day, datetime) else day for day in firsts if day is not None]
+    if not firsts:
+        return []
+
+    years = []
+    start = year_start(min(firsts))
+    while start <= last:
+        end = start.replace(year=start.year + 1)
+        moved = {archive.model._meta.db_table: _move(archive, start, end, batch_size) for archive in ARCHIVES}
+        if any(moved.values()):
+            year, created = AcademicYear.objects.get_or_create(start=start, defaults={'end': end, 'rows': moved})
+            if not created:
+                year.rows = {table: year.rows.get(table, 0) + count for table, count in moved.items()}
+                year.save(update_fields=['rows'])
+            years.append(year)
+        start = end
+
+    bump(
+        *(archive.model for archive in ARCHIVES), *(archive.archive for archive in ARCHIVES),
+        StudentPaymentHistory, ArchivedStudentPaymentHistory, PaymentNotifications, ArchivedPaymentNotifications,
+    )
+    return years
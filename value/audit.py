@@ -0,0 +1,189 @@
+"""
+Batched, asynchronous audit log for CriticalHistory.
+
+Views call audit.log(...), which only builds an unsaved CriticalHistory and
+puts it on a bounded in-process queue. A daemon thread writes the queue out
+with bulk_create every FLUSH_INTERVAL seconds or BATCH_SIZE entries, and an
+atexit hook drains whatever is left when the process shuts down.
+
+An entry is only queued once the transaction around audit.log() commits
+(transaction.on_commit; at once outside a transaction), so an action that
+is rolled back leaves no entry. Call log() inside the same atomic block as
+the change it records.
+
+Configured through settings.AUDIT_LOG:
+
+    ASYNC           False writes each entry in the calling thread (tests, scripts).
+    QUEUE_SIZE      maximum number of pending entries.
+    BATCH_SIZE      entries per bulk_create.
+    FLUSH_INTERVAL  seconds the flusher waits before writing a partial batch.
+    ON_FULL         'sync' writes the entry inline, 'drop' discards it,
+                    'block' waits up to BLOCK_TIMEOUT seconds and then drops.
+"""
+import atexit
+import logging
+import queue
+import threading
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import close_old_connections, transaction
+
+from .models import CriticalHistory
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ASYNC': True,
+    'QUEUE_SIZE': 10000,
+    'BATCH_SIZE': 500,
+    'FLUSH_INTERVAL': 1.0,
+    'ON_FULL': 'sync',
+    'BLOCK_TIMEOUT': 0.1,
+}
+
+
+class AuditLogWriter:
+    def __init__(self, asynchronous=True, queue_size=10000, batch_size=500,
+                 flush_interval=1.0, on_full='sync', block_timeout=0.1):
+        if on_full not in ('sync', 'drop', 'block'):
+            raise ValueError(f"Unknown ON_FULL policy: {on_full!r}")
+        self.asynchronous = asynchronous
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.on_full = on_full
+        self.block_timeout = block_timeout
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._stopping = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def log(self, action, actor=None, obj=None, diff=None, object_repr=None):
+        entry = CriticalHistory(
+            action=action,
+            actor=actor if actor is not None and actor.is_authenticated else None,
+            diff=diff or {},
+        )
+        if obj is not None:
+            entry.object_type = obj._meta.label_lower
+            entry.object_id = str(obj.pk or '')
+            entry.object_repr = (object_repr if object_repr is not None else str(obj))[:200]
+        elif object_repr:
+            entry.object_repr = object_repr[:200]
+        # Built now, while obj still has its pk; a delete clears it.
+        transaction.on_commit(lambda: self._submit(entry))
+
+    def _submit(self, entry):
+        if not self.asynchronous or self._stopping.is_set():
+            self._write([entry])
+            return
+        self._ensure_thread()
+        try:
+            if self.on_full == 'block':
+                self._queue.put(entry, timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait(entry)
+        except queue.Full:
+            if self.on_full == 'sync':
+                self._write([entry])
+            else:
+                self.dropped += 1
+                logger.warning("Audit log queue full, dropped %r (%d dropped so far)", entry.action, self.dropped)
+
+    def flush(self):
+        """Write every pending entry from the calling thread."""
+        while True:
+            batch = self._drain(block=False)
+            if not batch:
+                return
+            self._write(batch)
+
+    def stop(self, timeout=5.0):
+        self._stopping.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        self.flush()
+
+    def _ensure_thread(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='audit-log-flusher', daemon=True)
+                self._thread.start()
+
+    def _drain(self, block):
+        batch = []
+        try:
+            if block:
+                batch.append(self._queue.get(timeout=self.flush_interval))
+            while len(batch) < self.batch_size:
+                batch.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        return batch
+
+    def _run(self):
+        while not self._stopping.is_set():
+            batch = self._drain(block=True)
+            if batch:
+                close_old_connections()
+                self._write(batch)
+        close_old_connections()
+
+    def _write(self, batch):
+        try:
+            CriticalHistory.objects.bulk_create(batch, batch_size=self.batch_size)
+        except Exception:
+            logger.exception("Could not write %d audit log entries", len(batch))
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer():
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                options = {**DEFAULTS, **getattr(settings, 'AUDIT_LOG', {})}
+                _writer = AuditLogWriter(
+                    asynchronous=options['ASYNC'],
+                    queue_size=options['QUEUE_SIZE'],
+                    batch_size=options['BATCH_SIZE'],
+                    flush_interval=options['FLUSH_INTERVAL'],
+                    on_full=options['ON_FULL'],
+                    block_timeout=options['BLOCK_TIMEOUT'],
+                )
+    return _writer
+
+
+def log(action, actor=None, obj=None, diff=None, object_repr=None):
+    get_writer().log(action, actor=actor, obj=obj, diff=diff, object_repr=object_repr)
+
+
+def form_diff(form):
+    """{field: [old, new]} for the fields a bound ModelForm changed."""
+    return {
+        name: [str(form.initial.get(name, '')), str(form.cleaned_data.get(name, ''))]
+        for name in form.changed_data
+    }
+
+
+@atexit.register
+def _shutdown():
+    if _writer is not None:
+        _writer.stop()
+
+
+def _reset_writer(setting, **kwargs):
+    global _writer
+    if setting == 'AUDIT_LOG' and _writer is not None:
+        _writer.stop()
+        _writer = None
+
+
+setting_changed.connect(_reset_writer)
@@ -0,0 +1,82 @@
+"""
+Authentication backend that serves request.user from the cache.
+
+With the cached_db session engine this lets an authenticated request start
+without any query: the session comes from the cache and so does the User.
+Only what requests read is cached (FIELDS: role, is_staff, is_active...)
+plus the session hashes Django checks the session against, never the
+password hash. The other fields are deferred: reading one loads it, and
+save() on the cached user writes only the loaded fields.
+
+The cached copy is dropped whenever the user is saved or deleted. Code that
+changes users with QuerySet.update() calls forget_users(). Anything else
+(raw SQL, another application on the same database) is picked up within
+USER_TIMEOUT, so keep that short.
+"""
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models.signals import post_delete, post_save
+
+USER_KEY = 'auth-user:{}'
+USER_TIMEOUT = 60
+FIELDS = ('id', 'username', 'first_name', 'last_name', 'email', 'role', 'is_staff', 'is_superuser', 'is_active')
+
+
+def _fields():
+    # In model order, as Model.from_db() expects them.
+    return [field.attname for field in get_user_model()._meta.concrete_fields if field.attname in FIELDS]
+
+
+def _cached(user):
+    return {
+        'values': [getattr(user, field) for field in _fields()],
+        # The current hash and those for settings.SECRET_KEY_FALLBACKS, as django.contrib.auth.get_user() checks them.
+        'session_hashes': [user.get_session_auth_hash(), *user.get_session_auth_fallback_hash()],
+    }
+
+
+def _restore(data):
+    User = get_user_model()
+    user = User.from_db(DEFAULT_DB_ALIAS, _fields(), data['values'])
+    current, *fallbacks = data['session_hashes']
+
+    # The cached hashes stand in for the password until it is loaded or changed
+    # (check_password(), set_password()); from then on they come from the password again,
+    # so update_session_auth_hash() after a password change stores the new hash.
+    def password_loaded():
+        return 'password' not in user.get_deferred_fields()
+
+    user.get_session_auth_hash = lambda: User.get_session_auth_hash(user) if password_loaded() else current
+    user.get_session_auth_fallback_hash = lambda: (
+        User.get_session_auth_fallback_hash(user) if password_loaded() else iter(fallbacks)
+    )
+    return user
+
+
+class CachedModelBackend(ModelBackend):
+    def get_user(self, user_id):
+        key = USER_KEY.format(user_id)
+        data = cache.get(key)
+        if data is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                cache.set(key, _cached(user), USER_TIMEOUT)
+            return user
+        return _restore(data)
+
+
+def forget_users(pks):
+    """Drop the cached copies of the users ``pks``; call after changing them with QuerySet.update()."""
+    cache.delete_many([USER_KEY.format(pk) for pk in pks])
+
+
+def invalidate_cached_user(sender, instance, **kwargs):
+    forget_users([instance.pk])
+
+
+def connect_signals():
+    User = get_user_model()
+    post_save.connect(invalidate_cached_user, sender=User, dispatch_uid='value.backends.user_saved')
+    post_delete.connect(invalidate_cached_user, sender=User, dispatch_uid='value.backends.user_deleted')
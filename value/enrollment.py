@@ -0,0 +1,117 @@
+"""
+Classroom enrollment with enforced capacity.
+
+Classroom.enrolled_count is maintained here rather than counted per page, so
+the classroom list shows occupancy without a COUNT per row. Places are taken
+with one conditional UPDATE ("enrolled_count + n <= capacity"), the same way
+value.tasks claims jobs: two requests racing for the last place can't both
+win it, on SQLite as well as on PostgreSQL. The students being moved are
+locked with select_for_update() where the database supports it (SQLite
+serializes writers anyway), so one student is never moved twice at once.
+
+Set Student.student_class through enroll()/enroll_many() only; recount()
+rebuilds the counters after writes that bypassed them (bulk_create, admin).
+"""
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, QuerySet, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_delete
+
+from .models import Classroom, Student
+from .versions import bump
+
+
+class ClassroomFull(ValueError):
+    def __init__(self, classroom, requested):
+        self.classroom = classroom
+        self.requested = requested
+        super().__init__(
+            f"{classroom.name} has {max(classroom.capacity - classroom.enrolled_count, 0)} free places, "
+            f"{requested} requested."
+        )
+
+
+@transaction.atomic
+def enroll_many(students, classroom):
+    """
+    Move ``students`` (a queryset, or Student objects or ids) into
+    ``classroom``, or out of any class when it is None. All or nothing:
+    raises ClassroomFull if they don't all fit. Returns how many moved.
+    """
+    if isinstance(students, QuerySet):
+        students = students.values_list('pk', flat=True)
+    ids = [getattr(student, 'pk', student) for student in students]
+    moving = dict(
+        Student.objects.select_for_update()
+        .filter(pk__in=ids)
+        .exclude(student_class=classroom)
+        .values_list('pk', 'student_class_id')
+    )
+    if not moving:
+        return 0
+
+    if classroom is not None:
+        taken = Classroom.objects.filter(pk=classroom.pk, enrolled_count__lte=F('capacity') - len(moving)).update(
+            enrolled_count=F('enrolled_count') + len(moving)
+        )
+        if not taken:
+            classroom.refresh_from_db(fields=['capacity', 'enrolled_count'])
+            raise ClassroomFull(classroom, len(moving))
+    for old, count in Counter(moving.values()).items():
+        if old is not None:
+            Classroom.objects.filter(pk=old).update(enrolled_count=F('enrolled_count') - count)
+    Student.objects.filter(pk__in=moving).update(student_class=classroom)
+    bump(Student, Classroom)
+    return len(moving)
+
+
+def enroll(student, classroom):
+    """Move one student; see enroll_many()."""
+    return enroll_many([student], classroom)
+
+
+def move_cohort(source, target):
+    """Move every student of ``source`` to ``target``, e.g. a whole year group going up."""
+    return enroll_many(Student.objects.filter(student_class=source), target)
+
+
+def recount(classrooms=None):
+    """Recompute enrolled_count from the students table; one UPDATE."""
+    counts = (
+        Student.objects.filter(student_class=OuterRef('pk'))
+        .order_by()
+        .values('student_class')
+        .annotate(n=Count('pk'))
+        .values('n')
+    )
+    classrooms = Classroom.objects.all() if classrooms is None else classrooms
+    updated = classrooms.update(enrolled_count=Coalesce(Subquery(counts), Value(0), output_field=IntegerField()))
+    bump(Classroom)
+    return updated
+
+
+def release_places(students):
+    """
+    Give back the places of ``students`` (ids) that are about to be deleted
+    without signals, as value.offboarding does. Returns how many were freed.
+    """
+    taken = Counter(
+        Student.objects.filter(pk__in=students, student_class__isnull=False).values_list('student_class_id', flat=True)
+    )
+    for classroom, count in taken.items():
+        Classroom.objects.filter(pk=classroom).update(enrolled_count=F('enrolled_count') - count)
+    if taken:
+        bump(Classroom)
+    return sum(taken.values())
+
+
+def _release_place(sender, instance, **kwargs):
+    # Students also disappear through cascades (a deleted user), not only through this module.
+    if instance.student_class_id is not None:
+        Classroom.objects.filter(pk=instance.student_class_id).update(enrolled_count=F('enrolled_count') - 1)
+
+
+def connect_signals():
+    post_delete.connect(_release_place, sender=Student, dispatch_uid='value.enrollment.student_deleted')
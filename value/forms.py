@@ -87,9 +87,10 @@ class EventForm(forms.Form):
 class PettyCashForm(forms.Form):
     amount = forms.DecimalField(max_digits=10, decimal_places=2, required=True)
     description = forms.CharField(max_length=200, required=True)
+    category = forms.CharField(max_length=50, required=False)
 
     def save(self):
         # Assuming PettyCash model has a 'recorded_by' field linked to User
         # You might need to pass request.user to the form's save method or in the view
         # For now, it creates without 'recorded_by'
-        return PettyCash.objects.create(amount=self.cleaned_data['amount'], description=self.cleaned_data['description'])
\ No newline at end of file
+        return PettyCash.objects.create(amount=self.cleaned_data['amount'], description=self.cleaned_data['description'], category=self.cleaned_data['category'])
\ No newline at end of file
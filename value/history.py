@@ -0,0 +1,78 @@
+"""
+Amount change history for payments, salaries and petty cash.
+
+The history rows are written by database triggers rather than in save(), so
+queryset .update() calls are captured as well and no extra Python round trip
+is paid per row. Triggers are installed by migration 0004 and re-asserted
+after every migrate, since SQLite drops them whenever Django rebuilds a table.
+"""
+
+# (tracked table, history table, history FK column)
+TRACKED_TABLES = [
+    ('value_studentpayment', 'value_studentpaymenthistory', 'payment_id'),
+    ('value_teachersalary', 'value_teachersalaryhistory', 'teacher_salary_id'),
+    ('value_pettycash', 'value_pettycashhistory', 'pettyCash_id'),
+]
+
+SQLITE_CREATE = """
+CREATE TRIGGER IF NOT EXISTS "{table}_amount_history"
+AFTER UPDATE OF "amount" ON "{table}"
+FOR EACH ROW WHEN OLD."amount" IS NOT NEW."amount"
+BEGIN
+    INSERT INTO "{history}" ("{fk}", "changed_at", "old_amount", "new_amount")
+    VALUES (NEW."id", strftime('%Y-%m-%d %H:%M:%f', 'now'), OLD."amount", NEW."amount");
+END
+"""
+
+SQLITE_DROP = 'DROP TRIGGER IF EXISTS "{table}_amount_history"'
+
+POSTGRES_CREATE = """
+CREATE OR REPLACE FUNCTION "{table}_amount_history"() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO "{history}" ("{fk}", "changed_at", "old_amount", "new_amount")
+    VALUES (NEW."id", NOW(), OLD."amount", NEW."amount");
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+DROP TRIGGER IF EXISTS "{table}_amount_history" ON "{table}";
+CREATE TRIGGER "{table}_amount_history"
+AFTER UPDATE OF "amount" ON "{table}"
+FOR EACH ROW WHEN (OLD."amount" IS DISTINCT FROM NEW."amount")
+EXECUTE FUNCTION "{table}_amount_history"();
+"""
+
+POSTGRES_DROP = """
+DROP TRIGGER IF EXISTS "{table}_amount_history" ON "{table}";
+DROP FUNCTION IF EXISTS "{table}_amount_history"();
+"""
+
+STATEMENTS = {
+    'sqlite': (SQLITE_CREATE, SQLITE_DROP),
+    'postgresql': (POSTGRES_CREATE, POSTGRES_DROP),
+}
+
+
+def _execute(connection, index):
+    templates = STATEMENTS.get(connection.vendor)
+    if templates is None:
+        return
+    existing = set(connection.introspection.table_names())
+    with connection.cursor() as cursor:
+        for table, history, fk in TRACKED_TABLES:
+            if table not in existing or history not in existing:
+                continue
+            cursor.execute(templates[index].format(table=table, history=history, fk=fk))
+
+
+def install_triggers(connection):
+    _execute(connection, 0)
+
+
+def drop_triggers(connection):
+    _execute(connection, 1)
+
+
+def reinstall_triggers(sender, using, **kwargs):
+    # post_migrate handler; the statements are idempotent.
+    from django.db import connections
+    install_triggers(connections[using])
@@ -0,0 +1,95 @@
+"""
+Compact rows for the long dashboard lists.
+
+A list that prints a few columns per row doesn't need a model instance per
+row, plus one per related object: compact() selects just those columns as
+named tuples, which templates read like attributes.
+
+stream_page() goes further for lists that can run to tens of thousands of
+rows. The page around the table is rendered once, then the rows are fetched
+and rendered in chunks into a StreamingHttpResponse. Neither the rows nor the
+finished HTML are ever all in memory at once. The chunks are rendered after
+the view has returned, in a copy of the view's context, so @use_replica still
+routes their queries.
+"""
+import contextvars
+from collections import defaultdict, namedtuple
+from itertools import islice
+
+from django.http import StreamingHttpResponse
+from django.template.loader import get_template, render_to_string
+from django.utils.safestring import mark_safe
+
+CHUNK_SIZE = 2000
+MARKER = '<!-- streamed rows -->'
+
+
+def compact(queryset, *fields, **expressions):
+    """
+    ``queryset`` as named tuples of ``fields`` and of ``expressions`` under
+    their keyword names, e.g. compact(students, 'id', username=F('user__username')).
+    Still a lazy queryset: it can be sliced, counted or streamed.
+    """
+    if expressions:
+        queryset = queryset.annotate(**expressions)
+    return queryset.values_list(*fields, *expressions, named=True)
+
+
+def attach(rows, name, pairs):
+    """
+    ``rows`` (named tuples with an ``id``) extended with ``name``: the values
+    paired with each row's id in ``pairs``, an iterable of (id, value).
+    """
+    grouped = defaultdict(list)
+    for key, value in pairs:
+        grouped[key].append(value)
+    extended, Row = [], None
+    for row in rows:
+        if Row is None:
+            Row = namedtuple('Row', [*row._fields, name])
+        extended.append(Row(*row, grouped.get(row.id, ())))
+    return extended
+
+
+def chunks(rows, size=CHUNK_SIZE):
+    """Lists of up to ``size`` rows, read through a database cursor rather than all at once."""
+    iterator = rows.iterator(chunk_size=size)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def stream_page(request, template_name, context, name, rows, row_template, prepare=None, chunk_size=CHUNK_SIZE):
+    """
+    Render ``template_name`` around ``rows`` (a compact() queryset) as a
+    StreamingHttpResponse. The page template outputs ``streamed_rows`` where
+    the rows go; ``row_template`` renders a chunk of them, given as ``name``,
+    and ``prepare(chunk)`` may extend each chunk first (see attach()).
+    """
+    page = render_to_string(template_name, {**context, 'streamed_rows': mark_safe(MARKER)}, request)
+    head, marker, tail = page.partition(MARKER)
+    if not marker:
+        raise ValueError(f"{template_name} does not output streamed_rows.")
+    template = get_template(row_template)
+
+    def content():
+        yield head
+        empty = True
+        for chunk in chunks(rows, chunk_size):
+            empty = False
+            yield template.render({name: prepare(chunk) if prepare else chunk})
+        if empty:
+            yield template.render({name: []})
+        yield tail
+
+    # Later iterations run with the routing (and any other context) the view had.
+    view_context = contextvars.copy_context()
+    body = content()
+
+    def in_view_context():
+        while True:
+            try:
+                yield view_context.run(next, body)
+            except StopIteration:
+                return
+
+    return StreamingHttpResponse(in_view_context(), content_type='text/html; charset=utf-8')
@@ -0,0 +1,44 @@
+"""
+Helpers shared by the bench_* management commands.
+
+Benchmarks always run against a throwaway test database built from the
+migrations, never against the configured one.
+"""
+import statistics
+import time
+from contextlib import contextmanager
+
+from django.db import connection
+
+
+@contextmanager
+def scratch_database(verbosity=0, name=None):
+    """
+    Build a test database for the body. ``name`` forces an on-disk SQLite file
+    (needed when several threads or processes have to share it).
+    """
+    old_name = connection.settings_dict['NAME']
+    old_test_name = connection.settings_dict['TEST'].get('NAME')
+    if name is not None:
+        connection.settings_dict['TEST']['NAME'] = str(name)
+    try:
+        connection.creation.create_test_db(verbosity=verbosity, autoclobber=True, serialize=False)
+        try:
+            yield connection
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=verbosity)
+    finally:
+        connection.settings_dict['TEST']['NAME'] = old_test_name
+
+
+@contextmanager
+def timed(results, label):
+    start = time.perf_counter()
+    yield
+    results.setdefault(label, []).append(time.perf_counter() - start)
+
+
+def summarize(samples):
+    """Return (median, best) in milliseconds for a list of timings in seconds."""
+    return statistics.median(samples) * 1000, min(samples) * 1000
+
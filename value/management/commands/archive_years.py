@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from value.archive import archive_years
+
+
+class Command(BaseCommand):
+    help = "Move attendance, payments and chat of ended academic years into the archive tables."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--through', type=int, help="Start year of the last academic year to archive (default: the previous one).")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        try:
+            years = archive_years(options['through'], batch_size=options['batch_size'])
+        except ValueError as e:
+            raise CommandError(str(e))
+        for year in years:
+            counts = ', '.join(f"{table.removeprefix('value_')} {count}" for table, count in year.rows.items() if count)
+            self.stdout.write(f"Archived {year}: {counts}")
+        if not years:
+            self.stdout.write("Nothing to archive.")
@@ -0,0 +1,114 @@
+import random
+import tempfile
+import threading
+import time
+from contextlib import ExitStack
+from datetime import date
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection, connections, transaction
+
+from school_system.database import SQLITE_PRAGMAS, pragma_init_command
+from value.management.benchmark import scratch_database
+from value.models import Student, StudentAttendance, User
+
+# (pragmas, transaction_mode). "default" is what settings.py used before:
+# rollback journal and Django's deferred transactions.
+SQLITE_PROFILES = {
+    'default': ({'journal_mode': 'DELETE'}, None),
+    'tuned': (SQLITE_PRAGMAS, 'IMMEDIATE'),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Mixed read/write throughput with concurrent threads. On SQLite it compares the "
+        "default and the tuned connection settings; on PostgreSQL (DB_BACKEND=postgres) "
+        "it measures the configured profile, so the two backends can be compared."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--seconds', type=float, default=5.0)
+        parser.add_argument('--write-ratio', type=float, default=0.2)
+
+    def handle(self, *args, **options):
+        original_options = dict(connection.settings_dict['OPTIONS'])
+        with ExitStack() as stack:
+            name = None
+            if connection.vendor == 'sqlite':
+                # Threads need a shared on-disk file, not the in-memory test database.
+                name = Path(stack.enter_context(tempfile.TemporaryDirectory())) / 'bench.sqlite3'
+            stack.enter_context(scratch_database(name=name))
+            users = User.objects.bulk_create(User(username=f'student{i}', role='student') for i in range(500))
+            Student.objects.bulk_create(Student(user=u) for u in users)
+            student_ids = list(Student.objects.values_list('pk', flat=True))
+
+            if connection.vendor == 'sqlite':
+                profiles = list(SQLITE_PROFILES.items())
+            else:
+                profiles = [(connection.vendor, None)]
+            self.stdout.write(f"{'profile':<12}{'reads/s':>10}{'writes/s':>10}{'errors':>8}")
+            try:
+                for label, profile in profiles:
+                    if profile is not None:
+                        self.apply_sqlite_profile(*profile)
+                    reads, writes, errors = self.run_workload(student_ids, options)
+                    seconds = options['seconds']
+                    self.stdout.write(f"{label:<12}{reads / seconds:>10.0f}{writes / seconds:>10.0f}{errors:>8}")
+            finally:
+                connection.close()
+                connection.settings_dict['OPTIONS'] = original_options
+
+    def apply_sqlite_profile(self, pragmas, transaction_mode):
+        # The journal mode is a property of the file and can only be switched
+        # while no other connection is open, so set it once up front.
+        connection.close()
+        connection.settings_dict['OPTIONS'] = {'timeout': 5}
+        with connection.cursor() as cursor:
+            cursor.execute(f"PRAGMA journal_mode={pragmas['journal_mode']}")
+        connection.close()
+        per_connection = {name: value for name, value in pragmas.items() if name != 'journal_mode'}
+        connection.settings_dict['OPTIONS'] = {'init_command': pragma_init_command(per_connection), 'timeout': 5}
+        if transaction_mode:
+            connection.settings_dict['OPTIONS']['transaction_mode'] = transaction_mode
+
+    def run_workload(self, student_ids, options):
+        counts = {'reads': 0, 'writes': 0, 'errors': 0}
+        lock = threading.Lock()
+        deadline = time.perf_counter() + options['seconds']
+        today = date(2025, 1, 1)
+
+        def worker(seed):
+            rng = random.Random(seed)
+            local = {'reads': 0, 'writes': 0, 'errors': 0}
+            try:
+                while time.perf_counter() < deadline:
+                    try:
+                        if rng.random() < options['write_ratio']:
+                            # Read-then-write, like marking attendance once per day.
+                            student_id = rng.choice(student_ids)
+                            with transaction.atomic():
+                                marked = StudentAttendance.objects.filter(student_id=student_id, date=today).exists()
+                                StudentAttendance.objects.create(student_id=student_id, date=today, present=not marked)
+                            local['writes'] += 1
+                        else:
+                            with transaction.atomic():
+                                StudentAttendance.objects.filter(student_id=rng.choice(student_ids)).count()
+                                len(Student.objects.select_related('user')[:20])
+                            local['reads'] += 1
+                    except OperationalError:
+                        local['errors'] += 1
+            finally:
+                connections.close_all()
+                with lock:
+                    for key, value in local.items():
+                        counts[key] += value
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(options['threads'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return counts['reads'], counts['writes'], counts['errors']
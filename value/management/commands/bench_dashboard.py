@@ -0,0 +1,57 @@
+import time
+from datetime import date, timedelta
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from value.management.benchmark import scratch_database, summarize
+from value.models import Classroom, Event, MainNotification, Student, Teacher, User
+
+ROUTES = ['dashboard_home', 'dashboard_user_list', 'dashboard_student_list', 'dashboard_classroom_list', 'event_list']
+
+
+class Command(BaseCommand):
+    help = "Time dashboard requests with a cold and a warm fragment cache."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=200, help="Students, teachers and events to generate.")
+        parser.add_argument('--repeat', type=int, default=20)
+
+    @override_settings(ALLOWED_HOSTS=['testserver'], AUDIT_LOG={'ASYNC': False})
+    def handle(self, *args, **options):
+        rows, repeat = options['rows'], options['repeat']
+        with scratch_database():
+            classrooms = Classroom.objects.bulk_create(Classroom(name=f'Class {i}') for i in range(20))
+            users = User.objects.bulk_create(User(username=f'student{i}', role='student') for i in range(rows))
+            Student.objects.bulk_create(Student(user=u, student_class=classrooms[i % 20]) for i, u in enumerate(users))
+            users = User.objects.bulk_create(User(username=f'teacher{i}', role='teacher') for i in range(rows))
+            Teacher.objects.bulk_create(Teacher(user=u) for u in users)
+            Event.objects.bulk_create(Event(title=f'Event {i}', date=date(2025, 1, 1) + timedelta(days=i)) for i in range(rows))
+            MainNotification.objects.bulk_create(MainNotification(title=f'Notice {i}', message='x') for i in range(20))
+            admin = User.objects.create_user(username='bench-admin', password='x', is_staff=True)
+
+            client = Client()
+            client.force_login(admin)
+            self.stdout.write(f"{'route':<26}{'cold ms':>10}{'warm ms':>10}{'cold q':>8}{'warm q':>8}")
+            for name in ROUTES:
+                url = reverse(f'value:{name}')
+                cold, warm = [], []
+                for _ in range(repeat):
+                    cache.clear()
+                    cold_queries = self.request(client, url, cold)
+                    warm_queries = self.request(client, url, warm)
+                self.stdout.write(
+                    f"{name:<26}{summarize(cold)[0]:>10.2f}{summarize(warm)[0]:>10.2f}"
+                    f"{cold_queries:>8}{warm_queries:>8}"
+                )
+
+    def request(self, client, url, samples):
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            client.get(url)
+            samples.append(time.perf_counter() - start)
+        return len(queries)
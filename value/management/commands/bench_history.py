@@ -0,0 +1,56 @@
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import F
+
+from value.history import drop_triggers, install_triggers
+from value.management.benchmark import scratch_database, summarize, timed
+from value.models import Student, StudentPayment, StudentPaymentHistory, User
+
+
+class Command(BaseCommand):
+    help = "Measure the cost of the amount-history triggers on bulk payment updates."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=5000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        rows, repeat = options['rows'], options['repeat']
+        with scratch_database():
+            user = User.objects.create(username='bench', role='student')
+            student = Student.objects.create(user=user)
+            StudentPayment.objects.bulk_create(
+                StudentPayment(student=student, amount=Decimal('100.00'), date='2025-01-01')
+                for _ in range(rows)
+            )
+
+            results = {}
+            for _ in range(repeat):
+                with transaction.atomic():
+                    with timed(results, 'with triggers'):
+                        StudentPayment.objects.update(amount=F('amount') + 1)
+                    transaction.set_rollback(True)
+                with transaction.atomic():
+                    drop_triggers(connection)
+                    with timed(results, 'without triggers'):
+                        StudentPayment.objects.update(amount=F('amount') + 1)
+                    transaction.set_rollback(True)
+            install_triggers(connection)
+
+            with transaction.atomic():
+                StudentPayment.objects.update(amount=F('amount') + 1)
+                captured = StudentPaymentHistory.objects.count()
+                transaction.set_rollback(True)
+
+        for label, samples in results.items():
+            median, best = summarize(samples)
+            self.stdout.write(f"{label:<18} median {median:8.2f} ms   best {best:8.2f} ms")
+        with_median = summarize(results['with triggers'])[0]
+        without_median = summarize(results['without triggers'])[0]
+        self.stdout.write(
+            f"{rows} rows updated, {captured} history rows captured, "
+            f"overhead {with_median - without_median:.2f} ms "
+            f"({(with_median - without_median) / rows * 1000:.2f} us/row)"
+        )
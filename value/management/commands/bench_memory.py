@@ -0,0 +1,72 @@
+import time
+import tracemalloc
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from value.management.benchmark import scratch_database
+from value.models import Classroom, Student, Subject, Teacher, User
+
+ROUTES = ['dashboard_user_list', 'dashboard_student_list', 'dashboard_teacher_list']
+BATCH = 5000
+
+
+class Command(BaseCommand):
+    help = "Peak Python memory (tracemalloc) of the large dashboard list pages."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', default='10000,100000',
+                            help="Comma-separated student and teacher counts to measure at.")
+
+    @override_settings(ALLOWED_HOSTS=['testserver'], AUDIT_LOG={'ASYNC': False}, REPLICA_DATABASE=None)
+    def handle(self, *args, **options):
+        sizes = sorted(int(size) for size in options['rows'].split(','))
+        self.stdout.write(f"{'rows':>8}  {'route':<26}{'peak MB':>10}{'page MB':>10}{'ms':>10}")
+        with scratch_database():
+            admin = User.objects.create_user(username='bench-admin', password='x', is_staff=True)
+            classrooms = Classroom.objects.bulk_create(Classroom(name=f'Class {i}') for i in range(40))
+            subjects = Subject.objects.bulk_create(Subject(name=f'Subject {i}') for i in range(12))
+            client = Client()
+            client.force_login(admin)
+            created = 0
+            for size in sizes:
+                self.populate(created, size, classrooms, subjects)
+                created = size
+                for name in ROUTES:
+                    peak, page, seconds = self.measure(client, reverse(f'value:{name}'))
+                    self.stdout.write(f"{size:>8}  {name:<26}{peak / 2 ** 20:>10.1f}{page / 2 ** 20:>10.1f}{seconds * 1000:>10.0f}")
+
+    def populate(self, start, end, classrooms, subjects):
+        for first in range(start, end, BATCH):
+            numbers = range(first, min(first + BATCH, end))
+            users = User.objects.bulk_create(
+                User(username=f'student{i}', email=f'student{i}@example.com', role='student') for i in numbers
+            )
+            Student.objects.bulk_create(
+                Student(user=user, student_class=classrooms[i % len(classrooms)]) for i, user in zip(numbers, users)
+            )
+            users = User.objects.bulk_create(
+                User(username=f'teacher{i}', email=f'teacher{i}@example.com', role='teacher') for i in numbers
+            )
+            teachers = Teacher.objects.bulk_create(Teacher(user=user) for user in users)
+            Teacher.subjects.through.objects.bulk_create(
+                Teacher.subjects.through(teacher=teacher, subject=subjects[(i + offset) % len(subjects)])
+                for i, teacher in zip(numbers, teachers) for offset in (0, 5)
+            )
+
+    def measure(self, client, url):
+        cache.clear()
+        b''.join(client.get(url))  # warm the session, user and template caches
+        tracemalloc.start()
+        try:
+            start = time.perf_counter()
+            # Read streamed pages a chunk at a time, as a server sending them would.
+            size = sum(len(chunk) for chunk in client.get(url))
+            seconds = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        return peak, size, seconds
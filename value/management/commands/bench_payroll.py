@@ -0,0 +1,49 @@
+import random
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from value.management.benchmark import scratch_database
+from value.models import Teacher, TeacherAttendance, TeacherSalaryHistory, User
+from value.payroll import run_payroll
+
+
+class Command(BaseCommand):
+    help = "Time a full payroll run and count its queries on generated teachers and attendance."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--teachers', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        count = options['teachers']
+        month = date(2025, 3, 1)
+        school_days = [month + timedelta(days=d) for d in range(31) if (month + timedelta(days=d)).weekday() < 5]
+        rng = random.Random(0)
+        with scratch_database():
+            users = User.objects.bulk_create(User(username=f'teacher{i}', role='teacher') for i in range(count))
+            teachers = Teacher.objects.bulk_create(Teacher(user=user, base_salary=Decimal('3000.00')) for user in users)
+            TeacherAttendance.objects.bulk_create(
+                (TeacherAttendance(teacher=teacher, date=day, present=rng.random() > 0.05)
+                 for teacher in teachers for day in school_days),
+                batch_size=2000,
+            )
+
+            for label in ('first run', 're-run (no changes)'):
+                self.measure(label, month)
+            TeacherAttendance.objects.filter(pk__in=TeacherAttendance.objects.order_by('?').values('pk')[:count // 10]).update(present=False)
+            self.measure('re-run (10% changed)', month)
+            self.stdout.write(f"History rows written: {TeacherSalaryHistory.objects.count()}")
+
+    def measure(self, label, month):
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            run = run_payroll(month)
+            elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f"{label:<22} {elapsed * 1000:8.1f} ms  {len(queries):3d} queries  "
+            f"{run.teacher_count} teachers, total {run.total}"
+        )
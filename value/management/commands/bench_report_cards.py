@@ -0,0 +1,68 @@
+import os
+import random
+import tempfile
+from datetime import date, timedelta
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from value import reportcards
+from value.management.benchmark import scratch_database
+from value.models import Classroom, Exam, Student, StudentAttendance, StudentExam, StudentGrade, User
+
+CLASS_SIZE = 40
+GRADES = [(90, 'A+'), (80, 'A'), (70, 'B'), (60, 'C'), (50, 'D'), (0, 'F')]
+
+
+class Command(BaseCommand):
+    help = "Time report-card generation for a whole school, in this process and with a process pool."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=5000)
+        parser.add_argument('--exams', type=int, default=10, help="Exams in the term.")
+        parser.add_argument('--days', type=int, default=60, help="School days of attendance in the term.")
+        parser.add_argument('--workers', type=int, nargs='+', default=[1, max(2, os.cpu_count() or 1)])
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        start = date(2025, 1, 6)
+        with tempfile.TemporaryDirectory() as tmp, scratch_database():
+            with transaction.atomic():
+                self.seed(rng, start, options['students'], options['exams'], options['days'])
+            end = start + timedelta(days=options['days'] * 7 // 5)
+            self.stdout.write(f"{options['students']} students, {options['exams']} exams, {options['days']} days")
+            for workers in options['workers']:
+                out = Path(tmp) / f'cards-{workers}.zip'
+                stats = reportcards.build_archive(out, start=start, end=end, workers=workers)
+                self.stdout.write(
+                    f"workers={workers:<3} {stats['documents']} cards in {stats['seconds']:7.2f} s  "
+                    f"{stats['per_second']:8.1f}/s  archive {out.stat().st_size / 2**20:.1f} MiB"
+                )
+
+    def seed(self, rng, start, students, exams, days):
+        classrooms = Classroom.objects.bulk_create(
+            Classroom(name=f'Class {i}') for i in range(-(-students // CLASS_SIZE))
+        )
+        users = User.objects.bulk_create(
+            (User(username=f'student{i}', first_name=f'First{i}', last_name=f'Last{i}', role='student')
+             for i in range(students)), batch_size=2000,
+        )
+        pupils = Student.objects.bulk_create(
+            (Student(user=u, student_class=classrooms[i // CLASS_SIZE]) for i, u in enumerate(users)), batch_size=2000,
+        )
+        exams = Exam.objects.bulk_create(
+            Exam(name=f'Exam {i}', date=start + timedelta(days=7 * i)) for i in range(exams)
+        )
+        marks = StudentExam.objects.bulk_create(
+            (StudentExam(student=s, exam=e, marks=rng.randint(20, 100)) for s in pupils for e in exams), batch_size=5000,
+        )
+        StudentGrade.objects.bulk_create(
+            (StudentGrade(student_exam=m, grade=next(g for floor, g in GRADES if m.marks >= floor)) for m in marks),
+            batch_size=5000,
+        )
+        school_days = [start + timedelta(days=d) for d in range(days * 7 // 5) if (start + timedelta(days=d)).weekday() < 5]
+        StudentAttendance.objects.bulk_create(
+            (StudentAttendance(student=s, date=day, present=rng.random() < 0.93) for s in pupils for day in school_days),
+            batch_size=5000,
+        )
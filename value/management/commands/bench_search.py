@@ -0,0 +1,56 @@
+import itertools
+import random
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from value import search
+from value.management.benchmark import scratch_database, summarize, timed
+from value.models import Chat, User
+
+VOCABULARY = 20000
+QUERIES = ['w12x', 'w250x w900x', 'w3000x', 'w1x', 'w1x w2x']
+
+
+class Command(BaseCommand):
+    help = "Measure full-text search latency over a large chat history."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=200000)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        messages, repeat = options['messages'], options['repeat']
+        rng = random.Random(42)
+        # Word frequencies follow Zipf's law, as in real text: "w1x" is the most common word.
+        words = [f'w{rank}x' for rank in range(1, VOCABULARY + 1)]
+        cum_weights = list(itertools.accumulate(1 / rank for rank in range(1, VOCABULARY + 1)))
+        with scratch_database():
+            sender = User.objects.create(username='sender', role='teacher')
+            receiver = User.objects.create(username='receiver', role='student', is_staff=True)
+            results = {}
+            with transaction.atomic():
+                with timed(results, 'index'):
+                    Chat.objects.bulk_create(
+                        (Chat(sender=sender, receiver=receiver, message=' '.join(rng.choices(words, cum_weights=cum_weights, k=12)))
+                         for _ in range(messages)),
+                        batch_size=5000,
+                    )
+            matches = {}
+            with connection.cursor() as cursor:
+                for text in QUERIES:
+                    cursor.execute(
+                        f'SELECT count(*) FROM "{search.INDEX_TABLE}" WHERE "{search.INDEX_TABLE}" MATCH %s',
+                        [search.to_query(text, connection.vendor)],
+                    )
+                    matches[text] = cursor.fetchone()[0]
+            for _ in range(repeat):
+                for text in QUERIES:
+                    with timed(results, text):
+                        search.search(text, user=receiver, limit=20)
+
+        median, _ = summarize(results.pop('index'))
+        self.stdout.write(f"{messages} messages inserted and indexed in {median:.0f} ms")
+        for text, samples in results.items():
+            median, best = summarize(samples)
+            self.stdout.write(f"{text!r:<14} {matches[text]:>8} matches   median {median:8.2f} ms   best {best:8.2f} ms")
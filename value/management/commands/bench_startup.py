@@ -0,0 +1,92 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from importlib import import_module
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.core.management.base import BaseCommand
+
+from value.management.benchmark import scratch_database
+from value.models import Classroom, Student, User
+
+# Run in a fresh interpreter per sample: import the WSGI module, then serve two requests.
+CHILD = """
+import json, sys, time
+started = time.perf_counter()
+import school_system.wsgi
+imported = time.perf_counter()
+
+def request(path, cookie):
+    environ = {
+        'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': '', 'SERVER_NAME': 'localhost',
+        'SERVER_PORT': '80', 'HTTP_HOST': 'localhost', 'HTTP_COOKIE': cookie, 'wsgi.url_scheme': 'http',
+        'wsgi.input': sys.stdin.buffer, 'wsgi.errors': sys.stderr,
+    }
+    statuses = []
+    body = school_system.wsgi.application(environ, lambda status, headers: statuses.append(status))
+    b''.join(body)
+    body.close()
+    assert statuses[0].startswith('200'), statuses
+    return time.perf_counter()
+
+path, cookie = sys.argv[1], sys.argv[2]
+first = request(path, cookie)
+second = request(path, cookie)
+print(json.dumps({'import': imported - started, 'first': first - imported, 'second': second - first}))
+"""
+
+
+class Command(BaseCommand):
+    help = "Time a cold worker: importing school_system.wsgi and serving its first requests, with and without warm-up."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=10, help="Fresh processes per configuration.")
+        parser.add_argument('--path', default='/dashboard/')
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as tmp, scratch_database(name=Path(tmp) / 'startup.sqlite3') as connection:
+            cookie = self.populate()
+            connection.close()  # the children open their own
+            env = {
+                **os.environ,
+                'DJANGO_SETTINGS_MODULE': 'school_system.settings',
+                'DB_BACKEND': 'sqlite',
+                'SQLITE_PATH': connection.settings_dict['NAME'],
+            }
+            self.stdout.write(f"{'warm-up':<10}{'process':>10}{'import':>10}{'1st req':>10}{'2nd req':>10}   (ms, median)")
+            for warm_up in ('0', '1'):
+                samples = [self.run_child({**env, 'WARM_UP': warm_up}, options['path'], cookie)
+                           for _ in range(options['repeat'])]
+                medians = {key: statistics.median(sample[key] for sample in samples) * 1000 for key in samples[0]}
+                self.stdout.write(
+                    f"{'on' if warm_up == '1' else 'off':<10}{medians['process']:>10.0f}{medians['import']:>10.0f}"
+                    f"{medians['first']:>10.1f}{medians['second']:>10.1f}"
+                )
+
+    def populate(self):
+        classroom = Classroom.objects.create(name='1A')
+        for i in range(20):
+            Student.objects.create(user=User.objects.create(username=f'student{i}', role='student'), student_class=classroom)
+        admin = User.objects.create_user(username='bench-admin', password='x', is_staff=True)
+        session = import_module(settings.SESSION_ENGINE).SessionStore()
+        session[SESSION_KEY] = str(admin.pk)
+        session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+        session[HASH_SESSION_KEY] = admin.get_session_auth_hash()
+        session.save()
+        return f'{settings.SESSION_COOKIE_NAME}={session.session_key}'
+
+    def run_child(self, env, path, cookie):
+        started = time.perf_counter()
+        output = subprocess.run(
+            [sys.executable, '-c', CHILD, path, cookie], env=env, cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout
+        sample = json.loads(output.strip().splitlines()[-1])
+        sample['process'] = time.perf_counter() - started
+        return sample
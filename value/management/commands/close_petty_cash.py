@@ -0,0 +1,27 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from value.pettycash import close_periods, current_balance
+
+
+class Command(BaseCommand):
+    help = "Snapshot petty cash balances for every ended month that is not closed yet."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--through', help="Last month to close, as YYYY-MM (default: previous month).")
+
+    def handle(self, *args, **options):
+        through = None
+        if options['through']:
+            try:
+                through = datetime.strptime(options['through'], '%Y-%m').date()
+            except ValueError:
+                raise CommandError("--through must look like YYYY-MM.")
+        try:
+            periods = close_periods(through)
+        except ValueError as e:
+            raise CommandError(str(e))
+        for period in periods:
+            self.stdout.write(f"Closed {period}: {period.opening_balance} -> {period.closing_balance}")
+        self.stdout.write(f"Current balance: {current_balance()}")
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from value.models import Classroom, Student
+from value.offboarding import BATCH_SIZE, offboard
+
+
+class Command(BaseCommand):
+    help = "Deactivate (or with --delete, remove) a classroom's students or the given students, in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--classroom', type=int, help="Id of the classroom whose students leave.")
+        parser.add_argument('--student', type=int, action='append', default=[], help="Student id; repeat for more.")
+        parser.add_argument('--delete', action='store_true', help="Delete the students and their records instead of deactivating them.")
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        if options['classroom'] is not None:
+            if not Classroom.objects.filter(pk=options['classroom']).exists():
+                raise CommandError(f"Classroom {options['classroom']} does not exist.")
+            students = Student.objects.filter(student_class_id=options['classroom'])
+        elif options['student']:
+            students = options['student']
+        else:
+            raise CommandError("Give --classroom or at least one --student.")
+
+        result = offboard(
+            students, delete=options['delete'], batch_size=options['batch_size'],
+            progress=lambda done, total: self.stdout.write(f"{done} of {total} students"),
+        )
+        rows = result.get('deleted', result.get('deactivated'))
+        counts = ', '.join(f"{table.removeprefix('value_')} {count}" for table, count in rows.items() if count)
+        verb = 'Deleted' if options['delete'] else 'Deactivated'
+        self.stdout.write(f"{verb} {result['students']} students" + (f": {counts}" if counts else "."))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from value.temporary import enable_incremental_vacuum, purge_expired
+
+
+class Command(BaseCommand):
+    help = "Delete expired Temporary rows in bounded batches and reclaim the freed space."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--max-batches', type=int, help="Stop after this many batches (default: until done).")
+        parser.add_argument('--pause', type=float, default=0.05, help="Seconds to sleep between batches.")
+        parser.add_argument('--no-vacuum', action='store_true')
+        parser.add_argument(
+            '--enable-incremental-vacuum', action='store_true',
+            help="Switch SQLite to auto_vacuum=INCREMENTAL first (one full VACUUM).",
+        )
+
+    def handle(self, *args, **options):
+        if options['enable_incremental_vacuum'] and enable_incremental_vacuum():
+            self.stdout.write("Enabled incremental vacuum.")
+        result = purge_expired(
+            batch_size=options['batch_size'],
+            max_batches=options['max_batches'],
+            pause=options['pause'],
+            vacuum=not options['no_vacuum'],
+        )
+        self.stdout.write(
+            f"Purged {result.rows} expired rows in {result.batches} batches, "
+            f"reclaimed {result.reclaimed_bytes / 1024:.1f} KiB"
+        )
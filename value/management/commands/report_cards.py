@@ -0,0 +1,34 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from value import reportcards
+from value.models import Classroom
+
+
+class Command(BaseCommand):
+    help = "Write report cards (one PDF per student) for some or all classrooms to a zip archive."
+
+    def add_arguments(self, parser):
+        parser.add_argument('out', help="Path of the zip archive to write.")
+        parser.add_argument('--classroom', type=int, action='append', dest='classrooms', help="Classroom id; repeatable.")
+        parser.add_argument('--from', dest='start', type=date.fromisoformat, help="First day of the term (YYYY-MM-DD).")
+        parser.add_argument('--to', dest='end', type=date.fromisoformat, help="Last day of the term (YYYY-MM-DD).")
+        parser.add_argument('--workers', type=int, help="Render processes; 1 renders in this process.")
+
+    def handle(self, *args, **options):
+        classrooms = None
+        if options['classrooms']:
+            classrooms = list(Classroom.objects.filter(pk__in=options['classrooms']).order_by('name'))
+            if len(classrooms) != len(set(options['classrooms'])):
+                raise CommandError("Unknown classroom id.")
+        stats = reportcards.build_archive(
+            options['out'], classrooms, options['start'], options['end'], workers=options['workers'],
+            progress=lambda done, total: self.stdout.write(f"{done}/{total}", ending='\r'),
+        )
+        self.stdout.write(
+            f"{stats['documents']} report cards from {stats['classrooms']} classrooms in "
+            f"{stats['seconds']:.1f} s ({stats['per_second']} per second) -> {options['out']}"
+        )
+        for failure in stats['failed']:
+            self.stderr.write(f"Skipped {failure['username']}: {failure['error']}")
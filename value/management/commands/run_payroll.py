@@ -0,0 +1,25 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from value.payroll import run_payroll
+
+
+class Command(BaseCommand):
+    help = "Compute TeacherSalary rows for one month from base salaries and attendance. Safe to re-run."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--month', help="Month to pay, as YYYY-MM (default: current month).")
+        parser.add_argument('--working-days', type=int, help="Override the number of working days in the month.")
+
+    def handle(self, *args, **options):
+        if options['month']:
+            try:
+                month = datetime.strptime(options['month'], '%Y-%m').date()
+            except ValueError:
+                raise CommandError("--month must look like YYYY-MM.")
+        else:
+            month = timezone.localdate()
+        run = run_payroll(month, working_days=options['working_days'])
+        self.stdout.write(f"Payroll {run}: {run.teacher_count} teachers, total {run.total}")
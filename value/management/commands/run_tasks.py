@@ -0,0 +1,66 @@
+import signal
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from value import tasks
+
+
+def _run(job):
+    try:
+        tasks.execute(job)
+    finally:
+        close_old_connections()
+
+
+class Command(BaseCommand):
+    help = "Run queued background tasks on a thread pool until stopped (or, with --once, until the queue is empty)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--poll-interval', type=float, default=1.0, help="Seconds to wait when the queue is empty.")
+        parser.add_argument('--once', action='store_true', help="Exit once no due task is left.")
+
+    def handle(self, *args, **options):
+        workers, poll = options['workers'], options['poll_interval']
+        worker_id = tasks.worker_name()
+        stopping = threading.Event()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(sig, lambda *_: stopping.set())
+
+        done = failed = 0
+        running = set()
+        last_beat = 0
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='task-worker') as pool:
+            while not stopping.is_set():
+                if time.monotonic() - last_beat >= tasks.get_option('HEARTBEAT'):
+                    # Our jobs are alive as long as this loop is; other workers' may not be.
+                    tasks.beat(worker_id)
+                    requeued = tasks.requeue_stale()
+                    if requeued:
+                        self.stdout.write(f"Requeued {requeued} stale tasks.")
+                    last_beat = time.monotonic()
+                free = workers - len(running)
+                jobs = tasks.claim(worker_id, limit=free) if free else []
+                running.update(pool.submit(_run, job) for job in jobs)
+                if not running:
+                    if options['once']:
+                        break
+                    stopping.wait(poll)
+                    continue
+                finished, running = wait(running, timeout=poll, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    if future.exception() is not None:
+                        failed += 1
+                        self.stderr.write(f"Worker error: {future.exception()!r}")
+                    done += 1
+            # Let the jobs already claimed finish, still beating for them; unclaimed ones stay queued.
+            while running:
+                tasks.beat(worker_id)
+                finished, running = wait(running, timeout=tasks.get_option('HEARTBEAT'))
+                done += len(finished)
+        close_old_connections()
+        self.stdout.write(f"Ran {done} tasks ({failed} worker errors).")
@@ -0,0 +1,78 @@
+import time
+
+from django.conf import settings
+
+from . import profiling
+from .permissions import Principal
+from .routers import pin_to_primary, replica_alias, unpin
+
+PIN_COOKIE = 'pin_primary'
+
+
+class ReplicaPinningMiddleware:
+    """
+    Keep a client on the primary database for REPLICA_PIN_SECONDS after any
+    unsafe request, so read-your-writes holds across the redirect that follows.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = self._pin(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            unpin(token)
+        return self._set_cookie(request, response)
+
+    def _pin(self, request):
+        try:
+            pinned_until = float(request.COOKIES.get(PIN_COOKIE, 0))
+        except ValueError:
+            pinned_until = 0
+        return pin_to_primary(self._unsafe(request) or pinned_until > time.time())
+
+    def _set_cookie(self, request, response):
+        if self._unsafe(request) and replica_alias():
+            seconds = getattr(settings, 'REPLICA_PIN_SECONDS', 5)
+            response.set_cookie(PIN_COOKIE, str(time.time() + seconds), max_age=seconds, httponly=True, samesite='Lax')
+        return response
+
+    @staticmethod
+    def _unsafe(request):
+        return request.method not in ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+
+class PrincipalMiddleware:
+    """Attach request.principal; must come after AuthenticationMiddleware."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        # Lazy, like request.user: nothing is loaded until a view asks.
+        request.principal = Principal(request.user)
+        return self.get_response(request)
+
+
+class ProfilingMiddleware:
+    """
+    Profile the requests value.profiling selects (settings.PROFILING). Put it
+    first so the whole stack below it, sessions and auth included, is covered.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        view = profiling.requested(request)
+        if view is None:
+            return self.get_response(request)
+        profiler = profiling.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.stop()
+        response['X-Profile'] = profiling.finish(profiler, request, response, view)
+        return response
@@ -0,0 +1,22 @@
+from django.db import migrations
+
+from value.history import drop_triggers, install_triggers
+
+
+def forwards(apps, schema_editor):
+    install_triggers(schema_editor.connection)
+
+
+def backwards(apps, schema_editor):
+    drop_triggers(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('value', '0003_classroom_capacity'),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, backwards),
+    ]
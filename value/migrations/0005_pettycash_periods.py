@@ -0,0 +1,51 @@
+# Generated by Django 5.2.4 on 2026-10-18 22:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('value', '0004_history_triggers'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PettyCashPeriod',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(unique=True)),
+                ('opening_balance', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('closing_balance', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('closed_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-month'],
+            },
+        ),
+        migrations.AddField(
+            model_name='pettycash',
+            name='category',
+            field=models.CharField(blank=True, default='', max_length=50),
+        ),
+        migrations.AlterField(
+            model_name='pettycash',
+            name='date',
+            field=models.DateField(auto_now_add=True, db_index=True),
+        ),
+        migrations.CreateModel(
+            name='PettyCashPeriodCategory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.CharField(blank=True, max_length=50)),
+                ('total_in', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('total_out', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('entries', models.IntegerField()),
+                ('period', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='categories', to='value.pettycashperiod')),
+            ],
+            options={
+                'unique_together': {('period', 'category')},
+            },
+        ),
+    ]
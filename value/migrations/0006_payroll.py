@@ -0,0 +1,44 @@
+# Generated by Django 5.2.4 on 2026-10-18 22:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('value', '0005_pettycash_periods'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PayrollRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(unique=True)),
+                ('working_days', models.IntegerField()),
+                ('teacher_count', models.IntegerField(default=0)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('run_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='teacher',
+            name='base_salary',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=8),
+        ),
+        migrations.AlterField(
+            model_name='teacherattendance',
+            name='date',
+            field=models.DateField(db_index=True),
+        ),
+        migrations.AddField(
+            model_name='teachersalary',
+            name='payroll_run',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='value.payrollrun'),
+        ),
+        migrations.AddConstraint(
+            model_name='teachersalary',
+            constraint=models.UniqueConstraint(fields=('payroll_run', 'teacher'), name='unique_teacher_salary_per_run'),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.2.4 on 2026-10-18 22:08
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('value', '0006_payroll'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='criticalhistory',
+            name='actor',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='audit_entries', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='criticalhistory',
+            name='diff',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='criticalhistory',
+            name='object_id',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='criticalhistory',
+            name='object_repr',
+            field=models.CharField(blank=True, max_length=200),
+        ),
+        migrations.AddField(
+            model_name='criticalhistory',
+            name='object_type',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AlterField(
+            model_name='criticalhistory',
+            name='action',
+            field=models.CharField(db_index=True, max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='criticalhistory',
+            name='created_at',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+        migrations.AddIndex(
+            model_name='criticalhistory',
+            index=models.Index(fields=['object_type', 'object_id'], name='audit_object_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='criticalhistory',
+            index=models.Index(fields=['actor', 'created_at'], name='audit_actor_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.4 on 2026-10-18 22:09
+
+import value.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('value', '0007_audit_log'),
+    ]
+
+    # Rows that exist already get NULL (they never expire); only new rows get the default.
+    # Adding the column with the default would date every existing row "TTL after migrate".
+    operations = [
+        migrations.AddField(
+            model_name='temporary',
+            name='expires_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='temporary',
+            name='expires_at',
+            field=models.DateTimeField(blank=True, db_index=True, default=value.models.default_temporary_expiry, null=True),
+        ),
+    ]
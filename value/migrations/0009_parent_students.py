@@ -0,0 +1,47 @@
+# Generated by Django 5.2.4 on 2026-10-18 22:23
+
+from django.db import migrations, models
+
+
+def copy_student_links(apps, schema_editor):
+    Parent = apps.get_model('value', 'Parent')
+    Link = Parent.students.through
+    Link.objects.bulk_create(
+        Link(parent_id=parent_id, student_id=student_id)
+        for parent_id, student_id in Parent.objects.filter(student__isnull=False).values_list('id', 'student_id')
+    )
+
+
+def restore_student_links(apps, schema_editor):
+    # A OneToOneField keeps one child per parent (and one parent per child).
+    Parent = apps.get_model('value', 'Parent')
+    taken = set()
+    for link in Parent.students.through.objects.order_by('id'):
+        if link.student_id not in taken and not Parent.objects.filter(pk=link.parent_id, student__isnull=False).exists():
+            Parent.objects.filter(pk=link.parent_id).update(student_id=link.student_id)
+            taken.add(link.student_id)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('value', '0008_temporary_expiry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='classroom',
+            name='fee',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='parent',
+            name='students',
+            field=models.ManyToManyField(blank=True, related_name='parents', to='value.student'),
+        ),
+        migrations.RunPython(copy_student_links, restore_student_links),
+        migrations.RemoveField(
+            model_name='parent',
+            name='student',
+        ),
+    ]
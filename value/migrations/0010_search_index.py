@@ -0,0 +1,22 @@
+from django.db import migrations
+
+from value.search import drop_search, install_search
+
+
+def forwards(apps, schema_editor):
+    install_search(schema_editor.connection)
+
+
+def backwards(apps, schema_editor):
+    drop_search(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('value', '0009_parent_students'),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, backwards),
+    ]
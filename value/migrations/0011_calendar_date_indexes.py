@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-18 23:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('value', '0010_search_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='event',
+            name='date',
+            field=models.DateField(db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='exam',
+            name='date',
+            field=models.DateField(db_index=True),
+        ),
+    ]
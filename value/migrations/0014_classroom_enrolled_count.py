@@ -0,0 +1,34 @@
+# Generated by Django 5.2.4 on 2026-10-18 23:21
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def count_enrolled(apps, schema_editor):
+    Classroom = apps.get_model('value', 'Classroom')
+    Student = apps.get_model('value', 'Student')
+    counts = (
+        Student.objects.filter(student_class=OuterRef('pk'))
+        .order_by()
+        .values('student_class')
+        .annotate(n=Count('pk'))
+        .values('n')
+    )
+    Classroom.objects.update(enrolled_count=Coalesce(Subquery(counts), Value(0), output_field=IntegerField()))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('value', '0013_academic_year_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='classroom',
+            name='enrolled_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_enrolled, migrations.RunPython.noop),
+    ]
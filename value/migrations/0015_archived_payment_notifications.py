@@ -0,0 +1,57 @@
+# Generated by Django 5.2.4 on 2026-10-19 00:28
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def split_approvals(apps, schema_editor):
+    # Payments archived so far kept only their latest approval; it becomes their one notification.
+    ArchivedStudentPayment = apps.get_model('value', 'ArchivedStudentPayment')
+    ArchivedPaymentNotifications = apps.get_model('value', 'ArchivedPaymentNotifications')
+    payments = ArchivedStudentPayment.objects.filter(approved_at__isnull=False).values_list('pk', 'approved_by_id', 'approved_at')
+    ArchivedPaymentNotifications.objects.bulk_create(
+        (ArchivedPaymentNotifications(payment_id=pk, approved_by_id=user, approved_at=at) for pk, user, at in payments.iterator()),
+        batch_size=1000,
+    )
+
+
+def keep_latest_approval(apps, schema_editor):
+    ArchivedStudentPayment = apps.get_model('value', 'ArchivedStudentPayment')
+    ArchivedPaymentNotifications = apps.get_model('value', 'ArchivedPaymentNotifications')
+    latest = ArchivedPaymentNotifications.objects.filter(payment=models.OuterRef('pk')).order_by('-approved_at', '-id')
+    ArchivedStudentPayment.objects.update(
+        approved_by=models.Subquery(latest.values('approved_by')[:1]),
+        approved_at=models.Subquery(latest.values('approved_at')[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('value', '0014_classroom_enrolled_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedPaymentNotifications',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('approved_at', models.DateTimeField()),
+                ('approved_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('payment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to='value.archivedstudentpayment')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.RunPython(split_approvals, keep_latest_approval),
+        migrations.RemoveField(
+            model_name='archivedstudentpayment',
+            name='approved_at',
+        ),
+        migrations.RemoveField(
+            model_name='archivedstudentpayment',
+            name='approved_by',
+        ),
+    ]
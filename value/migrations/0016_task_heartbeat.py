@@ -0,0 +1,25 @@
+# Generated by Django 5.2.4 on 2026-10-19 00:38
+
+from django.db import migrations, models
+
+
+def beat_from_start(apps, schema_editor):
+    # Jobs running during the upgrade count as alive since they started.
+    Task = apps.get_model('value', 'Task')
+    Task.objects.filter(status='running').update(heartbeat_at=models.F('started_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('value', '0015_archived_payment_notifications'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(beat_from_start, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,10 @@
-from django.db import models
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
 from django.contrib.auth.models import AbstractUser
+from django.utils import timezone
 
 
 # 🔷 User model
@@ -17,10 +22,42 @@ class User(AbstractUser):
 class Classroom(models.Model):
     name = models.CharField(max_length=50)
     capacity = models.IntegerField(default=30)
+    fee = models.DecimalField(max_digits=10, decimal_places=2, default=0)  # due per student
+    enrolled_count = models.IntegerField(default=0, editable=False)  # kept by value.enrollment
 
     def __str__(self):
         return self.name
 
+    def clean(self):
+        stored = Classroom.objects.filter(pk=self.pk).values_list('capacity', 'enrolled_count').first()
+        if stored and self.capacity is not None and self.capacity < min(stored):  # lowered below the enrolled
+            raise ValidationError({'capacity': CapacityBelowEnrollment.message.format(stored[1])})
+
+    def save(self, *args, update_fields=None, **kwargs):
+        # enrolled_count only changes through value.enrollment's UPDATEs; writing back the
+        # count this instance was loaded with would undo enrollments made since. The capacity
+        # is lowered with the same kind of conditional UPDATE, so it can't drop below them.
+        if self._state.adding:
+            return super().save(*args, update_fields=update_fields, **kwargs)
+        if update_fields is None:
+            update_fields = [field.name for field in self._meta.concrete_fields if not field.primary_key]
+        with transaction.atomic():
+            if 'capacity' in update_fields:
+                fits = models.Q(enrolled_count__lte=self.capacity) | models.Q(capacity__lte=self.capacity)
+                if not Classroom.objects.filter(fits, pk=self.pk).update(capacity=self.capacity):
+                    self.refresh_from_db(fields=['enrolled_count'])
+                    raise CapacityBelowEnrollment(self)
+            update_fields = [name for name in update_fields if name != 'enrolled_count']
+            super().save(*args, update_fields=update_fields, **kwargs)
+
+
+class CapacityBelowEnrollment(ValueError):
+    message = "{} students are enrolled; move some out before lowering the capacity."
+
+    def __init__(self, classroom):
+        self.classroom = classroom
+        super().__init__(self.message.format(classroom.enrolled_count))
+
 
 class Subject(models.Model):
     name = models.CharField(max_length=50)
@@ -35,6 +72,7 @@ class Teacher(models.Model):
     subjects = models.ManyToManyField(Subject)
     classes = models.ManyToManyField(Classroom)
     Grade = models.CharField(max_length=10, blank=True, null=True)
+    base_salary = models.DecimalField(max_digits=8, decimal_places=2, default=0)
 
     def __str__(self):
         return self.user.username
@@ -50,7 +88,7 @@ class Student(models.Model):
 
 class Parent(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
-    student = models.OneToOneField(Student, on_delete=models.SET_NULL, null=True)
+    students = models.ManyToManyField(Student, related_name='parents', blank=True)
 
     def __str__(self):
         return self.user.username
@@ -59,20 +97,38 @@ class Parent(models.Model):
 # 🔷 Attendance & Salary
 class TeacherAttendance(models.Model):
     teacher = models.ForeignKey(Teacher, on_delete=models.CASCADE)
-    date = models.DateField()
+    date = models.DateField(db_index=True)
     present = models.BooleanField(default=True)
 
 
 class StudentAttendance(models.Model):
     student = models.ForeignKey(Student, on_delete=models.CASCADE)
-    date = models.DateField()
+    date = models.DateField(db_index=True)
     present = models.BooleanField(default=True)
 
 
+# One row per monthly payroll run; see value.payroll.run_payroll().
+class PayrollRun(models.Model):
+    month = models.DateField(unique=True)  # first day of the month
+    working_days = models.IntegerField()
+    teacher_count = models.IntegerField(default=0)
+    total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    run_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.month.strftime('%Y-%m')
+
+
 class TeacherSalary(models.Model):
     teacher = models.ForeignKey(Teacher, on_delete=models.CASCADE)
     amount = models.DecimalField(max_digits=8, decimal_places=2)
     date = models.DateField()
+    payroll_run = models.ForeignKey(PayrollRun, on_delete=models.CASCADE, null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['payroll_run', 'teacher'], name='unique_teacher_salary_per_run'),
+        ]
 
 
 class TeacherSalaryHistory(models.Model):
@@ -85,7 +141,7 @@ class TeacherSalaryHistory(models.Model):
 # 🔷 Exams
 class Exam(models.Model):
     name = models.CharField(max_length=100)
-    date = models.DateField()
+    date = models.DateField(db_index=True)
 
 
 class StudentExam(models.Model):
@@ -122,7 +178,7 @@ class EventCategoryType(models.Model):
 # in value/models.py
 class Event(models.Model):
     title = models.CharField(max_length=200)
-    date = models.DateField()
+    date = models.DateField(db_index=True)
     description = models.TextField(blank=True)
     # ... other fields ...
 
@@ -131,7 +187,7 @@ class Event(models.Model):
 class StudentPayment(models.Model):
     student = models.ForeignKey(Student, on_delete=models.CASCADE)
     amount = models.DecimalField(max_digits=8, decimal_places=2)
-    date = models.DateField()
+    date = models.DateField(db_index=True)
 
 
 class StudentPaymentHistory(models.Model):
@@ -152,13 +208,13 @@ class Chat(models.Model):
     sender = models.ForeignKey(User, related_name='sent_chats', on_delete=models.CASCADE)
     receiver = models.ForeignKey(User, related_name='received_chats', on_delete=models.CASCADE)
     message = models.TextField()
-    sent_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(auto_now_add=True, db_index=True)
 
 
 class GroupMessage(models.Model):
     sender = models.ForeignKey(User, on_delete=models.CASCADE)
     message = models.TextField()
-    sent_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(auto_now_add=True, db_index=True)
 
 
 class MyFriends(models.Model):
@@ -183,14 +239,170 @@ class OnlineChat(models.Model):
     is_online = models.BooleanField(default=False)
 
 
+# Written in batches by value.audit; created_at is set when the action is logged,
+# not when the batch reaches the database.
 class CriticalHistory(models.Model):
-    action = models.CharField(max_length=255)
-    created_at = models.DateTimeField(auto_now_add=True)
+    action = models.CharField(max_length=255, db_index=True)
+    actor = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='audit_entries')
+    object_type = models.CharField(max_length=100, blank=True)
+    object_id = models.CharField(max_length=64, blank=True)
+    object_repr = models.CharField(max_length=200, blank=True)
+    diff = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['object_type', 'object_id'], name='audit_object_idx'),
+            models.Index(fields=['actor', 'created_at'], name='audit_actor_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.action} {self.object_repr}".strip()
+
+
+def default_temporary_expiry():
+    return timezone.now() + timedelta(seconds=settings.TEMPORARY_TTL)
+
+
+class LiveTemporaryManager(models.Manager):
+    # Temporary.live: leaves out expired rows that value.temporary.purge_expired() hasn't deleted yet.
+    def get_queryset(self):
+        return super().get_queryset().filter(
+            models.Q(expires_at__isnull=True) | models.Q(expires_at__gt=timezone.now())
+        )
 
 
 class Temporary(models.Model):
     data = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(default=default_temporary_expiry, null=True, blank=True, db_index=True)  # null: never expires
+
+    objects = models.Manager()
+    live = LiveTemporaryManager()
+
+    @property
+    def is_expired(self):
+        return self.expires_at is not None and self.expires_at <= timezone.now()
+
+
+# 🔷 Background tasks
+# Queued by value.tasks.enqueue() and run by the run_tasks worker command.
+class Task(models.Model):
+    QUEUED, RUNNING, SUCCEEDED, FAILED = 'queued', 'running', 'succeeded', 'failed'
+    STATUS_CHOICES = [(QUEUED, 'Queued'), (RUNNING, 'Running'), (SUCCEEDED, 'Succeeded'), (FAILED, 'Failed')]
+
+    name = models.CharField(max_length=200)
+    args = models.JSONField(default=list, blank=True)
+    kwargs = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    priority = models.IntegerField(default=0)  # higher runs first
+    run_after = models.DateTimeField(default=timezone.now)
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=3)
+    progress = models.FloatField(default=0)  # 0..1
+    progress_message = models.CharField(max_length=200, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='tasks')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    locked_by = models.CharField(max_length=100, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)  # last sign of life from the running worker
+
+    class Meta:
+        indexes = [
+            # The worker's claim query: queued tasks that are due, best priority first.
+            models.Index(fields=['status', '-priority', 'run_after'], name='task_claim_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
+
+
+# 🔷 Academic-year archive
+# value.archive.archive_years() moves the rows of closed academic years out of
+# the growing tables into these, keeping their ids. Archived rows are read-only.
+class AcademicYear(models.Model):
+    start = models.DateField(unique=True)
+    end = models.DateField()  # first day of the next year
+    archived_at = models.DateTimeField(auto_now_add=True)
+    rows = models.JSONField(default=dict)  # archived rows per table
+
+    class Meta:
+        ordering = ['-start']
+
+    def __str__(self):
+        return f"{self.start.year}/{str(self.end.year)[-2:]}"
+
+
+class ReadOnlyError(Exception):
+    pass
+
+
+class ArchiveQuerySet(models.QuerySet):
+    def update(self, **kwargs):
+        raise ReadOnlyError(f"{self.model.__name__} rows are read-only.")
+
+    def delete(self):
+        raise ReadOnlyError(f"{self.model.__name__} rows are read-only.")
+
+
+class ArchivedRecord(models.Model):
+    objects = ArchiveQuerySet.as_manager()
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        raise ReadOnlyError(f"{type(self).__name__} rows are read-only.")
+
+    def delete(self, *args, **kwargs):
+        raise ReadOnlyError(f"{type(self).__name__} rows are read-only.")
+
+
+class ArchivedStudentAttendance(ArchivedRecord):
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='+')
+    date = models.DateField(db_index=True)
+    present = models.BooleanField()
+
+
+class ArchivedTeacherAttendance(ArchivedRecord):
+    teacher = models.ForeignKey(Teacher, on_delete=models.CASCADE, related_name='+')
+    date = models.DateField(db_index=True)
+    present = models.BooleanField()
+
+
+class ArchivedStudentPayment(ArchivedRecord):
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='+')
+    amount = models.DecimalField(max_digits=8, decimal_places=2)
+    date = models.DateField(db_index=True)
+
+
+class ArchivedStudentPaymentHistory(ArchivedRecord):
+    payment = models.ForeignKey(ArchivedStudentPayment, on_delete=models.CASCADE, related_name='history')
+    changed_at = models.DateTimeField()
+    old_amount = models.DecimalField(max_digits=8, decimal_places=2)
+    new_amount = models.DecimalField(max_digits=8, decimal_places=2)
+
+
+class ArchivedPaymentNotifications(ArchivedRecord):
+    payment = models.ForeignKey(ArchivedStudentPayment, on_delete=models.CASCADE, related_name='notifications')
+    approved_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='+')
+    approved_at = models.DateTimeField()
+
+
+class ArchivedChat(ArchivedRecord):
+    sender = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    receiver = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    message = models.TextField()
+    sent_at = models.DateTimeField(db_index=True)
+
+
+class ArchivedGroupMessage(ArchivedRecord):
+    sender = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    message = models.TextField()
+    sent_at = models.DateTimeField(db_index=True)
 
 
 # 🔷 Subject Routine
@@ -205,13 +417,40 @@ class SubjectRoutine(models.Model):
 class PettyCash(models.Model):
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     description = models.TextField()
-    date = models.DateField(auto_now_add=True)      
+    category = models.CharField(max_length=50, blank=True, default='')
+    date = models.DateField(auto_now_add=True, db_index=True)
     
 class PettyCashHistory(models.Model):
     pettyCash = models.ForeignKey(PettyCash, on_delete=models.CASCADE)
     changed_at = models.DateTimeField(auto_now_add=True)
     old_amount = models.DecimalField(max_digits=10, decimal_places=2)
     new_amount = models.DecimalField(max_digits=10, decimal_places=2)   
+
+
+# Month-end snapshots written by value.pettycash.close_periods(); the current
+# balance is the last closing balance plus the entries of the open period.
+class PettyCashPeriod(models.Model):
+    month = models.DateField(unique=True)  # first day of the month
+    opening_balance = models.DecimalField(max_digits=12, decimal_places=2)
+    closing_balance = models.DecimalField(max_digits=12, decimal_places=2)
+    closed_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-month']
+
+    def __str__(self):
+        return self.month.strftime('%Y-%m')
+
+
+class PettyCashPeriodCategory(models.Model):
+    period = models.ForeignKey(PettyCashPeriod, related_name='categories', on_delete=models.CASCADE)
+    category = models.CharField(max_length=50, blank=True)
+    total_in = models.DecimalField(max_digits=12, decimal_places=2)
+    total_out = models.DecimalField(max_digits=12, decimal_places=2)
+    entries = models.IntegerField()
+
+    class Meta:
+        unique_together = ('period', 'category')
     
 class Grade(models.Model):
     name = models.CharField(max_length=50)
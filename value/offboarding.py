@@ -0,0 +1,125 @@
+"""
+Bulk student offboarding: a graduating class, or any list of students.
+
+offboard() works through the students in batches, each batch in its own
+short transaction, as value.archive does. By default their records stay: the
+accounts are deactivated and the classroom places freed, so attendance, marks
+and payments remain in reports. With delete=True the students, their user
+accounts and everything that cascades from them are removed.
+
+QuerySet.delete() would have Django's collector load every related row
+(attendance, marks and grades, payments with their history, chat, friends...)
+into Python and send a signal per row. delete_rows() walks the same relations
+once and issues one DELETE, or UPDATE ... SET NULL, per related table. The
+batch's ids are in a subquery, so memory holds one batch of ids whatever the
+students have accumulated. No post_delete signals are sent; their work is done
+once per batch instead: classroom places are released, cached users dropped
+and data versions bumped. The search index follows through its database
+triggers.
+"""
+from collections import Counter
+
+from django.db import connection, models, transaction
+from django.db.models import QuerySet
+from django.db.models.deletion import get_candidate_relations_to_delete
+
+from . import audit, enrollment
+from .backends import forget_users
+from .models import Student, User
+from .versions import bump
+
+BATCH_SIZE = 500
+
+
+def _quote(name):
+    return connection.ops.quote_name(name)
+
+
+def _delete(cursor, model, where, params, counts, touched, path=()):
+    # Children first: each subquery below reads parent rows that still exist.
+    if model in path:
+        raise ValueError(f"Cascade loop through {model.__name__}; use QuerySet.delete().")
+    table = _quote(model._meta.db_table)
+    for relation in get_candidate_relations_to_delete(model._meta):
+        field, related = relation.field, relation.related_model
+        selected = f'SELECT {_quote(field.target_field.column)} FROM {table} WHERE {where}'
+        condition = f'{_quote(field.column)} IN ({selected})'
+        on_delete = relation.on_delete
+        if on_delete is models.CASCADE:
+            _delete(cursor, related, condition, params, counts, touched, (*path, model))
+        elif on_delete is models.SET_NULL:
+            cursor.execute(f'UPDATE {_quote(related._meta.db_table)} SET {_quote(field.column)} = NULL WHERE {condition}', params)
+            touched.add(related)
+        elif on_delete is not models.DO_NOTHING:
+            raise ValueError(f"{related.__name__}.{field.name}: on_delete={on_delete.__name__} is not supported here.")
+    cursor.execute(f'DELETE FROM {table} WHERE {where}', params)
+    counts[model._meta.db_table] += cursor.rowcount
+    touched.add(model)
+
+
+def delete_rows(model, ids):
+    """
+    Delete the ``model`` rows with primary keys ``ids``, and what cascades
+    from them, in set-based SQL. Returns a Counter of deleted rows per table.
+    Sends no signals and bumps the data versions of every table it wrote.
+    """
+    counts, touched = Counter(), set()
+    if ids:
+        where = f'{_quote(model._meta.pk.column)} IN ({", ".join(["%s"] * len(ids))})'
+        with transaction.atomic(), connection.cursor() as cursor:
+            _delete(cursor, model, where, list(ids), counts, touched)
+        bump(*touched)
+    return counts
+
+
+def _batches(students, size):
+    if isinstance(students, QuerySet):
+        # By primary key from where the last batch ended, so rows already handled are never re-read.
+        last = 0
+        while ids := list(students.filter(pk__gt=last).order_by('pk').values_list('pk', flat=True)[:size]):
+            yield ids
+            last = ids[-1]
+    else:
+        ids = sorted({getattr(student, 'pk', student) for student in students})
+        for start in range(0, len(ids), size):
+            yield ids[start:start + size]
+
+
+def _offboard_batch(ids, delete):
+    user_ids = list(Student.objects.filter(pk__in=ids).values_list('user_id', flat=True))
+    with transaction.atomic():
+        if delete:
+            enrollment.release_places(ids)
+            counts = delete_rows(User, user_ids)
+        else:
+            enrollment.enroll_many(ids, None)
+            counts = Counter({User._meta.db_table: User.objects.filter(pk__in=user_ids).update(is_active=False)})
+            bump(User)
+    forget_users(user_ids)  # the cached copies request.user is served from
+    return len(user_ids), counts
+
+
+def offboard(students, delete=False, batch_size=BATCH_SIZE, progress=None, actor=None):
+    """
+    Offboard ``students``: a Student queryset (e.g. a classroom's), or Student
+    objects or ids. ``progress(done, total)`` is called after each batch.
+    Returns how many students were offboarded and the rows written per table.
+    """
+    total = students.count() if isinstance(students, QuerySet) else len(students)
+    done, rows = 0, Counter()
+    for ids in _batches(students, batch_size):
+        count, counts = _offboard_batch(ids, delete)
+        done += count
+        rows.update(counts)
+        if progress:
+            progress(done, total)
+    audit.log(
+        'delete_students' if delete else 'deactivate_students', actor=actor,
+        object_repr=f'{done} students', diff={'students': done, 'rows': dict(rows)},
+    )
+    return {'students': done, 'deleted' if delete else 'deactivated': dict(rows)}
+
+
+def offboard_classroom(classroom, **kwargs):
+    """Offboard every student of ``classroom``, e.g. a year group that has graduated; see offboard()."""
+    return offboard(Student.objects.filter(student_class=classroom), **kwargs)
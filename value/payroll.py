@@ -0,0 +1,100 @@
+"""
+Monthly payroll over TeacherSalary.
+
+A run computes every teacher's pay from base_salary and one aggregate query
+over TeacherAttendance, then bulk-writes the TeacherSalary rows. Re-running a
+month updates the same rows in place; amount changes reach
+TeacherSalaryHistory through the database triggers (see value.history).
+"""
+import calendar
+from datetime import date
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q
+
+from .models import PayrollRun, Teacher, TeacherSalary
+from .versions import bump
+
+CENT = Decimal('0.01')
+BATCH_SIZE = 500
+
+
+def absence_deduction(base_salary, rollup, working_days):
+    """Unpaid absences: one daily rate per day marked absent."""
+    return base_salary / working_days * rollup['absent_days']
+
+
+def unrecorded_days_deduction(base_salary, rollup, working_days):
+    """Working days without any attendance record count as absences."""
+    missing = max(working_days - rollup['present_days'] - rollup['absent_days'], 0)
+    return base_salary / working_days * missing
+
+
+DEFAULT_RULES = [absence_deduction]
+
+
+def working_days_in(month):
+    """Monday to Friday count, unless PAYROLL_WORKING_DAYS is set."""
+    configured = getattr(settings, 'PAYROLL_WORKING_DAYS', None)
+    if configured:
+        return configured
+    days = calendar.monthrange(month.year, month.month)[1]
+    return sum(1 for day in range(1, days + 1) if date(month.year, month.month, day).weekday() < 5)
+
+
+def compute_amount(base_salary, rollup, working_days, rules):
+    deductions = sum((rule(base_salary, rollup, working_days) for rule in rules), Decimal('0'))
+    return max(base_salary - deductions, Decimal('0')).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+@transaction.atomic
+def run_payroll(month, rules=None, working_days=None):
+    """
+    Compute and store the salaries of all teachers with a base salary for the
+    month containing ``month``. Safe to re-run; returns the PayrollRun.
+    """
+    rules = DEFAULT_RULES if rules is None else rules
+    month = month.replace(day=1)
+    month_end = month.replace(day=calendar.monthrange(month.year, month.month)[1])
+    working_days = working_days or working_days_in(month)
+
+    in_month = Q(teacherattendance__date__gte=month, teacherattendance__date__lte=month_end)
+    rollups = (
+        Teacher.objects.filter(base_salary__gt=0)
+        .annotate(
+            present_days=Count('teacherattendance', filter=in_month & Q(teacherattendance__present=True)),
+            absent_days=Count('teacherattendance', filter=in_month & Q(teacherattendance__present=False)),
+        )
+        .values('id', 'base_salary', 'present_days', 'absent_days')
+    )
+
+    run, _ = PayrollRun.objects.select_for_update().get_or_create(month=month, defaults={'working_days': working_days})
+    existing = {row.teacher_id: row for row in TeacherSalary.objects.filter(payroll_run=run).only('id', 'teacher_id', 'amount')}
+
+    to_create, to_update, total, count = [], [], Decimal('0'), 0
+    # Streamed in chunks (a server-side cursor on PostgreSQL) rather than loaded at once.
+    for rollup in rollups.iterator(chunk_size=2000):
+        amount = compute_amount(rollup['base_salary'], rollup, working_days, rules)
+        total += amount
+        count += 1
+        salary = existing.pop(rollup['id'], None)
+        if salary is None:
+            to_create.append(TeacherSalary(teacher_id=rollup['id'], amount=amount, date=month_end, payroll_run=run))
+        elif salary.amount != amount:
+            salary.amount = amount
+            to_update.append(salary)
+
+    TeacherSalary.objects.bulk_create(to_create, batch_size=BATCH_SIZE)
+    TeacherSalary.objects.bulk_update(to_update, ['amount'], batch_size=BATCH_SIZE)
+    if existing:
+        # Teachers whose base salary was cleared since the last run.
+        TeacherSalary.objects.filter(pk__in=[row.pk for row in existing.values()]).delete()
+
+    run.working_days = working_days
+    run.teacher_count = count
+    run.total = total
+    run.save()
+    bump(TeacherSalary)
+    return run
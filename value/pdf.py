@@ -0,0 +1,126 @@
+"""
+Report cards as PDF documents, laid out with fpdf2 (pip install fpdf2).
+
+Without a font, text is set in the standard Helvetica, which every PDF
+viewer has and which covers Latin-1. Names in other scripts need a Unicode
+TrueType font that has them, passed as ``fonts`` (regular, then bold). fpdf2
+embeds the glyphs a document uses with a /ToUnicode map, so the text can
+still be searched and copied. With uharfbuzz installed (pip install
+uharfbuzz), scripts that need shaping or right-to-left layout, such as
+Arabic, Hebrew and the Indic scripts, are laid out by HarfBuzz; without it
+they are refused.
+
+Text that can't be set correctly raises UnsupportedText instead of coming
+out as '?' or as empty boxes: text outside Latin-1 when no font is given,
+characters the font doesn't have, and shaped scripts without uharfbuzz.
+
+This module imports nothing from Django, so report-card worker processes can
+load it without settings.
+"""
+import unicodedata
+
+from fpdf import FPDF
+from fpdf.errors import FPDFUnicodeEncodingException
+
+try:
+    import uharfbuzz
+except ImportError:  # optional: only needed for shaped and right-to-left scripts
+    uharfbuzz = None
+
+MARGIN = 50  # points
+FAMILY = 'report-card'
+# Date, exam, marks, grade.
+COLUMNS = (90, 290, 70, 45)
+# Scripts whose letters change shape or order in context; placed one by one, they come out wrong.
+COMPLEX_SCRIPTS = ((0x0900, 0x0DFF), (0x0F00, 0x109F), (0x1780, 0x17FF))  # Indic, Tibetan, Myanmar, Khmer
+
+
+class UnsupportedText(ValueError):
+    def __init__(self, text, reason):
+        self.text = text
+        super().__init__(f"Cannot set {text!r} in a PDF: {reason}.")
+
+
+def needs_shaping(text):
+    return any(
+        unicodedata.bidirectional(char) in ('R', 'AL')
+        or any(low <= ord(char) <= high for low, high in COMPLEX_SCRIPTS)
+        for char in text
+    )
+
+
+class ReportCardPDF(FPDF):
+    def __init__(self, fonts=()):
+        super().__init__(unit='pt', format='A4')
+        self.set_margins(MARGIN, MARGIN)
+        self.set_auto_page_break(True, margin=MARGIN)
+        regular, bold = [*fonts, None, None][:2]
+        self.unicode = bool(regular)
+        if self.unicode:
+            self.add_font(FAMILY, '', regular)
+            self.add_font(FAMILY, 'B', bold or regular)
+            if uharfbuzz is not None:
+                self.set_text_shaping(True)
+
+    def write_cell(self, width, text, size=10, bold=False, align='L'):
+        text = str(text)
+        self.set_font(FAMILY if self.unicode else 'helvetica', 'B' if bold else '', size)
+        if self.unicode:
+            missing = sorted({char for char in text if ord(char) not in self.current_font.cmap})
+            if missing:
+                raise UnsupportedText(text, f"the font has no glyph for {''.join(missing)!r}")
+            if uharfbuzz is None and needs_shaping(text):
+                raise UnsupportedText(text, "this script needs shaping; install uharfbuzz")
+        try:
+            self.cell(width, size * 1.4, text, align=align)
+        except FPDFUnicodeEncodingException:
+            raise UnsupportedText(text, "it is outside Latin-1 and no TrueType font was given") from None
+
+
+def report_card(card, fonts=()):
+    """
+    Render one report card (a dict built by value.reportcards) as PDF bytes.
+    Long exam lists continue on further pages. ``fonts``: paths of a regular
+    and optionally a bold TrueType font, for text beyond Latin-1.
+    """
+    doc = ReportCardPDF(fonts)
+    doc.set_title(f"Report card - {card['name']}")
+    doc.add_page()
+    doc.write_cell(0, 'Report card', size=20, bold=True)
+    doc.ln(30)
+    doc.write_cell(0, card['name'], size=13, bold=True)
+    doc.ln(20)
+    if card['days']:
+        attendance = f"{card['present']} of {card['days']} days ({100 * card['present'] / card['days']:.1f}%)"
+    else:
+        attendance = 'not recorded'
+    for line in (f"Class: {card['classroom']}", f"Term: {card['term']}", f"Attendance: {attendance}"):
+        doc.write_cell(0, line)
+        doc.ln(14)
+    doc.ln(20)
+
+    for width, heading in zip(COLUMNS, ('Date', 'Exam', 'Marks', 'Grade')):
+        doc.write_cell(width, heading, bold=True)
+    doc.ln(16)
+    doc.line(MARGIN, doc.get_y() - 2, doc.w - MARGIN, doc.get_y() - 2)
+    for day, exam, marks, grade in card['exams']:
+        for width, value in zip(COLUMNS, (day, exam[:50], marks, grade or '-')):
+            doc.write_cell(width, value)
+        doc.ln(15)
+    if not card['exams']:
+        doc.write_cell(0, 'No exams this term.')
+    else:
+        doc.line(MARGIN, doc.get_y() + 2, doc.w - MARGIN, doc.get_y() + 2)
+        doc.ln(6)
+        doc.write_cell(COLUMNS[0], '')
+        doc.write_cell(COLUMNS[1], 'Average', bold=True)
+        doc.write_cell(COLUMNS[2], f"{card['average']:.1f}", bold=True)
+    return bytes(doc.output())
+
+
+def render_card(card, fonts=()):
+    """(PDF bytes, None), or (None, the reason) when ``card`` can't be rendered; for process pools."""
+    try:
+        return report_card(card, fonts), None
+    except UnsupportedText as e:
+        return None, str(e)
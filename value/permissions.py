@@ -0,0 +1,75 @@
+"""
+Role checks for the views.
+
+request.principal (set by PrincipalMiddleware) wraps request.user and loads
+the matching Student/Teacher/Parent profile at most once per request, with
+its relations joined in. The profile is also cached across requests, keyed
+by the data version of the profile tables, so a repeat visit authorizes
+without touching the database.
+"""
+from functools import cached_property, wraps
+
+from django.contrib import messages
+from django.core.cache import cache
+from django.shortcuts import redirect
+
+from .models import Classroom, Parent, Student, Teacher
+from .routers import PRIMARY
+from .versions import get_version
+
+PROFILE_KEY = 'principal-profile:{}:{}'
+PROFILE_TIMEOUT = 60 * 60
+_MISSING = object()
+
+PROFILE_QUERYSETS = {
+    'student': lambda: Student.objects.select_related('user', 'student_class'),
+    'teacher': lambda: Teacher.objects.select_related('user'),
+    'parent': lambda: Parent.objects.select_related('user'),  # children: see value.portal
+}
+
+
+class Principal:
+    def __init__(self, user):
+        self.user = user
+
+    @property
+    def is_admin(self):
+        return self.user.is_authenticated and (self.user.is_superuser or self.user.is_staff)
+
+    @property
+    def role(self):
+        return getattr(self.user, 'role', None)
+
+    def has_role(self, *roles):
+        """Staff and superusers pass every check, as they always have."""
+        return self.is_admin or (self.user.is_authenticated and self.role in roles)
+
+    @cached_property
+    def profile(self):
+        queryset = PROFILE_QUERYSETS.get(self.role)
+        if queryset is None or not self.user.is_authenticated:
+            return None
+        key = PROFILE_KEY.format(self.user.pk, get_version(Student, Teacher, Parent, Classroom))
+        cached = cache.get(key, _MISSING)
+        if cached is not _MISSING:
+            return cached
+        # From the primary, as it is cached under the new version (see value/routers.py).
+        profile = queryset().using(PRIMARY).filter(user=self.user).first()
+        cache.set(key, profile, PROFILE_TIMEOUT)
+        return profile
+
+
+def role_required(*roles, message="You do not have permission to access this page.", redirect_to='value:home'):
+    """
+    Allow staff, superusers and users whose role is in ``roles``; everyone
+    else gets ``message`` and is redirected. Use below @login_required.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not request.principal.has_role(*roles):
+                messages.warning(request, message)
+                return redirect(redirect_to)
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
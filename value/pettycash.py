@@ -0,0 +1,148 @@
+"""
+Petty cash balance and period close.
+
+Closed months are summarised into PettyCashPeriod / PettyCashPeriodCategory,
+so the current balance and the monthly and per-category reports never have to
+rescan the whole PettyCash table, only the entries of the open period.
+Saving or deleting an entry of a closed month reopens that month and the
+ones after it, so the snapshots never disagree with the entries; close them
+again with close_periods(). QuerySet.update() bypasses this: call
+reopen_periods() after changing old entries that way.
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, Q, Sum, Value
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_delete, post_save
+from django.utils import timezone
+
+from .models import PettyCash, PettyCashPeriod, PettyCashPeriodCategory
+from .versions import bump
+
+ZERO = Decimal('0.00')
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def next_month(month):
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def _sum(expression, **filters):
+    return Coalesce(
+        Sum(expression, filter=Q(**filters) if filters else None),
+        Value(ZERO),
+        output_field=DecimalField(max_digits=12, decimal_places=2),
+    )
+
+
+def last_closed_period():
+    return PettyCashPeriod.objects.order_by('-month').first()
+
+
+def open_period_start():
+    """First day of the earliest month that has not been closed yet, or None."""
+    last = last_closed_period()
+    return next_month(last.month) if last else None
+
+
+def open_entries():
+    entries = PettyCash.objects.all()
+    start = open_period_start()
+    if start is not None:
+        entries = entries.filter(date__gte=start)
+    return entries
+
+
+def current_balance():
+    last = last_closed_period()
+    opening = last.closing_balance if last else ZERO
+    return opening + open_entries().aggregate(total=_sum('amount'))['total']
+
+
+@transaction.atomic
+def close_periods(through=None):
+    """
+    Close every open month up to and including ``through`` (default: last
+    month). The current month can't be closed because it still takes entries.
+    Returns the list of PettyCashPeriod rows created.
+    """
+    current = month_start(timezone.localdate())
+    through = month_start(through or current - timedelta(days=1))
+    if through >= current:
+        raise ValueError("Only months that have ended can be closed.")
+
+    last = PettyCashPeriod.objects.select_for_update().order_by('-month').first()
+    balance = last.closing_balance if last else ZERO
+    pending = PettyCash.objects.filter(date__lt=next_month(through))
+    if last:
+        pending = pending.filter(date__gte=next_month(last.month))
+
+    # One grouped pass over the open entries instead of one query per month.
+    rows = (
+        pending.values('date__year', 'date__month', 'category')
+        .annotate(total_in=_sum('amount', amount__gt=0), total_out=_sum('amount', amount__lt=0), entries=Count('id'))
+        .order_by('date__year', 'date__month', 'category')
+    )
+    by_month = {}
+    for row in rows:
+        by_month.setdefault(date(row['date__year'], row['date__month'], 1), []).append(row)
+
+    month = next_month(last.month) if last else min(by_month, default=through)
+    periods = []
+    while month <= through:
+        summaries = by_month.get(month, [])
+        delta = sum((row['total_in'] + row['total_out'] for row in summaries), ZERO)
+        period = PettyCashPeriod.objects.create(month=month, opening_balance=balance, closing_balance=balance + delta)
+        PettyCashPeriodCategory.objects.bulk_create(
+            PettyCashPeriodCategory(
+                period=period, category=row['category'], total_in=row['total_in'],
+                total_out=row['total_out'], entries=row['entries'],
+            )
+            for row in summaries
+        )
+        periods.append(period)
+        balance = period.closing_balance
+        month = next_month(month)
+    bump(PettyCashPeriodCategory)
+    return periods
+
+
+@transaction.atomic
+def reopen_periods(since):
+    """Drop the snapshots from ``since`` onwards, e.g. after correcting an old entry."""
+    deleted, _ = PettyCashPeriod.objects.filter(month__gte=month_start(since)).delete()
+    return deleted
+
+
+def monthly_report():
+    return PettyCashPeriod.objects.prefetch_related('categories')
+
+
+def category_report(start=None, end=None):
+    """Totals per category over closed months, read from the snapshots only."""
+    categories = PettyCashPeriodCategory.objects.all()
+    if start:
+        categories = categories.filter(period__month__gte=month_start(start))
+    if end:
+        categories = categories.filter(period__month__lte=month_start(end))
+    return (
+        categories.values('category')
+        .annotate(total_in=Sum('total_in'), total_out=Sum('total_out'), entries=Sum('entries'))
+        .order_by('category')
+    )
+
+
+def _entry_changed(sender, instance, created=False, **kwargs):
+    # New entries are dated today (auto_now_add), which is never in a closed month.
+    if not created:
+        reopen_periods(instance.date)
+
+
+def connect_signals():
+    post_save.connect(_entry_changed, sender=PettyCash, dispatch_uid='value.pettycash.entry_saved')
+    post_delete.connect(_entry_changed, sender=PettyCash, dispatch_uid='value.pettycash.entry_deleted')
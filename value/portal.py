@@ -0,0 +1,83 @@
+"""
+Parent portal: one overview of every child linked to a parent.
+
+children_overview() runs a fixed number of queries however many children a
+parent has: one for the children with their attendance and payment totals
+aggregated in SQL, one for their latest exam marks and one for the timetables
+of their classes.
+"""
+from decimal import Decimal
+
+from django.db.models import Count, DecimalField, OuterRef, Prefetch, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .models import StudentExam, StudentPayment, Timetable
+
+ZERO = Decimal('0.00')
+LATEST_EXAMS = 5
+
+
+def children_overview(parent, latest_exams=LATEST_EXAMS):
+    """
+    The parent's children, each with ``latest_exams``, ``attendance_percentage``
+    (None before any attendance is taken), ``paid``, ``outstanding_balance``
+    and ``timetable`` (on the child's class, empty without one).
+    """
+    paid = (
+        StudentPayment.objects.filter(student=OuterRef('pk'))
+        .values('student')
+        .annotate(total=Sum('amount'))
+        .values('total')
+    )
+    children = (
+        parent.students.select_related('user', 'student_class')
+        .annotate(
+            attendance_days=Count('studentattendance'),
+            present_days=Count('studentattendance', filter=Q(studentattendance__present=True)),
+            paid=Coalesce(Subquery(paid), Value(ZERO), output_field=DecimalField(max_digits=12, decimal_places=2)),
+        )
+        .prefetch_related(
+            # Sliced per child (a window function), not across all children.
+            Prefetch(
+                'studentexam_set',
+                queryset=StudentExam.objects.select_related('exam').order_by('-exam__date', '-id')[:latest_exams],
+                to_attr='latest_exams',
+            ),
+            Prefetch(
+                'student_class__timetable_set',
+                queryset=Timetable.objects.select_related('subject', 'teacher__user').order_by('day_of_week', 'start_time'),
+                to_attr='timetable_slots',
+            ),
+        )
+        .order_by('user__username')
+    )
+
+    children = list(children)
+    for child in children:
+        days = child.attendance_days
+        child.attendance_percentage = round(100 * child.present_days / days, 1) if days else None
+        fee = child.student_class.fee if child.student_class else ZERO
+        child.outstanding_balance = max(fee - child.paid, ZERO)
+        child.timetable = child.student_class.timetable_slots if child.student_class else []
+    return children
+
+
+def child_summary(child):
+    """JSON-ready form of one child from children_overview()."""
+    return {
+        'id': child.pk,
+        'username': child.user.username,
+        'classroom': child.student_class.name if child.student_class else None,
+        'attendance_percentage': child.attendance_percentage,
+        'paid': child.paid,
+        'outstanding_balance': child.outstanding_balance,
+        'latest_exams': [
+            {'exam': result.exam.name, 'date': result.exam.date, 'marks': result.marks}
+            for result in child.latest_exams
+        ],
+        'timetable': [
+            {'day': slot.day_of_week, 'start': slot.start_time, 'end': slot.end_time,
+             'subject': slot.subject.name, 'teacher': slot.teacher.user.username}
+            for slot in child.timetable
+        ],
+    }
@@ -0,0 +1,279 @@
+"""
+Opt-in request profiling.
+
+value.middleware.ProfilingMiddleware profiles a request when its view is
+listed in settings.PROFILING['URL_NAMES'] ('value:dashboard_home' or just
+'dashboard_home'), or when it carries a ?_profile= token from profile_url().
+Tokens are signed and tied to one path, so only admins can switch profiling
+on for a page. Each token profiles one request: its first use is recorded in
+the cache (shared between workers when the cache is), and unused tokens
+expire after TOKEN_MAX_AGE seconds.
+
+The default MODE, 'sample', records the request thread's stack every
+INTERVAL seconds from a helper thread. That costs little and gives whole
+stacks: ORM, template rendering and form construction show up under the
+view that caused them. Each profile is written as a speedscope file
+(https://www.speedscope.app) and as collapsed stacks for flamegraph.pl.
+MODE 'cprofile' writes a pstats file instead (snakeviz, python -m pstats):
+exact call counts, at a much higher overhead.
+
+The middleware and views are all sync, so under ASGI too the request runs
+on one thread, the one the sampler follows.
+
+Profiles go to DIR, next to a small .json file describing the request;
+only the newest KEEP are kept.
+"""
+import json
+import os
+import secrets
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.urls import Resolver404, resolve
+from django.utils import timezone
+from django.utils.text import slugify
+
+PARAM = '_profile'
+TOKEN_SALT = 'value.profiling'
+USED_TOKEN_KEY = 'profiling:used:{}'
+
+DEFAULTS = {
+    'URL_NAMES': (),
+    'DIR': None,
+    'MODE': 'sample',
+    'INTERVAL': 0.001,
+    'KEEP': 100,
+    'TOKEN_MAX_AGE': 15 * 60,
+}
+
+
+def get_option(name):
+    return getattr(settings, 'PROFILING', {}).get(name, DEFAULTS[name])
+
+
+def directory():
+    return Path(get_option('DIR') or Path(settings.BASE_DIR) / 'profiles')
+
+
+# --- Tokens ---
+
+def profile_token(path):
+    # A nonce, the timestamp and the signature; the path is checked against the
+    # request's. The nonce keeps two links made in the same second apart.
+    return signing.TimestampSigner(salt=TOKEN_SALT).sign(f'{path}:{secrets.token_urlsafe(8)}')[len(path) + 1:]
+
+
+def profile_url(path):
+    """``path`` (may include a query string) with a token that profiles it once."""
+    path, _, query = path.partition('?')
+    return f"{path}?{'&'.join(filter(None, [query, urlencode({PARAM: profile_token(path)})]))}"
+
+
+def valid_token(path, token):
+    """Whether ``token`` was made for ``path`` and hasn't been used yet; using it up."""
+    max_age = get_option('TOKEN_MAX_AGE')
+    try:
+        signing.TimestampSigner(salt=TOKEN_SALT).unsign(f'{path}:{token}', max_age=max_age)
+    except signing.BadSignature:
+        return False
+    # add() only succeeds for the first request with this token.
+    return cache.add(USED_TOKEN_KEY.format(token.rsplit(':', 1)[-1]), True, max_age)
+
+
+def requested(request):
+    """The view name to file a profile of ``request`` under, or None when it isn't profiled."""
+    token = request.GET.get(PARAM)
+    names = get_option('URL_NAMES')
+    if token is None and not names:
+        return None
+    try:
+        match = resolve(request.path_info)
+    except Resolver404:
+        match = None
+    if token is not None and valid_token(request.path, token):
+        return match.view_name if match else request.path_info
+    if match and (match.view_name in names or match.url_name in names):
+        return match.view_name
+    return None
+
+
+# --- Profilers ---
+
+class Sampler:
+    """Samples the Python stack of the thread that started it, from a helper thread."""
+    mode = 'sample'
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.samples = []  # (stack, seconds), stack as (file, line, name) from the outermost frame
+
+    def start(self, root=None):
+        # Frames outside ``root`` (the middleware's) belong to the server, not the request.
+        self._target = threading.get_ident()
+        self._root = root
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='value-profiling-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._done.set()
+        self._thread.join()
+        self._root = None
+
+    def _run(self):
+        last = time.perf_counter()
+        while not self._done.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            now = time.perf_counter()
+            if frame is not None:
+                self.samples.append((self._stack(frame), now - last))
+            last = now
+
+    def _stack(self, frame):
+        stack = []
+        while frame is not None and frame is not self._root:
+            code = frame.f_code
+            stack.append((code.co_filename, code.co_firstlineno, getattr(code, 'co_qualname', code.co_name)))
+            frame = frame.f_back
+        stack.reverse()
+        return tuple(stack)
+
+    def write(self, stem, title):
+        labels = {}
+        speedscope = _speedscope(self.samples, title, labels)
+        (stem.parent / f'{stem.name}.speedscope.json').write_text(json.dumps(speedscope))
+        counts = Counter(';'.join(labels[frame] for frame in stack) for stack, _ in self.samples if stack)
+        (stem.parent / f'{stem.name}.collapsed.txt').write_text(
+            ''.join(f'{stack} {count}\n' for stack, count in counts.most_common())
+        )
+        return [f'{stem.name}.speedscope.json', f'{stem.name}.collapsed.txt']
+
+
+class CProfiler:
+    mode = 'cprofile'
+
+    def __init__(self, interval=None):
+        import cProfile  # only when MODE asks for it; not needed to start a worker
+
+        self.profile = cProfile.Profile()
+
+    def start(self, root=None):
+        self.profile.enable()
+
+    def stop(self):
+        self.profile.disable()
+
+    def write(self, stem, title):
+        self.profile.dump_stats(stem.parent / f'{stem.name}.prof')
+        return [f'{stem.name}.prof']
+
+
+PROFILERS = {'sample': Sampler, 'cprofile': CProfiler}
+
+
+def start():
+    profiler = PROFILERS[get_option('MODE')](get_option('INTERVAL'))
+    profiler.start(root=sys._getframe(1))
+    profiler.started = time.perf_counter()
+    return profiler
+
+
+def _short(filename):
+    # Paths relative to the entry on sys.path they were imported from.
+    for entry in sorted((entry for entry in sys.path if entry), key=len, reverse=True):
+        if filename.startswith(entry.rstrip(os.sep) + os.sep):
+            return filename[len(entry.rstrip(os.sep)) + 1:]
+    return filename
+
+
+def _speedscope(samples, title, labels):
+    frames, index = [], {}
+    for stack, _ in samples:
+        for frame in stack:
+            if frame not in index:
+                filename, line, name = frame
+                index[frame] = len(frames)
+                labels[frame] = f'{name} ({_short(filename)}:{line})'
+                frames.append({'name': name, 'file': _short(filename), 'line': line})
+    total = sum(seconds for _, seconds in samples) * 1000
+    return {
+        '$schema': 'https://www.speedscope.app/file-format-schema.json',
+        'name': title,
+        'exporter': 'value.profiling',
+        'shared': {'frames': frames},
+        'profiles': [{
+            'type': 'sampled',
+            'name': title,
+            'unit': 'milliseconds',
+            'startValue': 0,
+            'endValue': total,
+            'samples': [[index[frame] for frame in stack] for stack, _ in samples],
+            'weights': [seconds * 1000 for _, seconds in samples],
+        }],
+    }
+
+
+# --- Storage ---
+
+def finish(profiler, request, response, view):
+    """Write ``profiler``'s data and a description of the request; returns the profile's name."""
+    milliseconds = (time.perf_counter() - profiler.started) * 1000
+    folder = directory()
+    folder.mkdir(parents=True, exist_ok=True)
+    created = timezone.now()
+    name = f"{created:%Y%m%d-%H%M%S-%f}-{slugify(view.replace(':', '-'))[:60] or 'request'}"
+    title = f'{request.method} {request.path} ({milliseconds:.0f} ms)'
+    meta = {
+        'name': name,
+        'view': view,
+        'method': request.method,
+        'path': request.get_full_path(),
+        'status': response.status_code,
+        'milliseconds': round(milliseconds, 1),
+        'mode': profiler.mode,
+        'created': created.isoformat(),
+        'files': profiler.write(folder / name, title),
+    }
+    (folder / f'{name}.json').write_text(json.dumps(meta))
+    prune()
+    return name
+
+
+def _metas():
+    folder = directory()
+    if not folder.is_dir():
+        return []
+    return sorted((path for path in folder.glob('*.json') if not path.name.endswith('.speedscope.json')), reverse=True)
+
+
+def recent(limit=None):
+    """Descriptions of the stored profiles, newest first."""
+    profiles = []
+    for path in _metas()[:limit]:
+        try:
+            profiles.append(json.loads(path.read_text()))
+        except (OSError, ValueError):  # pruned or half-written by another process
+            continue
+    return profiles
+
+
+def prune(keep=None):
+    keep = get_option('KEEP') if keep is None else keep
+    for meta in recent()[keep:]:
+        for name in [*meta['files'], f"{meta['name']}.json"]:
+            (directory() / name).unlink(missing_ok=True)
+
+
+def file_path(name):
+    """Path of a stored profile file, or None if ``name`` isn't one."""
+    for meta in recent():
+        if name in meta['files']:
+            return directory() / name
+    return None
@@ -0,0 +1,179 @@
+"""
+Report cards: one PDF per student, collected per classroom into a zip archive.
+
+Each classroom's data takes four queries however many students it has: the
+students, their exam marks, the grades for those marks and attendance
+totals. Laying out a PDF is CPU-bound, so the cards are rendered in a
+process pool (value.pdf), and the next classroom is loaded while the current
+one renders. The pool spawns fresh processes rather than forking: builds run
+on run_tasks' worker threads, and a fork would copy locks other threads
+hold. Finished PDFs go into the archive as they come back, so memory holds
+about two classrooms of documents, never the whole school.
+
+A card that can't be rendered (e.g. a name the configured font can't set)
+is left out and listed in the result's 'failed'; the rest of the school's
+cards are still built. If the build itself fails, the partial archive is
+deleted.
+"""
+import multiprocessing
+import os
+from pathlib import Path
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from django.conf import settings
+from django.db.models import Count, Q
+from django.utils.text import slugify
+
+from . import pdf
+from .models import Classroom, Student, StudentAttendance, StudentExam, StudentGrade
+
+CHUNK_SIZE = 8  # cards sent to a worker process at a time
+
+
+def get_option(name):
+    return getattr(settings, 'REPORT_CARDS', {}).get(name)
+
+
+def _dates(prefix, start, end):
+    lookups = {}
+    if start:
+        lookups[f'{prefix}__gte'] = start
+    if end:
+        lookups[f'{prefix}__lte'] = end
+    return lookups
+
+
+def term_label(start=None, end=None):
+    if start and end:
+        return f'{start:%d %b %Y} to {end:%d %b %Y}'
+    if start or end:
+        return f'from {start:%d %b %Y}' if start else f'until {end:%d %b %Y}'
+    return 'all dates'
+
+
+def classroom_cards(classroom, start=None, end=None):
+    """
+    Plain dicts, one per student of ``classroom`` ordered by name, with the
+    exams and attendance between ``start`` and ``end`` (both inclusive,
+    either may be None).
+    """
+    students = (
+        Student.objects.filter(student_class=classroom)
+        .order_by('user__last_name', 'user__first_name', 'user__username')
+        .values_list('id', 'user__username', 'user__first_name', 'user__last_name')
+    )
+    in_class = {'student__student_class': classroom}
+    exams = (
+        StudentExam.objects.filter(**in_class, **_dates('exam__date', start, end))
+        .order_by('exam__date', 'exam__name', 'id')
+        .values_list('id', 'student_id', 'exam__date', 'exam__name', 'marks')
+    )
+    grades = dict(
+        StudentGrade.objects.filter(student_exam__student__student_class=classroom,
+                                    **_dates('student_exam__exam__date', start, end))
+        .order_by('id')
+        .values_list('student_exam_id', 'grade')
+    )
+    attendance = {
+        row['student_id']: row
+        for row in StudentAttendance.objects.filter(**in_class, **_dates('date', start, end))
+        .values('student_id')
+        .annotate(days=Count('id'), present=Count('id', filter=Q(present=True)))
+        .order_by()
+    }
+
+    term = term_label(start, end)
+    cards, by_student = [], {}
+    for pk, username, first_name, last_name in students:
+        totals = attendance.get(pk, {})
+        card = {
+            'student_id': pk,
+            'username': username,
+            'name': f'{first_name} {last_name}'.strip() or username,
+            'classroom': classroom.name,
+            'term': term,
+            'exams': [],
+            'present': totals.get('present', 0),
+            'days': totals.get('days', 0),
+            'average': None,
+        }
+        cards.append(card)
+        by_student[pk] = card
+    for pk, student_id, day, name, marks in exams:
+        by_student[student_id]['exams'].append((day.isoformat(), name, marks, grades.get(pk, '')))
+    for card in cards:
+        if card['exams']:
+            card['average'] = sum(exam[2] for exam in card['exams']) / len(card['exams'])
+    return cards
+
+
+def archive_name(classroom, card):
+    return f"{classroom.pk}-{slugify(classroom.name) or 'class'}/{card['username']}.pdf"
+
+
+def build_archive(out, classrooms=None, start=None, end=None, workers=None, progress=None):
+    """
+    Write a zip of report cards for ``classrooms`` (default: all) to ``out``,
+    a path or a binary file. ``workers`` is the number of render processes:
+    None takes settings.REPORT_CARDS['WORKERS'] or one per CPU; with 0 or 1
+    the cards are rendered in this process. ``progress(done, total)`` is called after each classroom.
+    Names outside Latin-1 are set in settings.REPORT_CARDS['FONT'] (and
+    'BOLD_FONT'). Cards that still can't be rendered are skipped and listed
+    under 'failed' with the reason. A path ``out`` is removed again if the
+    build fails. Returns counts and the documents rendered per second.
+    """
+    classrooms = list(Classroom.objects.order_by('name') if classrooms is None else classrooms)
+    total = Student.objects.filter(student_class__in=classrooms).count()
+    if workers is None:
+        workers = get_option('WORKERS') or os.cpu_count() or 1
+    started = time.perf_counter()
+    done, failed = 0, []
+
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) if workers > 1 else None
+    report_card = partial(pdf.render_card, fonts=(get_option('FONT'), get_option('BOLD_FONT')))
+
+    def render(cards):
+        return pool.map(report_card, cards, chunksize=CHUNK_SIZE) if pool else map(report_card, cards)
+
+    try:
+        # Stored, not deflated: the page contents are compressed already.
+        with zipfile.ZipFile(out, 'w', compression=zipfile.ZIP_STORED) as archive:
+            def write(classroom, cards, documents):
+                nonlocal done
+                for card, (document, error) in zip(cards, documents):
+                    if error is None:
+                        archive.writestr(archive_name(classroom, card), document)
+                    else:
+                        failed.append({'student_id': card['student_id'], 'username': card['username'], 'error': error})
+                done += len(cards)
+                if progress:
+                    progress(done, total)
+
+            pending = None
+            for classroom in classrooms:
+                cards = classroom_cards(classroom, start, end)
+                batch = (classroom, cards, render(cards))  # workers start on it now
+                if pending:
+                    write(*pending)
+                pending = batch
+            if pending:
+                write(*pending)
+    except BaseException:
+        if isinstance(out, (str, os.PathLike)):
+            Path(out).unlink(missing_ok=True)
+        raise
+    finally:
+        if pool:
+            pool.shutdown(cancel_futures=True)
+
+    seconds = time.perf_counter() - started
+    return {
+        'documents': done - len(failed),
+        'failed': failed,
+        'classrooms': len(classrooms),
+        'seconds': round(seconds, 2),
+        'per_second': round(done / seconds, 1) if seconds else None,
+    }
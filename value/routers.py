@@ -0,0 +1,69 @@
+"""
+Primary/replica database routing.
+
+Reads go to the replica only inside views decorated with @use_replica, i.e.
+the read-heavy dashboard lists; everything else, and every write, uses the
+primary. After a POST the client is pinned to the primary for a few seconds
+(ReplicaPinningMiddleware) so the page it is redirected to shows its own
+write even if the replica lags behind.
+
+Whatever is cached under a data version (value.versions) is read from the
+primary: versions move when a write commits there, so rows read from a
+replica that hasn't caught up yet would be cached, or given an ETag, under
+the new version and stay stale until the next write. Such reads use
+.using(PRIMARY) (or skip @use_replica) even inside replica views.
+
+Enabled when settings.REPLICA_DATABASE names a configured alias.
+"""
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+
+PRIMARY = 'default'
+
+_replica_allowed = ContextVar('replica_allowed', default=False)
+_pinned = ContextVar('pinned_to_primary', default=False)
+
+
+def replica_alias():
+    return getattr(settings, 'REPLICA_DATABASE', None)
+
+
+def use_replica(view):
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        token = _replica_allowed.set(request.method in ('GET', 'HEAD'))
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            _replica_allowed.reset(token)
+    return wrapper
+
+
+def pin_to_primary(pinned=True):
+    """Returns a token for unpin()."""
+    return _pinned.set(pinned)
+
+
+def unpin(token):
+    _pinned.reset(token)
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        alias = replica_alias()
+        if alias and _replica_allowed.get() and not _pinned.get():
+            return alias
+        return PRIMARY
+
+    def db_for_write(self, model, **hints):
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica receives its schema from the primary.
+        return db != replica_alias()
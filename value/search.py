@@ -0,0 +1,259 @@
+"""
+Full-text search over users, events, notifications and chat.
+
+All searchable text lives in one index table, value_search, kept in sync by
+database triggers on the source tables (so bulk writes and raw SQL are
+indexed too). On SQLite it is an FTS5 virtual table ranked with bm25(); on
+PostgreSQL an ordinary table with a weighted tsvector column, a GIN index and
+ts_rank(). Each index row's id is ``source id * len(SOURCES) + kind``, so a
+trigger can find and replace it without scanning the index.
+
+Like the amount-history triggers (value.history), the index and triggers are
+installed by a migration and re-asserted after every migrate.
+"""
+import re
+from collections import namedtuple
+
+from django.db import connections
+
+INDEX_TABLE = 'value_search'
+PREFIX_MIN_LENGTH = 3
+
+# kind, source table, title expression, body expression (columns of NEW/OLD)
+Source = namedtuple('Source', 'kind table title body')
+
+SOURCES = [
+    Source('user', 'value_user', '{row}."username"', "{row}.\"first_name\" || ' ' || {row}.\"last_name\""),
+    Source('event', 'value_event', '{row}."title"', '{row}."description"'),
+    Source('notification', 'value_mainnotification', '{row}."title"', '{row}."message"'),
+    Source('chat', 'value_chat', "''", '{row}."message"'),
+    Source('group_message', 'value_groupmessage', "''", '{row}."message"'),
+]
+KINDS = [source.kind for source in SOURCES]
+
+SearchResult = namedtuple('SearchResult', 'kind object_id title snippet rank')
+
+
+class SearchUnavailable(NotImplementedError):
+    pass
+
+
+def _doc_id(source, row):
+    return f'{row}."id" * {len(SOURCES)} + {KINDS.index(source.kind)}'
+
+
+def _values(source, row):
+    return _doc_id(source, row), KINDS.index(source.kind), source.title.format(row=row), source.body.format(row=row)
+
+
+# --- SQLite (FTS5) ---
+
+SQLITE_CREATE_INDEX = [f"""
+CREATE VIRTUAL TABLE IF NOT EXISTS "{INDEX_TABLE}"
+USING fts5(kind UNINDEXED, object_id UNINDEXED, title, body, tokenize = 'unicode61 remove_diacritics 2')
+"""]
+
+SQLITE_CREATE_TRIGGERS = [
+    """
+CREATE TRIGGER IF NOT EXISTS "{table}_search_insert" AFTER INSERT ON "{table}"
+BEGIN
+    INSERT INTO "{index}" (rowid, kind, object_id, title, body) VALUES ({new_id}, {kind}, NEW."id", {new_title}, {new_body});
+END
+""",
+    """
+CREATE TRIGGER IF NOT EXISTS "{table}_search_update" AFTER UPDATE ON "{table}"
+BEGIN
+    DELETE FROM "{index}" WHERE rowid = {old_id};
+    INSERT INTO "{index}" (rowid, kind, object_id, title, body) VALUES ({new_id}, {kind}, NEW."id", {new_title}, {new_body});
+END
+""",
+    """
+CREATE TRIGGER IF NOT EXISTS "{table}_search_delete" AFTER DELETE ON "{table}"
+BEGIN
+    DELETE FROM "{index}" WHERE rowid = {old_id};
+END
+""",
+]
+
+SQLITE_DROP_TRIGGERS = [
+    'DROP TRIGGER IF EXISTS "{table}_search_insert"',
+    'DROP TRIGGER IF EXISTS "{table}_search_update"',
+    'DROP TRIGGER IF EXISTS "{table}_search_delete"',
+]
+
+SQLITE_SEARCH = f"""
+SELECT kind, object_id, title, snippet("{INDEX_TABLE}", 3, '', '', '…', 12), bm25("{INDEX_TABLE}", 0, 0, 10.0, 1.0)
+FROM "{INDEX_TABLE}"
+WHERE "{INDEX_TABLE}" MATCH %s {{scope}}
+ORDER BY bm25("{INDEX_TABLE}", 0, 0, 10.0, 1.0)
+LIMIT %s
+"""
+
+# --- PostgreSQL (tsvector) ---
+
+POSTGRES_CREATE_INDEX = [
+    f"""
+CREATE TABLE IF NOT EXISTS "{INDEX_TABLE}" (
+    "rowid" bigint PRIMARY KEY,
+    "kind" smallint NOT NULL,
+    "object_id" bigint NOT NULL,
+    "title" text NOT NULL,
+    "body" text NOT NULL,
+    "document" tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', "title"), 'A') || setweight(to_tsvector('simple', "body"), 'B')
+    ) STORED
+)
+""",
+    f'CREATE INDEX IF NOT EXISTS "{INDEX_TABLE}_document" ON "{INDEX_TABLE}" USING GIN ("document")',
+]
+
+POSTGRES_CREATE_TRIGGERS = [
+    """
+CREATE OR REPLACE FUNCTION "{table}_search"() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        DELETE FROM "{index}" WHERE "rowid" = {old_id};
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO "{index}" ("rowid", "kind", "object_id", "title", "body")
+        VALUES ({new_id}, {kind}, NEW."id", COALESCE({new_title}, ''), COALESCE({new_body}, ''));
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+""",
+    'DROP TRIGGER IF EXISTS "{table}_search" ON "{table}"',
+    """
+CREATE TRIGGER "{table}_search" AFTER INSERT OR UPDATE OR DELETE ON "{table}"
+FOR EACH ROW EXECUTE FUNCTION "{table}_search"()
+""",
+]
+
+POSTGRES_DROP_TRIGGERS = [
+    'DROP TRIGGER IF EXISTS "{table}_search" ON "{table}"',
+    'DROP FUNCTION IF EXISTS "{table}_search"()',
+]
+
+POSTGRES_SEARCH = f"""
+SELECT "kind", "object_id", "title",
+       ts_headline('simple', "body", query, 'StartSel="", StopSel="", MaxWords=24, MinWords=8'),
+       -ts_rank("document", query)
+FROM "{INDEX_TABLE}", to_tsquery('simple', %s) query
+WHERE "document" @@ query {{scope}}
+ORDER BY ts_rank("document", query) DESC
+LIMIT %s
+"""
+
+STATEMENTS = {
+    'sqlite': (SQLITE_CREATE_INDEX, SQLITE_CREATE_TRIGGERS, SQLITE_DROP_TRIGGERS, SQLITE_SEARCH),
+    'postgresql': (POSTGRES_CREATE_INDEX, POSTGRES_CREATE_TRIGGERS, POSTGRES_DROP_TRIGGERS, POSTGRES_SEARCH),
+}
+
+# Chat messages are private to their sender and receiver.
+CHAT_SCOPE = (
+    f'AND (kind != {KINDS.index("chat")} OR object_id IN '
+    '(SELECT "id" FROM "value_chat" WHERE "sender_id" = %s OR "receiver_id" = %s))'
+)
+
+
+def _trigger_sql(template, source):
+    new_id, kind, new_title, new_body = _values(source, 'NEW')
+    return template.format(
+        table=source.table, index=INDEX_TABLE, kind=kind, new_id=new_id, old_id=_doc_id(source, 'OLD'),
+        new_title=new_title, new_body=new_body,
+    )
+
+
+def is_supported(connection):
+    return connection.vendor in STATEMENTS
+
+
+def install_search(connection):
+    """Create the index if needed (filling it from the source tables) and its triggers."""
+    if not is_supported(connection):
+        return
+    create_index, create_triggers = STATEMENTS[connection.vendor][:2]
+    existing = set(connection.introspection.table_names())
+    sources = [source for source in SOURCES if source.table in existing]
+    with connection.cursor() as cursor:
+        if INDEX_TABLE not in existing:
+            for statement in create_index:
+                cursor.execute(statement)
+            _fill(cursor, sources)
+        for source in sources:
+            for template in create_triggers:
+                cursor.execute(_trigger_sql(template, source))
+
+
+def _fill(cursor, sources):
+    for source in sources:
+        doc_id, kind, title, body = _values(source, f'"{source.table}"')
+        cursor.execute(
+            f'INSERT INTO "{INDEX_TABLE}" (rowid, kind, object_id, title, body) '
+            f'SELECT {doc_id}, {kind}, "id", COALESCE({title}, \'\'), COALESCE({body}, \'\') FROM "{source.table}"'
+        )
+
+
+def drop_search(connection):
+    if not is_supported(connection):
+        return
+    drop_triggers = STATEMENTS[connection.vendor][2]
+    existing = set(connection.introspection.table_names())
+    with connection.cursor() as cursor:
+        for source in SOURCES:
+            if source.table not in existing:
+                continue
+            for template in drop_triggers:
+                cursor.execute(template.format(table=source.table))
+        cursor.execute(f'DROP TABLE IF EXISTS "{INDEX_TABLE}"')
+
+
+def rebuild_search(connection):
+    """Drop and refill the index, e.g. after writes made while the triggers were missing."""
+    drop_search(connection)
+    install_search(connection)
+
+
+def reinstall_search(sender, using, **kwargs):
+    # post_migrate handler; only creates what is missing.
+    install_search(connections[using])
+
+
+def to_query(text, vendor):
+    """
+    Turn free text into a query that matches every word, or '' when there is
+    nothing to search for. Words of PREFIX_MIN_LENGTH or more also match as
+    prefixes; shorter ones would expand to a large part of the vocabulary.
+    User input never reaches the query syntax directly.
+    """
+    words = re.findall(r'\w+', text.lower())
+    if vendor == 'postgresql':
+        return ' & '.join(word + (':*' if len(word) >= PREFIX_MIN_LENGTH else '') for word in words)
+    return ' '.join(f'"{word}"' + ('*' if len(word) >= PREFIX_MIN_LENGTH else '') for word in words)
+
+
+def search(text, user=None, kinds=None, limit=20, using='default'):
+    """
+    Ranked matches for ``text``, best first. Chat messages are only returned
+    to staff and to the sender or receiver of each message. Raises
+    SearchUnavailable on databases other than SQLite and PostgreSQL.
+    """
+    connection = connections[using]
+    if not is_supported(connection):
+        raise SearchUnavailable(f"Search is not available on {connection.vendor}.")
+    query = to_query(text, connection.vendor)
+    if not query:
+        return []
+
+    scope, params = '', [query]
+    if kinds:
+        scope += f' AND kind IN ({", ".join(str(KINDS.index(kind)) for kind in kinds)})'
+    if user is None or not (user.is_superuser or user.is_staff):
+        scope += ' ' + CHAT_SCOPE
+        params += [getattr(user, 'pk', None)] * 2
+    params.append(limit)
+
+    with connection.cursor() as cursor:
+        cursor.execute(STATEMENTS[connection.vendor][3].format(scope=scope), params)
+        rows = cursor.fetchall()
+    return [SearchResult(KINDS[kind], object_id, title, snippet, rank) for kind, object_id, title, snippet, rank in rows]
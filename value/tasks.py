@@ -0,0 +1,228 @@
+"""
+Background tasks without an outside broker.
+
+Jobs are rows in the Task table. Views call enqueue() and return at once; the
+run_tasks management command claims due jobs (highest priority first) and
+runs them on a thread pool. A failed job is retried with exponential backoff
+until max_attempts, then marked failed with its traceback. Results are stored
+as JSON on the row, and long jobs can report progress through the Job handle
+passed to tasks registered with bind=True.
+
+Configured through settings.TASK_QUEUE:
+
+    EAGER        True runs each job inside enqueue() (tests, scripts).
+    HEARTBEAT    seconds between the worker's heartbeats for the jobs it runs.
+    STALE_AFTER  seconds without a heartbeat after which a running job's worker
+                 is taken for dead: the job is requeued, or failed once it has
+                 used up its attempts. Keep it well above HEARTBEAT.
+"""
+import logging
+import os
+import socket
+import traceback
+from datetime import date, timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from . import offboarding
+from .models import Classroom, Student, Task
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'EAGER': False,
+    'HEARTBEAT': 30,
+    'STALE_AFTER': 600,
+}
+
+REGISTRY = {}
+
+
+def get_option(name):
+    return {**DEFAULTS, **getattr(settings, 'TASK_QUEUE', {})}[name]
+
+
+class TaskSpec:
+    def __init__(self, func, name, bind, max_attempts, priority, retry_delay):
+        self.func = func
+        self.name = name
+        self.bind = bind
+        self.max_attempts = max_attempts
+        self.priority = priority
+        self.retry_delay = retry_delay
+
+
+def task(name=None, *, bind=False, max_attempts=3, priority=0, retry_delay=10):
+    """
+    Register a function as a task. Arguments are stored in plain JSON on the
+    Task row: never pass passwords or other secrets.
+    """
+    def decorator(func):
+        spec = TaskSpec(func, name or f'{func.__module__}.{func.__qualname__}', bind, max_attempts,
+                        priority, retry_delay)
+        REGISTRY[spec.name] = spec
+        func.task_name = spec.name
+        return func
+    return decorator
+
+
+class Job:
+    """Handle passed as the first argument to bind=True tasks."""
+
+    def __init__(self, task):
+        self.task = task
+
+    def set_progress(self, done, total=None, message=''):
+        progress = done / total if total else done
+        Task.objects.filter(pk=self.task.pk, locked_by=self.task.locked_by).update(
+            progress=min(max(progress, 0), 1), progress_message=message[:200], heartbeat_at=timezone.now(),
+        )
+
+
+def enqueue(func, args=(), kwargs=None, priority=None, user=None, delay=None):
+    """Queue ``func`` (a registered task or its name); returns the Task row."""
+    spec = REGISTRY[getattr(func, 'task_name', func)]
+    job = Task.objects.create(
+        name=spec.name,
+        args=list(args),
+        kwargs=kwargs or {},
+        priority=spec.priority if priority is None else priority,
+        max_attempts=spec.max_attempts,
+        run_after=timezone.now() + timedelta(seconds=delay or 0),
+        created_by=user if user is not None and user.is_authenticated else None,
+    )
+    if get_option('EAGER'):
+        run_pending(worker_id='eager', only=[job.pk])
+        job.refresh_from_db()
+    return job
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def claim(worker_id, limit=1, only=None):
+    """
+    Mark up to ``limit`` due jobs as running for ``worker_id`` and return
+    them. Each claim is a conditional UPDATE, so two workers racing for the
+    same job can't both win it.
+    """
+    now = timezone.now()
+    due = Task.objects.filter(status=Task.QUEUED, run_after__lte=now)
+    if only is not None:
+        due = due.filter(pk__in=only)
+    candidates = due.order_by('-priority', 'run_after', 'id').values_list('id', flat=True)[:limit * 4]
+    claimed = []
+    for pk in candidates:
+        won = Task.objects.filter(pk=pk, status=Task.QUEUED).update(
+            status=Task.RUNNING, locked_by=worker_id, started_at=now, heartbeat_at=now, attempts=F('attempts') + 1,
+        )
+        if won:
+            claimed.append(pk)
+            if len(claimed) == limit:
+                break
+    return list(Task.objects.filter(pk__in=claimed).order_by('-priority', 'run_after', 'id'))
+
+
+def execute(job):
+    """Run one claimed job and record the outcome."""
+    spec = REGISTRY.get(job.name)
+    mine = Task.objects.filter(pk=job.pk, locked_by=job.locked_by)
+    if spec is None:
+        mine.update(status=Task.FAILED, error=f"Unknown task {job.name!r}", finished_at=timezone.now())
+        return
+    if job.attempts > job.max_attempts:
+        mine.update(status=Task.FAILED, error="No attempts left.", finished_at=timezone.now())
+        return
+    try:
+        args = [Job(job), *job.args] if spec.bind else job.args
+        result = spec.func(*args, **job.kwargs)
+    except Exception:
+        error = traceback.format_exc()
+        if job.attempts < job.max_attempts:
+            backoff = spec.retry_delay * 2 ** (job.attempts - 1)
+            logger.warning("Task %s #%s failed, retrying in %ss", job.name, job.pk, backoff)
+            mine.update(status=Task.QUEUED, error=error, locked_by='',
+                        run_after=timezone.now() + timedelta(seconds=backoff))
+        else:
+            logger.error("Task %s #%s failed after %d attempts", job.name, job.pk, job.attempts)
+            mine.update(status=Task.FAILED, error=error, finished_at=timezone.now())
+        return
+    mine.update(status=Task.SUCCEEDED, result=result, progress=1, error='', finished_at=timezone.now())
+
+
+def run_pending(worker_id=None, limit=None, only=None):
+    """Run due jobs one by one in this thread until none are left; returns how many ran."""
+    worker_id = worker_id or worker_name()
+    ran = 0
+    while limit is None or ran < limit:
+        jobs = claim(worker_id, only=only)
+        if not jobs:
+            break
+        execute(jobs[0])
+        ran += 1
+    return ran
+
+
+def beat(worker_id):
+    """Record that ``worker_id`` is alive and still running its jobs."""
+    return Task.objects.filter(status=Task.RUNNING, locked_by=worker_id).update(heartbeat_at=timezone.now())
+
+
+def requeue_stale(older_than=None):
+    """
+    Put running jobs whose worker stopped sending heartbeats back on the
+    queue; those that have used up their attempts are failed instead, so a
+    job with max_attempts=1 never runs twice. Returns how many were requeued.
+    """
+    older_than = get_option('STALE_AFTER') if older_than is None else older_than
+    now = timezone.now()
+    stale = Task.objects.filter(status=Task.RUNNING, heartbeat_at__lt=now - timedelta(seconds=older_than))
+    exhausted = stale.filter(attempts__gte=F('max_attempts')).update(
+        status=Task.FAILED, error="The worker stopped responding.", finished_at=now,
+    )
+    if exhausted:
+        logger.error("Failed %d tasks whose worker stopped responding", exhausted)
+    return stale.update(status=Task.QUEUED, locked_by='')
+
+
+# --- Tasks ---
+
+@task(bind=True, max_attempts=1)
+def build_report_cards(job, classroom_ids=None, start=None, end=None):
+    """
+    Write report cards for the given classrooms (default: all) to a zip under
+    settings.REPORT_CARDS['DIR']; ``start`` and ``end`` are ISO dates.
+    """
+    # Here rather than at the top: it brings in the PDF writer and process pools,
+    # which a web worker that only enqueues this task never needs.
+    from . import reportcards
+
+    directory = Path(reportcards.get_option('DIR'))
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f'report-cards-{job.task.pk}.zip'
+    classrooms = Classroom.objects.filter(pk__in=classroom_ids).order_by('name') if classroom_ids else None
+    stats = reportcards.build_archive(
+        path, classrooms,
+        start=date.fromisoformat(start) if start else None,
+        end=date.fromisoformat(end) if end else None,
+        progress=lambda done, total: job.set_progress(done, total, f'{done} of {total} report cards'),
+    )
+    return {**stats, 'path': str(path)}
+
+
+@task(bind=True)
+def offboard_students(job, student_ids=None, classroom_id=None, delete=False):
+    """
+    Deactivate (or with ``delete``, remove) the given students or every
+    student of a classroom; see value.offboarding. Safe to retry: every
+    batch commits on its own, and redoing one changes nothing.
+    """
+    students = Student.objects.filter(student_class_id=classroom_id) if classroom_id else student_ids or []
+    return offboarding.offboard(
+        students, delete=delete, actor=job.task.created_by,
+        progress=lambda done, total: job.set_progress(done, total, f'{done} of {total} students'),
+    )
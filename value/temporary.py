@@ -0,0 +1,71 @@
+"""
+Expiry and purge for value.Temporary.
+
+Reads through Temporary.live skip expired rows (Temporary.objects, the
+admin and related lookups still see every row); purge_expired() deletes
+them for good in small batches, each in its own short transaction,
+so SQLite never holds the write lock for long. On SQLite databases using
+auto_vacuum=INCREMENTAL the freed pages are then returned to the filesystem.
+"""
+import time
+from collections import namedtuple
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Temporary
+from .versions import bump
+
+PurgeResult = namedtuple('PurgeResult', ['rows', 'batches', 'reclaimed_bytes'])
+
+
+def purge_expired(batch_size=1000, max_batches=None, pause=0.0, vacuum=True):
+    now = timezone.now()
+    expired = Temporary.objects.filter(expires_at__lte=now)
+    rows = batches = 0
+    while max_batches is None or batches < max_batches:
+        with transaction.atomic():
+            ids = list(expired.values_list('pk', flat=True)[:batch_size])
+            if not ids:
+                break
+            deleted, _ = Temporary.objects.filter(pk__in=ids).delete()
+        rows += deleted
+        batches += 1
+        if pause:
+            # Let waiting writers in between batches.
+            time.sleep(pause)
+    if rows:
+        bump(Temporary)
+    reclaimed = incremental_vacuum() if vacuum and rows else 0
+    return PurgeResult(rows, batches, reclaimed)
+
+
+def _pragma(cursor, name):
+    cursor.execute(f'PRAGMA {name}')
+    return cursor.fetchone()[0]
+
+
+def incremental_vacuum():
+    """Release free pages to the OS; returns the bytes reclaimed (SQLite only)."""
+    if connection.vendor != 'sqlite' or connection.in_atomic_block:
+        return 0
+    with connection.cursor() as cursor:
+        if _pragma(cursor, 'auto_vacuum') != 2:
+            return 0
+        page_size = _pragma(cursor, 'page_size')
+        before = _pragma(cursor, 'freelist_count')
+        # cursor.execute() steps the pragma once, which frees a single page;
+        # executescript() runs it to completion.
+        connection.connection.executescript('PRAGMA incremental_vacuum;')
+        after = _pragma(cursor, 'freelist_count')
+    return (before - after) * page_size
+
+
+def enable_incremental_vacuum():
+    """Switch an SQLite database to auto_vacuum=INCREMENTAL; rewrites the file once."""
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        cursor.execute('VACUUM')
+    return True
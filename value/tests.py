@@ -1,3 +1,1249 @@
-from django.test import TestCase
+import json
+import tempfile
+import time
+import zipfile
+from datetime import date, timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.apps import apps
+from django.contrib import admin
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import DatabaseError, connection, transaction
+from django.db.models import F
+from django.db.models.deletion import Collector
+from django.http import HttpResponse
+from django.test.utils import CaptureQueriesContext
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.template import TemplateDoesNotExist
+from django.urls import NoReverseMatch, reverse
+from django.utils import timezone
+
+from . import agenda, archive, audit, backends, enrollment, history, listing, offboarding, pdf, pettycash, profiling, reportcards, routers, search, tasks, warmup
+from .forms import ClassroomForm
+from .middleware import PIN_COOKIE, ReplicaPinningMiddleware
+from .payroll import run_payroll
+from .routers import PrimaryReplicaRouter, use_replica
+from .temporary import purge_expired
+from .versions import get_version
+from .models import (
+    AcademicYear, ArchivedChat, ArchivedStudentAttendance, ArchivedStudentPayment, CapacityBelowEnrollment, Chat, Classroom, CriticalHistory, Event, Exam, ExamTimetable, Parent, PaymentNotifications, PettyCash, PettyCashHistory, PettyCashPeriod, Student, StudentAttendance,
+    StudentExam, StudentGrade, StudentPayment, StudentPaymentHistory, ReadOnlyError, Subject, Task, Teacher, TeacherAttendance, Timetable, TeacherSalary, TeacherSalaryHistory, Temporary, User,
+)
+
+DEJAVU = '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+
+
+class AmountHistoryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.student = Student.objects.create(user=User.objects.create(username='s1', role='student'))
+        cls.teacher = Teacher.objects.create(user=User.objects.create(username='t1', role='teacher'))
+
+    def test_save_records_old_and_new_amount(self):
+        payment = StudentPayment.objects.create(student=self.student, amount=Decimal('10.00'), date='2025-01-01')
+        payment.amount = Decimal('12.50')
+        payment.save()
+        history = StudentPaymentHistory.objects.get(payment=payment)
+        self.assertEqual((history.old_amount, history.new_amount), (Decimal('10.00'), Decimal('12.50')))
+        self.assertIsNotNone(history.changed_at)
+
+    def test_unchanged_amount_is_not_recorded(self):
+        salary = TeacherSalary.objects.create(teacher=self.teacher, amount=Decimal('500.00'), date='2025-01-31')
+        salary.save()
+        TeacherSalary.objects.filter(pk=salary.pk).update(date='2025-02-28')
+        self.assertFalse(TeacherSalaryHistory.objects.exists())
+
+    def test_bulk_update_is_captured_without_extra_queries(self):
+        PettyCash.objects.bulk_create(PettyCash(amount=Decimal('5.00'), description='x') for _ in range(2000))
+        with self.assertNumQueries(1):
+            PettyCash.objects.update(amount=F('amount') * 2)
+        self.assertEqual(PettyCashHistory.objects.count(), 2000)
+        self.assertFalse(PettyCashHistory.objects.exclude(old_amount=Decimal('5.00'), new_amount=Decimal('10.00')).exists())
+
+
+class PettyCashPeriodTests(TestCase):
+    def add_entry(self, amount, day, category=''):
+        entry = PettyCash.objects.create(amount=Decimal(amount), description='x', category=category)
+        PettyCash.objects.filter(pk=entry.pk).update(date=day)
+
+    def setUp(self):
+        self.add_entry('100.00', date(2025, 1, 5), 'float')
+        self.add_entry('-30.00', date(2025, 1, 20), 'supplies')
+        self.add_entry('-20.00', date(2025, 3, 2), 'supplies')
+
+    def test_close_snapshots_every_month_in_order(self):
+        periods = pettycash.close_periods(date(2025, 3, 1))
+        self.assertEqual([p.month for p in periods], [date(2025, 1, 1), date(2025, 2, 1), date(2025, 3, 1)])
+        self.assertEqual([p.closing_balance for p in periods], [Decimal('70.00'), Decimal('70.00'), Decimal('50.00')])
+        self.assertEqual(pettycash.close_periods(date(2025, 3, 1)), [])
+
+    def test_current_balance_is_snapshot_plus_open_delta(self):
+        pettycash.close_periods(date(2025, 2, 1))
+        self.assertEqual(pettycash.current_balance(), Decimal('50.00'))
+        # Only the open period is scanned: an entry before the snapshot is not re-read.
+        self.assertEqual(pettycash.open_entries().count(), 1)
+
+    def test_category_report_reads_snapshots(self):
+        pettycash.close_periods(date(2025, 3, 1))
+        PettyCash.objects.update(amount=Decimal('0.00'))  # bypasses the snapshots
+        report = {row['category']: row for row in pettycash.category_report()}
+        self.assertEqual(report['supplies']['total_out'], Decimal('-50.00'))
+        self.assertEqual(report['float']['total_in'], Decimal('100.00'))
+
+    def test_editing_a_closed_month_reopens_it(self):
+        pettycash.close_periods(date(2025, 3, 1))
+        january = PettyCash.objects.get(date=date(2025, 1, 20))
+        january.amount = Decimal('-40.00')
+        january.save()
+        self.assertFalse(PettyCashPeriod.objects.exists())
+        self.assertEqual(pettycash.current_balance(), Decimal('40.00'))
+
+        pettycash.close_periods(date(2025, 3, 1))
+        PettyCash.objects.get(date=date(2025, 3, 2)).delete()
+        self.assertEqual(list(PettyCashPeriod.objects.order_by('month').values_list('month', flat=True)), [date(2025, 1, 1), date(2025, 2, 1)])
+        self.assertEqual(pettycash.current_balance(), Decimal('60.00'))
+
+    def test_current_month_cannot_be_closed(self):
+        with self.assertRaises(ValueError):
+            pettycash.close_periods(date.today())
+        self.assertFalse(PettyCashPeriod.objects.exists())
+
+    @override_settings(REPLICA_DATABASE=None)
+    def test_petty_cash_list_shows_balance(self):
+        pettycash.close_periods(date(2025, 1, 1))
+        admin = User.objects.create_user(username='admin', password='pw', is_staff=True)
+        self.client.force_login(admin)
+        response = self.client.get(reverse('value:petty_cash_list'))
+        self.assertEqual(response.context['petty_cash_balance'], Decimal('50.00'))
+        self.assertEqual(len(response.context['petty_cash_entries']), 1)
+
+
+class PayrollTests(TestCase):
+    month = date(2025, 3, 1)
+
+    def make_teachers(self, count):
+        teachers = []
+        for _ in range(count):
+            user = User.objects.create(username=f'payroll{Teacher.objects.count()}', role='teacher')
+            teacher = Teacher.objects.create(user=user, base_salary=Decimal('2000.00'))
+            TeacherAttendance.objects.create(teacher=teacher, date=date(2025, 3, 3), present=False)
+            TeacherAttendance.objects.create(teacher=teacher, date=date(2025, 3, 4), present=True)
+            TeacherAttendance.objects.create(teacher=teacher, date=date(2025, 2, 27), present=False)
+            teachers.append(teacher)
+        return teachers
+
+    def test_absences_in_month_are_deducted(self):
+        teacher, = self.make_teachers(1)
+        run = run_payroll(self.month, working_days=20)
+        salary = TeacherSalary.objects.get(teacher=teacher, payroll_run=run)
+        self.assertEqual(salary.amount, Decimal('1900.00'))
+        self.assertEqual(salary.date, date(2025, 3, 31))
+
+    def test_query_count_does_not_grow_with_teachers(self):
+        self.make_teachers(2)
+        with self.assertNumQueries(10):
+            run_payroll(self.month, working_days=20)
+        self.make_teachers(8)
+        with self.assertNumQueries(10):
+            run_payroll(date(2025, 4, 1), working_days=20)
+
+    def test_rerun_is_idempotent_and_records_changes(self):
+        teacher, = self.make_teachers(1)
+        run_payroll(self.month, working_days=20)
+        run_payroll(self.month, working_days=20)
+        self.assertEqual(TeacherSalary.objects.filter(teacher=teacher).count(), 1)
+        self.assertFalse(TeacherSalaryHistory.objects.exists())
+
+        TeacherAttendance.objects.filter(teacher=teacher, date=date(2025, 3, 4)).update(present=False)
+        run = run_payroll(self.month, working_days=20)
+        history = TeacherSalaryHistory.objects.get()
+        self.assertEqual((history.old_amount, history.new_amount), (Decimal('1900.00'), Decimal('1800.00')))
+        self.assertEqual(run.total, Decimal('1800.00'))
+
+
+class AuditLogWriterTests(TransactionTestCase):
+    def test_entries_are_written_in_background_batches(self):
+        writer = audit.AuditLogWriter(batch_size=10, flush_interval=0.05)
+        classroom = Classroom.objects.create(name='1A')
+        with self.assertNumQueries(0):
+            for i in range(25):
+                writer.log('edit_classroom', obj=classroom, diff={'capacity': [str(i), str(i + 1)]})
+        writer.stop()
+        self.assertEqual(CriticalHistory.objects.filter(object_type='value.classroom', object_id=str(classroom.pk)).count(), 25)
+
+    def test_log_after_stop_writes_inline(self):
+        writer = audit.AuditLogWriter()
+        writer.stop()
+        writer.log('delete_student', object_repr='gone')
+        self.assertTrue(CriticalHistory.objects.filter(action='delete_student', object_repr='gone').exists())
+
+
+@override_settings(AUDIT_LOG={'ASYNC': False})
+class AuditedViewTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(username='admin', password='pw', is_staff=True)
+        self.client.force_login(self.admin)
+
+    def test_edit_classroom_logs_actor_and_diff(self):
+        classroom = Classroom.objects.create(name='1A', capacity=30)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('value:edit_classroom', args=[classroom.pk]), {'name': '1A', 'capacity': 35})
+        entry = CriticalHistory.objects.get(action='edit_classroom')
+        self.assertEqual(entry.actor, self.admin)
+        self.assertEqual(entry.diff, {'capacity': ['30', '35']})
+
+    def test_delete_student_is_logged(self):
+        User.objects.create_user(username='kid', password='pw', role='student')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('value:delete_student'), {'username': 'kid'})
+        self.assertEqual(CriticalHistory.objects.get(action='delete_student').object_repr, 'kid')
+
+    def test_failed_delete_leaves_no_entry(self):
+        classroom = Classroom.objects.create(name='1A')
+        with self.captureOnCommitCallbacks(execute=True), mock.patch.object(Classroom, 'delete', side_effect=DatabaseError):
+            self.client.post(reverse('value:delete_classroom', args=[classroom.pk]))
+        self.assertTrue(Classroom.objects.filter(pk=classroom.pk).exists())
+        self.assertFalse(CriticalHistory.objects.exists())
+
+    def test_payment_edits_and_deletes_in_the_admin_are_logged(self):
+        superuser = User.objects.create_superuser(username='root', password='pw')
+        self.client.force_login(superuser)
+        student = Student.objects.create(user=User.objects.create(username='kid', role='student'))
+        payment = StudentPayment.objects.create(student=student, amount=Decimal('100.00'), date=date(2025, 3, 1))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('admin:value_studentpayment_change', args=[payment.pk]),
+                             {'student': student.pk, 'amount': '120.00', 'date': '2025-03-01'})
+        self.assertEqual(CriticalHistory.objects.get(action='edit_payment').diff, {'amount': ['100.00', '120.00']})
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('admin:value_studentpayment_delete', args=[payment.pk]), {'post': 'yes'})
+        self.assertFalse(StudentPayment.objects.exists())
+        entry = CriticalHistory.objects.get(action='delete_payment')
+        self.assertEqual((entry.actor, entry.object_id), (superuser, str(payment.pk)))
+
+
+class TemporaryExpiryTests(TestCase):
+    def setUp(self):
+        past = timezone.now() - timedelta(minutes=1)
+        Temporary.objects.bulk_create(Temporary(data='old', expires_at=past) for _ in range(25))
+        Temporary.objects.create(data='fresh')
+        Temporary.objects.create(data='forever', expires_at=None)
+
+    def test_reads_ignore_expired_rows(self):
+        self.assertEqual(sorted(Temporary.live.values_list('data', flat=True)), ['forever', 'fresh'])
+        self.assertEqual(Temporary.objects.count(), 27)
+        self.assertIs(Temporary._default_manager, Temporary.objects)
+
+    def test_purge_deletes_in_bounded_batches(self):
+        result = purge_expired(batch_size=10, max_batches=2)
+        self.assertEqual((result.rows, result.batches), (20, 2))
+        result = purge_expired(batch_size=10)
+        self.assertEqual((result.rows, result.batches), (5, 1))
+        self.assertEqual(Temporary.objects.count(), 2)
+
+
+# Routing to a replica is covered by ReplicaRoutingTests; keep these on one database.
+@override_settings(AUDIT_LOG={'ASYNC': False}, REPLICA_DATABASE=None)
+class DashboardTemplateTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        classroom = Classroom.objects.create(name='1A')
+        Student.objects.create(user=User.objects.create(username='kid', role='student'), student_class=classroom)
+        Teacher.objects.create(user=User.objects.create(username='teach', role='teacher'))
+        self.client.force_login(User.objects.create_user(username='admin', password='pw', is_staff=True))
+
+    def test_every_section_renders(self):
+        for name in ['dashboard_home', 'dashboard_user_list', 'dashboard_student_list', 'dashboard_teacher_list',
+                     'dashboard_classroom_list', 'payment_list', 'event_list', 'petty_cash_list', 'exam_list',
+                     'chat_room', 'group_chat', 'friends_list']:
+            with self.subTest(name=name):
+                self.assertEqual(self.client.get(reverse(f'value:{name}')).status_code, 200)
+
+    def test_stat_cards_are_cached_until_data_changes(self):
+        url = reverse('value:dashboard_home')
+        self.client.get(url)
+        with self.assertNumQueries(0):  # session, user and fragments all come from the cache
+            self.client.get(url)
+        Student.objects.create(user=User.objects.create(username='kid2', role='student'))
+        self.assertContains(self.client.get(url), '<p class="text-3xl font-bold text-blue-800" id="totalStudents">2</p>', html=True)
+
+    def test_versions_move_again_on_commit_and_leave_cascades_fast(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            before = get_version(Event)
+            Event.objects.create(title='Open day', date=date(2025, 3, 20))
+            during = get_version(Event)
+        self.assertNotEqual(before, during)
+        self.assertNotEqual(during, get_version(Event))
+        self.assertTrue(Collector(using='default').can_fast_delete(StudentAttendance.objects.all()))
+        self.assertFalse(Collector(using='default').can_fast_delete(Student.objects.all()))
+
+
+class DatabaseSettingsTests(TestCase):
+    def test_connection_pragmas_are_applied(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest("SQLite only")
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 5000)
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+
+    def test_postgres_session_settings_and_triggers(self):
+        if connection.vendor != 'postgresql':
+            self.skipTest("PostgreSQL only")
+        with connection.cursor() as cursor:
+            cursor.execute('SHOW statement_timeout')
+            self.assertEqual(cursor.fetchone()[0], '30s')
+            cursor.execute("SELECT tgname FROM pg_trigger WHERE tgname LIKE %s OR tgname LIKE %s",
+                           ['%_amount_history', '%_search'])
+            self.assertEqual(len(cursor.fetchall()), len(history.TRACKED_TABLES) + len(search.SOURCES))
+
+    def test_postgres_profile_from_environment(self):
+        from school_system.database import database_from_env
+        pooled = database_from_env('unused', {'DB_BACKEND': 'postgres', 'PGDATABASE': 'school', 'DB_POOL_MAX_SIZE': '20'})
+        self.assertEqual(pooled['ENGINE'], 'django.db.backends.postgresql')
+        self.assertEqual((pooled['CONN_MAX_AGE'], pooled['OPTIONS']['pool']['max_size']), (0, 20))
+        persistent = database_from_env('unused', {'DB_BACKEND': 'postgres'})
+        self.assertNotIn('pool', persistent['OPTIONS'])
+        self.assertGreater(persistent['CONN_MAX_AGE'], 0)
+
+    def test_no_persistent_connections_under_asgi(self):
+        from school_system.database import database_from_env
+        self.assertGreater(database_from_env('db.sqlite3', {})['CONN_MAX_AGE'], 0)
+        for environ in [{'DJANGO_ASGI': '1'}, {'DJANGO_ASGI': '1', 'DB_BACKEND': 'postgres'}]:
+            with self.subTest(environ=environ):
+                self.assertEqual(database_from_env('db.sqlite3', environ)['CONN_MAX_AGE'], 0)
+
+
+@override_settings(REPLICA_DATABASE='replica', REPLICA_PIN_SECONDS=5)
+class ReplicaRoutingTests(SimpleTestCase):
+    def setUp(self):
+        router = PrimaryReplicaRouter()
+
+        @use_replica
+        def list_view(request):
+            return HttpResponse(router.db_for_read(Student))
+
+        def other_view(request):
+            return HttpResponse(router.db_for_read(Student))
+
+        self.list_view = ReplicaPinningMiddleware(list_view)
+        self.other_view = ReplicaPinningMiddleware(other_view)
+        self.factory = RequestFactory()
+
+    def test_only_decorated_reads_use_the_replica(self):
+        self.assertEqual(self.list_view(self.factory.get('/')).content, b'replica')
+        self.assertEqual(self.other_view(self.factory.get('/')).content, b'default')
+        self.assertEqual(PrimaryReplicaRouter().db_for_write(Student), 'default')
+
+    def test_post_pins_the_following_reads_to_the_primary(self):
+        response = self.other_view(self.factory.post('/'))
+        cookie = response.cookies[PIN_COOKIE].value
+        request = self.factory.get('/')
+        request.COOKIES[PIN_COOKIE] = cookie
+        self.assertEqual(self.list_view(request).content, b'default')
+        request.COOKIES[PIN_COOKIE] = '0'
+        self.assertEqual(self.list_view(request).content, b'replica')
+
+
+@override_settings(REPLICA_DATABASE='replica', AUDIT_LOG={'ASYNC': False})
+class ReplicaLagTests(TestCase):
+    """Whatever is cached under a data version must not come from a replica that lags behind."""
+
+    def setUp(self):
+        cache.clear()
+        self.replica_reads = []
+        route = PrimaryReplicaRouter.db_for_read
+
+        def db_for_read(router, model, **hints):
+            # The test database stands in for both; record what the lagging replica would serve.
+            if route(router, model, **hints) == 'replica':
+                self.replica_reads.append(model)
+            return 'default'
+
+        patcher = mock.patch.object(PrimaryReplicaRouter, 'db_for_read', db_for_read)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        Classroom.objects.create(name='1A')
+        self.client.force_login(User.objects.create_user(username='admin', password='pw', is_staff=True))
+
+    def test_versioned_fragments_and_feed_read_the_primary(self):
+        self.assertEqual(self.client.get(reverse('value:dashboard_home')).status_code, 200)
+        self.assertEqual(self.client.get(reverse('value:calendar_feed', args=[agenda.feed_token('admin')])).status_code, 200)
+        self.assertEqual(self.replica_reads, [])
+        self.client.get(reverse('value:dashboard_classroom_list'))
+        self.assertIn(Classroom, self.replica_reads)  # the uncached list itself still uses the replica
+
+    def test_api_reads_the_replica_only_without_validators(self):
+        url = reverse('value:api_list', args=['classrooms'])
+        with mock.patch('value.api.shared', return_value=True):
+            self.assertTrue(self.client.get(url).has_header('ETag'))
+        self.assertEqual(self.replica_reads, [])
+        self.assertFalse(self.client.get(url).has_header('ETag'))
+        self.assertEqual(self.replica_reads, [Classroom])
+
+
+class CachedUserTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='teach', password='pw', role='teacher')
+        self.client.force_login(self.user)
+
+    def test_authenticated_request_needs_no_queries_once_cached(self):
+        self.client.get(reverse('value:teacher_dashboard'))
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(reverse('value:teacher_dashboard')).status_code, 200)
+
+    async def test_sync_views_and_middleware_serve_asgi_requests(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse('value:teacher_dashboard'))
+        self.assertEqual(response.status_code, 200)
+
+    def test_saving_the_user_drops_the_cached_copy(self):
+        self.client.get(reverse('value:teacher_dashboard'))
+        self.user.role = 'parent'
+        self.user.save()
+        response = self.client.get(reverse('value:teacher_dashboard'))
+        self.assertRedirects(response, reverse('value:home'), fetch_redirect_response=False)
+
+    def test_cache_holds_no_password_and_updates_are_forgotten(self):
+        self.client.get(reverse('value:teacher_dashboard'))
+        cached = cache.get(backends.USER_KEY.format(self.user.pk))
+        self.assertNotIn(self.user.password, str(cached))
+        user = backends.CachedModelBackend().get_user(self.user.pk)
+        self.assertEqual(user.get_deferred_fields(), {'password', 'last_login', 'date_joined'})
+        with self.assertNumQueries(1):
+            self.assertTrue(user.check_password('pw'))  # loads the deferred hash
+
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        backends.forget_users([self.user.pk])
+        response = self.client.get(reverse('value:teacher_dashboard'))
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(response.wsgi_request.user.is_authenticated)
+
+    def test_changing_the_own_password_keeps_the_session(self):
+        User.objects.filter(pk=self.user.pk).update(is_staff=True)
+        backends.forget_users([self.user.pk])
+        self.client.get(reverse('value:teacher_dashboard'))  # request.user now comes from the cache
+        response = self.client.post(
+            reverse('admin:password_change'),
+            {'old_password': 'pw', 'new_password1': 'a-new-Passw0rd', 'new_password2': 'a-new-Passw0rd'},
+        )
+        self.assertRedirects(response, reverse('admin:password_change_done'), fetch_redirect_response=False)
+        self.assertEqual(self.client.get(reverse('value:teacher_dashboard')).status_code, 200)
+
+        self.user.set_password('changed elsewhere')
+        self.user.save()
+        response = self.client.get(reverse('value:teacher_dashboard'))
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(response.wsgi_request.user.is_authenticated)
+
+
+class RoleRequiredTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.classroom = Classroom.objects.create(name='1A')
+        self.user = User.objects.create_user(username='kid', password='pw', role='student')
+        Student.objects.create(user=self.user, student_class=self.classroom)
+        self.client.force_login(self.user)
+
+    def test_other_roles_are_redirected_with_the_views_message(self):
+        response = self.client.get(reverse('value:teacher_dashboard'))
+        self.assertRedirects(response, reverse('value:home'), fetch_redirect_response=False)
+        self.assertEqual(
+            [str(message) for message in get_messages(response.wsgi_request)],
+            ["You do not have permission to access the teacher dashboard."],
+        )
+
+    def test_profile_is_served_from_the_cache(self):
+        url = reverse('value:student_dashboard')
+        self.assertContains(self.client.get(url), '1A')
+        with self.assertNumQueries(0):
+            self.client.get(url)
+        self.classroom.name = '2B'
+        self.classroom.save()
+        self.assertContains(self.client.get(url), '2B')
+
+
+@override_settings(REPLICA_DATABASE=None)
+class ApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        for name in ['1A', '1B', '2A']:
+            Classroom.objects.create(name=name)
+        self.client.force_login(User.objects.create_user(username='admin', password='pw', is_staff=True))
+
+    def test_sparse_fields_and_keyset_pages(self):
+        url = reverse('value:api_list', args=['classrooms'])
+        page = self.client.get(url, {'fields': 'name', 'limit': 2}).json()
+        self.assertEqual(page['results'], [{'name': '1A'}, {'name': '1B'}])
+        page = self.client.get(page['next']).json()
+        self.assertEqual((page['results'], page['next']), ([{'name': '2A'}], None))
+        self.assertEqual(self.client.get(url, {'fields': 'secret'}).status_code, 400)
+
+    @mock.patch('value.api.shared', return_value=True)
+    def test_unchanged_resource_is_a_304_without_queries(self, shared):
+        url = reverse('value:api_list', args=['classrooms'])
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        for variant in ({'after': 1}, {'fields': 'name'}):
+            self.assertEqual(self.client.get(url, variant, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        detail = reverse('value:api_detail', args=['classrooms', Classroom.objects.first().pk])
+        self.assertEqual(self.client.get(detail, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        Classroom.objects.create(name='3A')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_no_validators_without_a_shared_cache(self):
+        response = self.client.get(reverse('value:api_list', args=['classrooms']))
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('ETag') or response.has_header('Last-Modified'))
+
+    def test_chats_are_scoped_to_the_user(self):
+        kid, teacher = User.objects.create(username='kid', role='student'), User.objects.create(username='t', role='teacher')
+        Chat.objects.create(sender=kid, receiver=teacher, message='hi')
+        Chat.objects.create(sender=teacher, receiver=teacher, message='note to self')
+        self.client.force_login(kid)
+        self.assertEqual(self.client.get(reverse('value:api_list', args=['students'])).status_code, 403)
+        chats = self.client.get(reverse('value:api_list', args=['chats']), {'fields': 'message'}).json()['results']
+        self.assertEqual(chats, [{'message': 'hi'}])
+
+
+class ParentPortalTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user(username='mum', password='pw', role='parent')
+        self.parent = Parent.objects.create(user=user)
+        self.classroom = Classroom.objects.create(name='1A', fee=Decimal('100.00'))
+        Timetable.objects.create(
+            class_name=self.classroom, subject=Subject.objects.create(name='Maths'),
+            teacher=Teacher.objects.create(user=User.objects.create(username='t', role='teacher')),
+            day_of_week='Monday', start_time='08:00', end_time='09:00',
+        )
+        self.exams = [Exam.objects.create(name=f'Exam {n}', date=date(2025, 1, n + 1)) for n in range(3)]
+        self.add_child('kid1')
+        self.client.force_login(user)
+
+    def add_child(self, username):
+        student = Student.objects.create(user=User.objects.create(username=username, role='student'), student_class=self.classroom)
+        for exam in self.exams:
+            StudentExam.objects.create(student=student, exam=exam, marks=70)
+        StudentAttendance.objects.create(student=student, date=date(2025, 1, 1), present=True)
+        StudentAttendance.objects.create(student=student, date=date(2025, 1, 2), present=False)
+        StudentPayment.objects.create(student=student, amount=Decimal('40.00'), date=date(2025, 1, 1))
+        self.parent.students.add(student)
+
+    def portal(self):
+        url = reverse('value:parent_portal')
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            children = self.client.get(url).json()['children']
+        return children, len(queries)
+
+    def test_aggregates_per_child(self):
+        [child], _ = self.portal()
+        self.assertEqual((child['attendance_percentage'], child['outstanding_balance']), (50.0, '60.00'))
+        self.assertEqual([exam['exam'] for exam in child['latest_exams']], ['Exam 2', 'Exam 1', 'Exam 0'])
+        self.assertEqual(child['timetable'][0]['subject'], 'Maths')
+
+    def test_query_count_does_not_grow_with_children(self):
+        _, one_child = self.portal()
+        self.add_child('kid2')
+        self.add_child('kid3')
+        children, three_children = self.portal()
+        self.assertEqual(len(children), 3)
+        self.assertEqual(one_child, three_children)
+        self.assertContains(self.client.get(reverse('value:parent_dashboard')), 'kid3')
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user(username='alice', password='pw', role='teacher', first_name='Alice')
+        self.bob = User.objects.create(username='bob', role='student')
+        Event.objects.create(title='Science fair', date=date(2025, 3, 1), description='Projects in the main hall')
+        Chat.objects.create(sender=self.alice, receiver=self.bob, message='See you at the science fair')
+        Chat.objects.create(sender=self.bob, receiver=self.bob, message='private science notes')
+
+    def kinds(self, text, user):
+        return sorted((result.kind, result.object_id) for result in search.search(text, user=user))
+
+    def test_index_follows_writes_and_ranks_titles_first(self):
+        results = search.search('scien fair', user=self.alice)
+        self.assertEqual([result.kind for result in results], ['event', 'chat'])
+        event = Event.objects.get()
+        event.title = 'Art show'
+        event.save()
+        self.assertEqual([result.kind for result in search.search('science', user=self.alice)], ['chat'])
+        event.delete()
+        self.assertEqual(search.search('art', user=self.alice), [])
+
+    def test_chat_is_private_to_its_participants(self):
+        self.assertEqual([kind for kind, _ in self.kinds('science', self.alice)], ['chat', 'event'])
+        self.assertEqual([kind for kind, _ in self.kinds('science', self.bob)], ['chat', 'chat', 'event'])
+        self.assertEqual(search.search('"; DROP TABLE value_chat; --', user=self.bob), [])
+
+    def test_search_endpoint(self):
+        self.client.force_login(self.alice)
+        response = self.client.get(reverse('value:search'), {'q': 'alice', 'kind': 'user'})
+        self.assertEqual(response.json()['results'][0]['object_id'], self.alice.pk)
+        self.assertEqual(self.client.get(reverse('value:search'), {'q': 'x', 'kind': 'nope'}).status_code, 400)
+        with mock.patch.object(search, 'is_supported', return_value=False):
+            response = self.client.get(reverse('value:search'), {'q': 'alice'})
+        self.assertEqual((response.status_code, response.json()['error']), (503, "Search is not available on this database."))
+
+
+@override_settings(REPLICA_DATABASE=None)
+class CalendarTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        exam = Exam.objects.create(name='Maths', date=date(2025, 3, 4))
+        ExamTimetable.objects.create(exam=exam, notes='Room 1, 9:00')
+        Event.objects.create(title='Sports day', date=date(2025, 3, 3), description='Bring water; and a hat')
+        Event.objects.create(title='Later', date=date(2025, 3, 10))
+
+    def test_range_is_one_chronological_stream(self):
+        items = list(agenda.between(date(2025, 3, 3), date(2025, 3, 10)))
+        self.assertEqual([(item.kind, item.title) for item in items],
+                         [('event', 'Sports day'), ('exam', 'Maths'), ('exam_timetable', 'Maths timetable')])
+        self.assertEqual(len(list(agenda.between(date(2025, 3, 3), date(2025, 3, 10), kinds=['event']))), 1)
+
+    @override_settings(TIME_ZONE='UTC')
+    @mock.patch('value.views.shared', return_value=True)
+    def test_feed_is_per_role_and_conditional(self, shared):
+        with mock.patch('django.utils.timezone.localdate', return_value=date(2025, 3, 1)):
+            url = reverse('value:calendar_feed', args=[agenda.feed_token('parent')])
+            response = self.client.get(url)
+            self.assertEqual(response['Content-Type'], 'text/calendar; charset=utf-8')
+            body = response.content.decode()
+            self.assertIn('SUMMARY:Sports day\r\n', body)
+            self.assertIn('DESCRIPTION:Bring water\\; and a hat\r\n', body)
+            self.assertNotIn('timetable', body)  # parents get events and exams only
+            with self.assertNumQueries(0):
+                self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+                self.assertEqual(self.client.get(url).content, response.content)
+            Event.objects.create(title='Open day', date=date(2025, 3, 20))
+            self.assertContains(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']), 'Open day')
+        self.assertEqual(self.client.get(url.replace('parent', 'admin')).status_code, 404)
+        shared.return_value = False
+        self.assertFalse(self.client.get(url).has_header('ETag'))
+
+
+@tasks.task(name='tests.record', bind=True, retry_delay=0)
+def record_task(job, value, fail_times=0):
+    job.set_progress(1, 2, 'halfway')
+    if job.task.attempts <= fail_times:
+        raise RuntimeError('boom')
+    return {'value': value}
+
+
+@override_settings(AUDIT_LOG={'ASYNC': False})
+class TaskQueueTests(TestCase):
+    def test_add_student_hashes_the_password_in_the_request(self):
+        admin = User.objects.create_user(username='admin', password='pw', is_staff=True)
+        self.client.force_login(admin)
+        self.client.post(reverse('value:add_student'), {'username': 'kid', 'password': 's3cret!', 'password2': 's3cret!'})
+        self.assertTrue(User.objects.get(username='kid').check_password('s3cret!'))
+        self.assertFalse(Task.objects.exists())  # no password lands in a task row
+
+        job = tasks.enqueue(record_task, args=['x'], user=admin)
+        self.assertEqual((job.status, job.created_by), (Task.QUEUED, admin))
+        self.assertEqual(tasks.run_pending(), 1)
+        self.assertEqual(self.client.get(reverse('value:task_status', args=[job.pk])).json()['status'], 'succeeded')
+
+    def test_retries_priority_and_results(self):
+        low = tasks.enqueue(record_task, args=['low'], priority=0)
+        flaky = tasks.enqueue(record_task, args=['flaky'], kwargs={'fail_times': 1}, priority=5)
+        doomed = tasks.enqueue(record_task, args=['doomed'], kwargs={'fail_times': 9}, priority=9)
+        order = [job.pk for job in tasks.claim('test', limit=3)]
+        self.assertEqual(order, [doomed.pk, flaky.pk, low.pk])
+        Task.objects.update(status=Task.QUEUED, attempts=0)
+
+        with self.assertLogs('value.tasks', 'WARNING'):
+            tasks.run_pending()
+        for job in (low, flaky, doomed):
+            job.refresh_from_db()
+        self.assertEqual((low.status, low.result, low.progress), (Task.SUCCEEDED, {'value': 'low'}, 1))
+        self.assertEqual((flaky.status, flaky.attempts), (Task.SUCCEEDED, 2))
+        self.assertEqual((doomed.status, doomed.attempts), (Task.FAILED, 3))
+        self.assertIn('RuntimeError: boom', doomed.error)
+
+    def test_only_jobs_without_a_recent_heartbeat_are_reclaimed(self):
+        alive = tasks.enqueue(record_task, args=['alive'])
+        dead = tasks.enqueue(record_task, args=['dead'])
+        once = tasks.enqueue('value.tasks.build_report_cards')  # max_attempts=1
+        tasks.claim('worker-a', limit=3)
+        long_ago = timezone.now() - timedelta(hours=2)
+        Task.objects.update(started_at=long_ago, heartbeat_at=long_ago)  # all started two hours ago
+        self.assertEqual(tasks.beat('worker-a'), 3)
+        Task.objects.exclude(pk=alive.pk).update(heartbeat_at=long_ago)  # ...but only one still beats
+
+        with self.assertLogs('value.tasks', 'ERROR'):
+            self.assertEqual(tasks.requeue_stale(), 1)
+        statuses = dict(Task.objects.values_list('pk', 'status'))
+        self.assertEqual(statuses, {alive.pk: Task.RUNNING, dead.pk: Task.QUEUED, once.pk: Task.FAILED})
+        dead.refresh_from_db()
+        self.assertEqual((dead.locked_by, dead.attempts), ('', 1))
+
+        # A job reclaimed past its attempts is failed, not run again.
+        Task.objects.filter(pk=dead.pk).update(max_attempts=0)
+        self.assertEqual(tasks.run_pending(worker_id='worker-b'), 1)
+        dead.refresh_from_db()
+        self.assertEqual((dead.status, dead.result), (Task.FAILED, None))
+
+    @override_settings(TASK_QUEUE={'EAGER': True})
+    def test_eager_mode_runs_inside_enqueue(self):
+        self.assertEqual(tasks.enqueue('tests.record', args=[1]).result, {'value': 1})
+
+
+class RunTasksCommandTests(TransactionTestCase):
+    def test_worker_drains_the_queue(self):
+        for n in range(5):
+            tasks.enqueue(record_task, args=[n])
+        call_command('run_tasks', '--once', '--workers', '2', '--poll-interval', '0.01', stdout=StringIO())
+        self.assertEqual(
+            sorted(Task.objects.filter(status=Task.SUCCEEDED).values_list('result__value', flat=True)),
+            list(range(5)),
+        )
+
+
+class ReportCardTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.classroom = Classroom.objects.create(name='Year 5 (Blue)')
+        cls.other = Classroom.objects.create(name='Year 6')
+        cls.exam = Exam.objects.create(name='Maths', date=date(2025, 3, 1))
+        late = Exam.objects.create(name='Science', date=date(2025, 9, 1))
+        cls.students = []
+        for i in range(3):
+            student = Student.objects.create(
+                user=User.objects.create(username=f'kid{i}', first_name='Kid', last_name=str(i), role='student'),
+                student_class=cls.classroom,
+            )
+            for exam, marks in ((cls.exam, 60 + i * 10), (late, 50)):
+                StudentGrade.objects.create(
+                    student_exam=StudentExam.objects.create(student=student, exam=exam, marks=marks), grade='B',
+                )
+            StudentAttendance.objects.create(student=student, date=date(2025, 3, 3), present=True)
+            StudentAttendance.objects.create(student=student, date=date(2025, 3, 4), present=i == 0)
+            cls.students.append(student)
+        Student.objects.create(user=User.objects.create(username='other', role='student'), student_class=cls.other)
+
+    def test_cards_take_four_queries_per_classroom(self):
+        with self.assertNumQueries(4):
+            cards = reportcards.classroom_cards(self.classroom, start=date(2025, 1, 1), end=date(2025, 6, 30))
+        self.assertEqual([card['username'] for card in cards], ['kid0', 'kid1', 'kid2'])
+        first = cards[0]
+        self.assertEqual(first['exams'], [('2025-03-01', 'Maths', 60, 'B')])  # Science is out of term
+        self.assertEqual((first['present'], first['days'], first['average']), (2, 2, 60))
+        self.assertEqual(cards[1]['present'], 1)
+
+    def test_pdf_has_every_exam(self):
+        card = reportcards.classroom_cards(self.classroom)[0]
+        card['exams'] *= 40  # spills onto a second page
+        document = pdf.report_card(card)
+        self.assertTrue(document.startswith(b'%PDF-') and document.rstrip().endswith(b'%%EOF'))
+        self.assertIn(b'/Count 2', document)
+
+    def test_names_outside_latin_fail_loudly_or_use_the_given_font(self):
+        card = {**reportcards.classroom_cards(self.classroom)[0], 'name': 'Łukasz Иванов'}
+        with self.assertRaisesMessage(pdf.UnsupportedText, 'no TrueType font was given'):
+            pdf.report_card(card)
+        if not Path(DEJAVU).exists():
+            self.skipTest('DejaVu fonts are not installed')
+        document = pdf.report_card(card, fonts=(DEJAVU,))
+        self.assertIn(b'/ToUnicode', document)
+        with self.assertRaisesMessage(pdf.UnsupportedText, 'no glyph'):
+            pdf.report_card({**card, 'name': '山田'}, fonts=(DEJAVU,))  # no CJK in DejaVu Sans
+        arabic = {**card, 'name': 'محمد'}
+        if pdf.uharfbuzz is None:
+            self.assertRaises(pdf.UnsupportedText, pdf.report_card, arabic, fonts=(DEJAVU,))
+        else:
+            self.assertIn(b'/ToUnicode', pdf.report_card(arabic, fonts=(DEJAVU,)))
+
+    def test_cards_that_cannot_be_rendered_are_skipped_and_listed(self):
+        User.objects.filter(username='kid0').update(first_name='Łukasz')
+        out = BytesIO()
+        with override_settings(REPORT_CARDS={'WORKERS': 1}):
+            stats = reportcards.build_archive(out, [self.classroom])
+        self.assertEqual(stats['documents'], 2)
+        self.assertEqual([(failure['username'], 'Łukasz' in failure['error']) for failure in stats['failed']], [('kid0', True)])
+        self.assertEqual(len(zipfile.ZipFile(out).namelist()), 2)
+
+    def test_failed_build_leaves_no_partial_archive(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'cards.zip'
+            with mock.patch.object(reportcards, 'classroom_cards', side_effect=[[], DatabaseError]), \
+                    self.assertRaises(DatabaseError):
+                reportcards.build_archive(path, [self.classroom, self.other], workers=1)
+            self.assertFalse(path.exists())
+
+    def test_archive_with_a_process_pool(self):
+        out = BytesIO()
+        stats = reportcards.build_archive(out, workers=2)
+        self.assertEqual((stats['documents'], stats['classrooms']), (4, 2))
+        with zipfile.ZipFile(out) as archive:
+            names = archive.namelist()
+            self.assertIn(f'{self.classroom.pk}-year-5-blue/kid0.pdf', names)
+            self.assertEqual(len(names), 4)
+            self.assertTrue(all(archive.read(name).startswith(b'%PDF') for name in names))
+
+    def test_view_queues_the_build_and_serves_the_archive(self):
+        admin = User.objects.create_user(username='admin', password='pw', is_staff=True)
+        self.client.force_login(admin)
+        with tempfile.TemporaryDirectory() as tmp, override_settings(
+            TASK_QUEUE={'EAGER': True}, REPORT_CARDS={'DIR': tmp, 'WORKERS': 1},
+        ):
+            response = self.client.post(reverse('value:report_cards'), {'classroom': [self.classroom.pk], 'from': '2025-01-01'})
+            self.assertEqual(response.status_code, 202)
+            job = Task.objects.get(pk=response.json()['task'])
+            self.assertEqual((job.status, job.result['documents']), (Task.SUCCEEDED, 3))
+            download = self.client.get(response.json()['download_url'])
+            self.assertEqual(download['Content-Type'], 'application/zip')
+            with zipfile.ZipFile(BytesIO(b''.join(download.streaming_content))) as archive:
+                self.assertEqual(len(archive.namelist()), 3)
+
+            self.client.force_login(User.objects.create_user(username='t', password='pw', role='teacher'))
+            self.assertEqual(self.client.get(response.json()['download_url']).status_code, 404)
+            self.assertEqual(self.client.post(reverse('value:report_cards')).status_code, 302)
+
+
+@override_settings(ACADEMIC_YEAR_START_MONTH=9)
+class ArchiveTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(username='admin', is_staff=True)
+        cls.student = Student.objects.create(user=User.objects.create(username='s1', role='student'))
+        for day in (date(2023, 9, 4), date(2024, 8, 30), date(2024, 9, 2), date(2025, 9, 1)):
+            StudentAttendance.objects.create(student=cls.student, date=day)
+        cls.old_payment = StudentPayment.objects.create(student=cls.student, amount=Decimal('10.00'), date=date(2024, 1, 5))
+        for approver in (cls.admin, None):  # approved, then again by an account since removed
+            PaymentNotifications.objects.create(payment=cls.old_payment, approved_by=approver)
+        StudentPayment.objects.filter(pk=cls.old_payment.pk).update(amount=Decimal('12.00'))  # history row
+        StudentPayment.objects.create(student=cls.student, amount=Decimal('5.00'), date=date(2025, 10, 1))
+        cls.chat = Chat.objects.create(sender=cls.admin, receiver=cls.student.user, message='old news')
+        Chat.objects.filter(pk=cls.chat.pk).update(sent_at=timezone.make_aware(timezone.datetime(2024, 5, 1, 12)))
+
+    def archive(self, **kwargs):
+        with mock.patch('django.utils.timezone.localdate', return_value=date(2025, 10, 15)):
+            return archive.archive_years(**kwargs)
+
+    def test_closed_years_move_out_of_the_live_tables(self):
+        years = self.archive()
+        self.assertEqual([str(year) for year in years], ['2023/24', '2024/25'])
+        self.assertEqual(years[0].rows['value_studentattendance'], 2)
+        self.assertEqual(list(StudentAttendance.objects.values_list('date', flat=True)), [date(2025, 9, 1)])
+        self.assertEqual(StudentPayment.objects.count(), 1)
+        self.assertFalse(Chat.objects.exists())
+
+        payment = ArchivedStudentPayment.objects.get(pk=self.old_payment.pk)
+        self.assertEqual(payment.amount, Decimal('12.00'))
+        self.assertEqual([n.approved_by for n in payment.notifications.order_by('pk')], [self.admin, None])
+        self.assertFalse(PaymentNotifications.objects.exists())
+        self.assertEqual([(h.old_amount, h.new_amount) for h in payment.history.all()], [(Decimal('10.00'), Decimal('12.00'))])
+        self.assertFalse(StudentPaymentHistory.objects.exists())
+        self.assertEqual(ArchivedChat.objects.get().pk, self.chat.pk)
+        self.assertEqual(self.archive(), [])
+
+    def test_records_reads_whichever_table_holds_the_year(self):
+        self.assertEqual(archive.records(StudentAttendance, 2023).count(), 2)
+        self.archive(through=2023)
+        self.assertIs(archive.records(StudentAttendance, 2023).model, ArchivedStudentAttendance)
+        self.assertEqual(archive.records(StudentAttendance, date(2024, 3, 1)).count(), 2)
+        self.assertEqual(archive.records(Chat, 2023).get().message, 'old news')
+        self.assertIs(archive.records(StudentAttendance, 2024).model, StudentAttendance)
+        self.assertEqual(archive.records(StudentAttendance, AcademicYear.objects.get()).count(), 2)
+
+        late = StudentAttendance.objects.create(student=self.student, date=date(2024, 2, 1), present=False)
+        rows = archive.records(StudentAttendance, 2023, present=False).order_by('date')
+        self.assertEqual([(type(row), row.pk) for row in rows], [(ArchivedStudentAttendance, late.pk)])
+        self.assertEqual(archive.records(StudentAttendance, 2023).count(), 3)
+
+    def test_archive_is_read_only(self):
+        self.archive()
+        row = ArchivedStudentAttendance.objects.first()
+        with self.assertRaises(ReadOnlyError):
+            row.save()
+        with self.assertRaises(ReadOnlyError):
+            ArchivedStudentAttendance.objects.update(present=False)
+        with self.assertRaises(ReadOnlyError):
+            archive.records(StudentAttendance, 2023).delete()
+
+    def test_open_year_cannot_be_archived(self):
+        with self.assertRaises(ValueError):
+            self.archive(through=2025)
+        self.archive(through=2023)
+        late = StudentAttendance.objects.create(student=self.student, date=date(2024, 2, 1))
+        self.archive(through=2023)
+        self.assertEqual(AcademicYear.objects.get().rows['value_studentattendance'], 3)
+        self.assertTrue(ArchivedStudentAttendance.objects.filter(pk=late.pk).exists())
+
+
+@override_settings(AUDIT_LOG={'ASYNC': False})
+class EnrollmentTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.small = Classroom.objects.create(name='Small', capacity=2)
+        cls.large = Classroom.objects.create(name='Large', capacity=5)
+        cls.students = [
+            Student.objects.create(user=User.objects.create(username=f's{i}', role='student')) for i in range(4)
+        ]
+
+    def counts(self):
+        return list(Classroom.objects.order_by('name').values_list('enrolled_count', flat=True))  # Large, Small
+
+    def test_enroll_moves_places_between_classrooms(self):
+        self.assertEqual(enrollment.enroll_many(self.students[:2], self.small), 2)
+        self.assertEqual(enrollment.enroll_many(self.students[:2], self.small), 0)  # already there
+        self.assertEqual(self.counts(), [0, 2])
+        enrollment.enroll(self.students[0], self.large)
+        self.assertEqual(self.counts(), [1, 1])
+        self.assertEqual(Student.objects.get(pk=self.students[0].pk).student_class, self.large)
+        enrollment.enroll(self.students[0], None)
+        self.assertEqual(self.counts(), [0, 1])
+
+    def test_over_capacity_moves_are_rejected_whole(self):
+        stale = Classroom.objects.get(pk=self.small.pk)
+        enrollment.enroll(self.students[0], self.small)
+        with self.assertRaisesMessage(enrollment.ClassroomFull, 'Small has 1 free places, 3 requested.'):
+            enrollment.enroll_many(self.students[1:], stale)  # the check uses the stored count, not the instance
+        self.assertEqual(Student.objects.filter(student_class=self.small).count(), 1)
+        self.assertEqual(self.counts(), [0, 1])
+
+    def test_cohort_move_and_counter_upkeep(self):
+        enrollment.enroll_many(Student.objects.all(), self.large)
+        with self.assertRaises(enrollment.ClassroomFull):
+            enrollment.move_cohort(self.large, self.small)
+        self.students[3].user.delete()
+        self.assertEqual(self.counts(), [3, 0])
+        Student.objects.filter(pk=self.students[2].pk).update(student_class=None)  # bypasses the counters
+        enrollment.recount()
+        self.assertEqual(self.counts(), [2, 0])
+        self.assertEqual(enrollment.move_cohort(self.large, self.small), 2)
+        self.assertEqual(self.counts(), [0, 2])
+
+    def test_classroom_list_and_views(self):
+        admin = User.objects.create_user(username='admin', password='pw', is_staff=True)
+        self.client.force_login(admin)
+        url = reverse('value:enroll_students', args=[self.small.pk])
+        response = self.client.post(url, {'student': [s.pk for s in self.students[:3]]}, follow=True)
+        self.assertIn('Small has 2 free places', str(list(response.context['messages'])[0]))
+        self.client.post(url, {'student': [self.students[0].pk]})
+
+        page = self.client.get(reverse('value:dashboard_classroom_list'))
+        self.assertContains(page, '1 / 2')
+        Classroom.objects.bulk_create(Classroom(name=f'Room {i}') for i in range(10))
+        cache.clear()
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(reverse('value:dashboard_classroom_list'))
+        Classroom.objects.bulk_create(Classroom(name=f'Annex {i}') for i in range(20))
+        cache.clear()
+        with CaptureQueriesContext(connection) as many:
+            self.client.get(reverse('value:dashboard_classroom_list'))
+        self.assertEqual(len(few), len(many))
+
+        edit = self.client.post(reverse('value:edit_classroom', args=[self.small.pk]), {'name': 'Small', 'capacity': 0})
+        self.assertContains(edit, 'move some out before lowering the capacity')
+
+    def test_saving_a_stale_classroom_keeps_later_enrollments(self):
+        stale = Classroom.objects.get(pk=self.small.pk)
+        form = ClassroomForm({'name': 'Small', 'capacity': 1}, instance=Classroom.objects.get(pk=self.small.pk))
+        enrollment.enroll_many(self.students[:2], self.small)
+        stale.name = 'Smaller'
+        stale.save()
+        self.assertEqual(self.counts(), [0, 2])
+        self.assertFalse(form.is_valid())  # checked against the stored count, not the loaded one
+        stale.capacity = 1
+        with self.assertRaisesMessage(CapacityBelowEnrollment, '2 students are enrolled'):
+            stale.save()  # what a form checked before the enrollments would get to
+        self.assertEqual(Classroom.objects.get(pk=self.small.pk).capacity, 2)
+        stale.capacity = 3
+        stale.save()
+        self.assertEqual(Classroom.objects.values_list('capacity', 'enrolled_count').get(pk=self.small.pk), (3, 2))
+
+
+@override_settings(AUDIT_LOG={'ASYNC': False})
+class OffboardingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(username='admin', is_staff=True)
+        cls.classroom = Classroom.objects.create(name='6A', capacity=10)
+        cls.stays = Student.objects.create(user=User.objects.create(username='stays', role='student'))
+        cls.leaving = [Student.objects.create(user=User.objects.create(username=f'l{i}', role='student')) for i in range(3)]
+        enrollment.enroll_many([cls.stays, *cls.leaving], cls.classroom)
+        exam = Exam.objects.create(name='Finals', date=date(2025, 6, 1))
+        for student in (cls.stays, *cls.leaving):
+            cls.add_records(student, exam)
+        Parent.objects.create(user=User.objects.create(username='p1', role='parent')).students.set(cls.leaving)
+
+    @classmethod
+    def add_records(cls, student, exam, days=1):
+        for day in range(days):
+            StudentAttendance.objects.create(student=student, date=date(2025, 3, 1) + timedelta(days=day))
+        StudentGrade.objects.create(student_exam=StudentExam.objects.create(student=student, exam=exam, marks=70), grade='B')
+        payment = StudentPayment.objects.create(student=student, amount=Decimal('10.00'), date=date(2025, 1, 5))
+        StudentPayment.objects.filter(pk=payment.pk).update(amount=Decimal('12.00'))
+        PaymentNotifications.objects.create(payment=payment, approved_by=cls.admin)
+        Chat.objects.create(sender=student.user, receiver=cls.admin, message='hi')
+        ArchivedStudentAttendance.objects.bulk_create([ArchivedStudentAttendance(student=student, date=date(2023, 3, 1), present=True)])
+
+    def test_delete_removes_what_the_collector_would(self):
+        user_ids = [student.user_id for student in self.leaving]
+        with transaction.atomic():
+            _, expected = User.objects.filter(pk__in=user_ids).delete()
+            transaction.set_rollback(True)
+        counts = offboarding.delete_rows(User, user_ids)
+        self.assertEqual(
+            {apps.get_model(label)._meta.db_table: count for label, count in expected.items() if count},
+            {table: count for table, count in counts.items() if count},
+        )
+        self.assertEqual(Student.objects.get(), self.stays)
+        self.assertEqual(StudentGrade.objects.count(), 1)
+        self.assertEqual(StudentPaymentHistory.objects.count(), 1)
+        self.assertEqual(Chat.objects.get().sender, self.stays.user)
+        self.assertEqual(ArchivedStudentAttendance.objects.count(), 1)
+
+    def test_delete_frees_places_with_queries_per_batch_not_per_row(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with CaptureQueriesContext(connection) as few:
+                result = offboarding.offboard(self.leaving[:1], delete=True)
+            self.assertEqual(result['students'], 1)
+            exam = Exam.objects.get()
+            for student in self.leaving[1:]:
+                self.add_records(student, exam, days=20)
+            progress = []
+            with CaptureQueriesContext(connection) as many:
+                offboarding.offboard(self.leaving[1:], delete=True, batch_size=2, progress=lambda *args: progress.append(args))
+        self.assertEqual(len(few), len(many))
+        self.assertEqual(progress, [(2, 2)])
+        self.assertEqual(Classroom.objects.get().enrolled_count, 1)
+        self.assertFalse(StudentAttendance.objects.exclude(student=self.stays).exists())
+        self.assertEqual(CriticalHistory.objects.filter(action='delete_students').count(), 2)
+
+    def test_default_keeps_records_and_deactivates(self):
+        progress = []
+        result = offboarding.offboard_classroom(self.classroom, batch_size=2, progress=lambda *args: progress.append(args))
+        self.assertEqual(result, {'students': 4, 'deactivated': {'value_user': 4}})
+        self.assertEqual(progress, [(2, 4), (4, 4)])
+        self.assertEqual(Student.objects.filter(student_class__isnull=True, user__is_active=False).count(), 4)
+        self.assertEqual(Classroom.objects.get().enrolled_count, 0)
+        self.assertEqual(StudentAttendance.objects.count(), 4)
+
+    def test_view_and_command(self):
+        admin = User.objects.create_user(username='boss', password='pw', is_staff=True)
+        self.client.force_login(admin)
+        url = reverse('value:offboard_students')
+        self.assertEqual(self.client.post(url).status_code, 400)
+        response = self.client.post(url, {'student': [self.leaving[0].pk], 'delete': '1'})
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(tasks.run_pending(), 1)
+        job = Task.objects.get(pk=response.json()['task'])
+        self.assertEqual((job.status, job.result['students']), (Task.SUCCEEDED, 1))
+        self.assertFalse(User.objects.filter(username='l0').exists())
+
+        out = StringIO()
+        call_command('offboard_students', classroom=self.classroom.pk, stdout=out)
+        self.assertIn('Deactivated 3 students: user 3', out.getvalue())
+        with self.assertRaises(CommandError):
+            call_command('offboard_students')
+
+
+@override_settings(AUDIT_LOG={'ASYNC': False})
+class AdminTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(username='root', password='pw')
+        cls.exam = Exam.objects.create(name='Maths', date=date(2025, 3, 1))
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def add_rows(self, count):
+        for _ in range(count):
+            n = User.objects.count()
+            student = Student.objects.create(user=User.objects.create(username=f'kid{n}', role='student'))
+            StudentAttendance.objects.create(student=student, date=date(2025, 3, 3))
+            StudentExam.objects.create(student=student, exam=self.exam, marks=50)
+            StudentPayment.objects.create(student=student, amount=Decimal('1.00'), date=date(2025, 3, 3))
+            Chat.objects.create(sender=self.admin, receiver=student.user, message='hi')
+
+    def changelist_queries(self, model):
+        url = reverse(f'admin:value_{model._meta.model_name}_changelist')
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        return len(queries)
+
+    def test_changelists_do_not_query_per_row(self):
+        models = (StudentAttendance, StudentExam, StudentPayment, Chat)
+        self.add_rows(2)
+        self.changelist_queries(Exam)  # warms the cached session and user
+        few = [self.changelist_queries(model) for model in models]
+        self.add_rows(20)
+        self.assertEqual([self.changelist_queries(model) for model in models], few)
+
+    def test_foreign_keys_are_not_dropdowns_of_every_row(self):
+        self.add_rows(3)
+        response = self.client.get(reverse('admin:value_studentattendance_add'))
+        self.assertNotContains(response, '>kid0</option>')
+        self.assertContains(response, 'admin-autocomplete')
+
+    def test_every_changelist_renders(self):
+        self.add_rows(1)
+        for model in admin.site._registry:
+            if model._meta.app_label == 'value':
+                with self.subTest(model=model.__name__):
+                    self.changelist_queries(model)
+
+
+@override_settings(AUDIT_LOG={'ASYNC': False}, REPLICA_DATABASE=None)
+class ListingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        classroom = Classroom.objects.create(name='1A')
+        maths, art = Subject.objects.create(name='Maths'), Subject.objects.create(name='Art')
+        for i in range(5):
+            Student.objects.create(user=User.objects.create(username=f'kid{i}', role='student'), student_class=classroom)
+            teacher = Teacher.objects.create(user=User.objects.create(username=f'teach{i}', role='teacher'))
+            teacher.subjects.set([maths, art] if i % 2 else [])
+        cls.admin = User.objects.create_user(username='admin', password='pw', is_staff=True)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.admin)
+
+    def stream(self, view, *args, chunk_size=2, **kwargs):
+        request = RequestFactory().get('/')
+        request.user = self.admin
+        page = listing.stream_page(request, 'admin/admin_dashboard.html', {'active_view': view}, *args,
+                                   chunk_size=chunk_size, **kwargs)
+        return b''.join(page.streaming_content).decode()
+
+    def test_rows_are_named_tuples_of_the_printed_columns(self):
+        from .views import student_rows
+        row = student_rows().first()
+        self.assertEqual(row._fields, ('id', 'username', 'email', 'classroom'))
+        self.assertEqual((row.username, row.classroom), ('kid0', '1A'))
+
+    def test_pages_stream_in_chunks_with_a_query_per_chunk(self):
+        from .views import teacher_rows, with_subjects
+        with self.assertNumQueries(4):  # one cursor over the teachers, subjects for each of three chunks
+            body = self.stream('teachers', 'teachers', teacher_rows(), 'admin/sections/teacher_rows.html',
+                               prepare=with_subjects)
+        self.assertEqual(body.count('<tr>'), 6)  # the header and five teachers
+        self.assertIn('<td class="py-2 px-4 border-b">Art, Maths</td>', body)
+        self.assertNotIn('No teachers found.', body)
+        self.assertIn('No users found.', self.stream('users', 'users', User.objects.none(), 'admin/sections/user_rows.html'))
+
+    def test_list_views_stream(self):
+        response = self.client.get(reverse('value:dashboard_student_list'))
+        self.assertTrue(response.streaming)
+        self.assertContains(response, '<td class="py-2 px-4 border-b">kid3</td>', html=True)
+
+    def test_chunks_keep_the_views_routing(self):
+        seen = []
+
+        def record(chunk):
+            seen.append(routers._replica_allowed.get())
+            return chunk
+
+        @use_replica
+        def view(request):
+            return listing.stream_page(request, 'admin/admin_dashboard.html', {'active_view': 'users'}, 'users',
+                                       listing.compact(User.objects.all(), 'id'), 'admin/sections/user_rows.html',
+                                       prepare=record)
+
+        request = RequestFactory().get('/')
+        request.user = self.admin
+        response = view(request)
+        self.assertFalse(routers._replica_allowed.get())
+        b''.join(response.streaming_content)
+        self.assertEqual(seen, [True])
+
+
+@override_settings(REPLICA_DATABASE=None)
+class WarmUpTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_warm_up_compiles_templates_and_renders_the_dashboard(self):
+        with mock.patch.object(warmup, 'connections') as connections:
+            done = warmup.warm_up()
+        self.assertEqual(done['compile_templates'][0], len(warmup.templates()))
+        self.assertIn('admin/admin_dashboard.html', warmup.templates())
+        self.assertGreater(done['load_urls'][0], 0)
+        self.assertGreater(done['render_dashboard'][0], 0)
+        self.assertTrue(cache.get(make_template_fragment_key('admin_stat_cards', [get_version(User, Student, Teacher, Classroom)])))
+        connections.close_all.assert_called_once_with()  # no connection survives into forked workers
+
+    def test_failing_steps_do_not_stop_the_worker(self):
+        for error in [DatabaseError, TemplateDoesNotExist('admin/admin_dashboard.html'), NoReverseMatch]:
+            with self.subTest(error=error):
+                with mock.patch.object(warmup, 'connections') as connections, \
+                        mock.patch('value.views.get_dashboard_common_context', side_effect=error):
+                    with self.assertLogs('value.warmup', 'WARNING'):
+                        done = warmup.warm_up()
+                self.assertIsNone(done['render_dashboard'][0])
+                self.assertEqual(done['compile_templates'][0], len(warmup.templates()))
+                connections.close_all.assert_called_once_with()
+
+
+@override_settings(AUDIT_LOG={'ASYNC': False}, REPLICA_DATABASE=None)
+class ProfilingTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        settings = override_settings(PROFILING={'URL_NAMES': ['dashboard_home'], 'DIR': self.tmp.name, 'KEEP': 2})
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.admin = User.objects.create_user(username='admin', password='pw', is_staff=True)
+        self.client.force_login(self.admin)
+
+    def test_sampler_records_whole_stacks(self):
+        def busy():
+            deadline = time.perf_counter() + 0.05
+            while time.perf_counter() < deadline:
+                pass
+
+        sampler = profiling.Sampler(0.001)
+        sampler.start()
+        busy()
+        sampler.stop()
+        self.assertTrue(any(stack and stack[-1][2].endswith('busy') for stack, _ in sampler.samples))
+
+    def test_listed_views_are_profiled(self):
+        response = self.client.get(reverse('value:dashboard_home'))
+        name = response['X-Profile']
+        meta = profiling.recent()[0]
+        self.assertEqual((meta['name'], meta['view'], meta['status']), (name, 'value:dashboard_home', 200))
+        speedscope = json.loads((profiling.directory() / f'{name}.speedscope.json').read_text())
+        self.assertEqual(speedscope['profiles'][0]['type'], 'sampled')
+        self.assertFalse(self.client.get(reverse('value:dashboard_user_list')).has_header('X-Profile'))
+
+    def test_signed_link_profiles_only_its_path_once(self):
+        cache.clear()
+        users, teachers = reverse('value:dashboard_user_list'), reverse('value:dashboard_teacher_list')
+        link = profiling.profile_url(users)
+        self.assertTrue(self.client.get(link).has_header('X-Profile'))
+        self.assertFalse(self.client.get(link).has_header('X-Profile'))
+        self.assertTrue(self.client.get(profiling.profile_url(users)).has_header('X-Profile'))
+        token = profiling.profile_token(users)
+        self.assertFalse(self.client.get(teachers, {profiling.PARAM: token}).has_header('X-Profile'))
+        self.assertFalse(self.client.get(users, {profiling.PARAM: token + 'x'}).has_header('X-Profile'))
+
+    def test_index_lists_recent_profiles_and_serves_them(self):
+        names = [self.client.get(reverse('value:dashboard_home'))['X-Profile'] for _ in range(3)]
+        self.assertEqual([meta['name'] for meta in profiling.recent()], names[:0:-1])  # KEEP is 2
+        response = self.client.get(reverse('value:profile_list'), {'path': '/dashboard/'})
+        self.assertContains(response, f'{profiling.PARAM}=')
+        self.assertContains(response, names[-1])
+        download = self.client.get(reverse('value:profile_download', args=[f'{names[-1]}.collapsed.txt']))
+        self.assertEqual(download.status_code, 200)
+        self.assertEqual(self.client.get(reverse('value:profile_download', args=['settings.py'])).status_code, 404)
+
+        self.client.force_login(User.objects.create_user(username='t', password='pw', role='teacher'))
+        self.assertEqual(self.client.get(reverse('value:profile_list')).status_code, 302)
@@ -1,6 +1,6 @@
 # In your app's urls.py
 from django.urls import path
-from . import views
+from . import api, views
 
 app_name = 'value'
 
@@ -21,6 +21,7 @@ urlpatterns = [
     path('dashboard/teacher/', views.teacher_dashboard, name='teacher_dashboard'),
     path('dashboard/student/', views.student_dashboard, name='student_dashboard'),
     path('dashboard/parent/', views.parent_dashboard, name='parent_dashboard'),
+    path('dashboard/parent/portal/', views.parent_portal, name='parent_portal'),
 
     # Comprehensive Admin Dashboard Sections (These are now the main ones)
     path('dashboard/users/', views.user_list, name='dashboard_user_list'),
@@ -28,6 +29,18 @@ urlpatterns = [
     path('dashboard/teachers/', views.teacher_list, name='dashboard_teacher_list'),
     path('dashboard/classrooms/', views.classroom_list, name='dashboard_classroom_list'),
 
+    # Student & Classroom management actions (POST targets)
+    path('dashboard/students/add/', views.add_student, name='add_student'),
+    path('dashboard/students/delete/', views.delete_student, name='delete_student'),
+    path('dashboard/students/offboard/', views.offboard_students, name='offboard_students'),
+    path('dashboard/classrooms/add/', views.add_classroom, name='add_classroom'),
+    path('dashboard/classrooms/<int:pk>/', views.classroom_detail, name='classroom_detail'),
+    path('dashboard/classrooms/<int:pk>/edit/', views.edit_classroom, name='edit_classroom'),
+    path('dashboard/classrooms/<int:pk>/delete/', views.delete_classroom, name='delete_classroom'),
+    path('dashboard/classrooms/<int:pk>/enroll/', views.enroll_students, name='enroll_students'),
+    path('dashboard/students/<int:student_id>/', views.student_detail, name='student_detail'),
+    path('dashboard/teachers/<int:teacher_id>/', views.teacher_detail, name='teacher_detail'),
+
     # MODIFIED: These now load within the admin_dashboard.html
     path('events/', views.event_list, name='event_list'),
     path('event/<int:event_id>/', views.event_detail, name='event_detail'),
@@ -40,6 +53,19 @@ urlpatterns = [
     path('group-chat/', views.group_chat, name='group_chat'),
     path('friends/', views.friends_list, name='friends_list'),
 
+    path('search/', views.search_view, name='search'),
+    path('calendar/', views.calendar_view, name='calendar'),
+    path('calendar/<str:token>.ics', views.calendar_feed, name='calendar_feed'),
+    path('tasks/<int:pk>/', views.task_status, name='task_status'),
+    path('report-cards/', views.report_cards, name='report_cards'),
+    path('report-cards/<int:pk>/download/', views.report_cards_download, name='report_cards_download'),
+    path('profiles/', views.profile_list, name='profile_list'),
+    path('profiles/<str:name>', views.profile_download, name='profile_download'),
+
+    # Read-only JSON API (see value/api.py)
+    path('api/<str:resource>/', api.resource_list, name='api_list'),
+    path('api/<str:resource>/<int:pk>/', api.resource_detail, name='api_detail'),
+
     # Keep these if you still need them for non-admin users or other purposes
     # path('students/', views.student_list, name='student_list'),
     # path('teachers/<int:teacher_id>/', views.teacher_detail, name='teacher_detail'),
@@ -0,0 +1,127 @@
+"""
+Per-table data version counters.
+
+Every save/delete of a versioned model bumps a counter in the cache, so cached
+output (template fragments, API responses) can be keyed by the versions of the
+tables it was built from and never has to be invalidated explicitly.
+
+Receivers are connected only for the models in VERSIONED, the ones cached
+output is keyed by. A post_delete receiver makes Django's collector load and
+delete a model's rows one by one in every cascade, so the high-volume tables
+(attendance, marks, ...) get none, and Chat only a post_save one: a chat
+disappears with its user, whose version changes.
+
+Queryset .update(), bulk_create(), raw SQL and direct deletes of SAVE_ONLY
+models send no signals; code that writes that way calls bump() itself.
+
+The counters are only as shared as the cache. With a per-process cache
+(LocMemCache) every worker has its own, which is fine for fragments cached
+in that same process but not for validators sent to clients: shared()
+tells the ETag and Last-Modified functions to send none.
+"""
+import time
+from datetime import datetime, timezone
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+
+KEY = 'data-version:{}'
+MODIFIED_KEY = 'data-modified:{}'
+
+VERSIONED = (
+    'User', 'Student', 'Teacher', 'Parent', 'Classroom',
+    'Event', 'MainNotification', 'Exam', 'ExamTimetable', 'StudentPayment',
+)
+SAVE_ONLY = ('Chat',)
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def _key(model):
+    return KEY.format(model._meta.db_table)
+
+
+def _modified_key(model):
+    return MODIFIED_KEY.format(model._meta.db_table)
+
+
+def _fresh():
+    # Counters start from the clock, so a counter lost from the cache never
+    # repeats a version that was handed out before.
+    return time.time_ns() // 1000
+
+
+def shared():
+    """Whether all worker processes see the same counters."""
+    return settings.CACHES['default']['BACKEND'] not in PROCESS_LOCAL_CACHES
+
+
+def get_version(*models):
+    """A string that changes whenever any of ``models`` is written."""
+    keys = [_key(model) for model in models]
+    found = cache.get_many(keys)
+    missing = {key: _fresh() for key in keys if key not in found}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        found.update(missing)
+    return '.'.join(str(found[key]) for key in keys)
+
+
+def last_modified(*models):
+    """When any of ``models`` was last written, as an aware UTC datetime."""
+    keys = [_modified_key(model) for model in models]
+    found = cache.get_many(keys)
+    missing = [key for key in keys if key not in found]
+    if missing:
+        # Unknown means "now": clients refetch once rather than miss a change.
+        now = time.time()
+        cache.set_many(dict.fromkeys(missing, now), timeout=None)
+        found.update(dict.fromkeys(missing, now))
+    return datetime.fromtimestamp(max(found.values()), tz=timezone.utc)
+
+
+def _bump(models):
+    now = time.time()
+    for model in models:
+        key = _key(model)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _fresh(), timeout=None)
+        cache.set(_modified_key(model), now, timeout=None)
+
+
+def bump(*models):
+    """
+    Mark ``models`` as written. Inside a transaction the counters move now,
+    for reads in the same transaction, and again once it commits: another
+    request may have cached the old rows under the first new version.
+    """
+    if transaction.get_connection().in_atomic_block:
+        _bump(models)
+    transaction.on_commit(lambda: _bump(models))
+
+
+def _on_write(sender, **kwargs):
+    bump(sender)
+
+
+def _on_m2m(sender, instance, model, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump(sender, type(instance), model)
+
+
+def connect_signals():
+    for name in (*VERSIONED, *SAVE_ONLY):
+        model = apps.get_model('value', name)
+        post_save.connect(_on_write, sender=model, dispatch_uid=f'value.versions.post_save.{name}')
+        if name in VERSIONED:
+            post_delete.connect(_on_write, sender=model, dispatch_uid=f'value.versions.post_delete.{name}')
+        for field in model._meta.local_many_to_many:
+            m2m_changed.connect(_on_m2m, sender=field.remote_field.through,
+                                dispatch_uid=f'value.versions.m2m_changed.{name}.{field.name}')
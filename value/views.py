@@ -1,29 +1,48 @@
+from datetime import timedelta
+
 from django.shortcuts import render, redirect, get_object_or_404
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse
 from django.contrib.auth import authenticate, login, logout
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import get_user_model
-from django.db.models import Count
+from django.db import transaction
+from django.db.models import Count, F
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from django.views.decorators.http import condition, require_POST
 from .forms import UserCreationForm, ClassroomForm, FeeForm, EventForm, PettyCashForm # Ensure these are available
+from . import agenda, audit, enrollment, listing, pettycash, portal, profiling, search, tasks
+from .permissions import role_required
+from .routers import PRIMARY, use_replica
+from .versions import get_version, last_modified, shared
 
 # Import your custom models
-from .models import Student, Classroom, Teacher, Subject, Event, StudentPayment, Exam, Chat, GroupMessage, MyFriends, MainNotification, PettyCash, Parent
+from .models import CapacityBelowEnrollment, Student, Classroom, Teacher, Subject, Event, StudentPayment, Exam, Chat, GroupMessage, MyFriends, MainNotification, PettyCash, Parent, Task
 
 # Get the custom User model
 User = get_user_model()
 
 # --- Helper function to get common dashboard context ---
 def get_dashboard_common_context():
+    # Counts are passed uncalled and querysets are lazy, so nothing runs when the
+    # template serves the stat cards / overview from the fragment cache. What those
+    # version-keyed fragments show is read from the primary (see value/routers.py).
     return {
-        'total_users': User.objects.count(),
-        'total_students': Student.objects.count(),
-        'total_teachers': Teacher.objects.count(),
-        'total_classrooms': Classroom.objects.count(),
-        'notifications': MainNotification.objects.order_by('-created_at')[:5],
-        'students_overview': Student.objects.select_related('user', 'student_class').all()[:5],
+        'stats_version': get_version(User, Student, Teacher, Classroom),
+        'overview_version': get_version(Student, Classroom, Event, MainNotification),
+        'total_users': User.objects.using(PRIMARY).count,
+        'total_students': Student.objects.using(PRIMARY).count,
+        'total_teachers': Teacher.objects.using(PRIMARY).count,
+        'total_classrooms': Classroom.objects.using(PRIMARY).count,
+        'notifications': MainNotification.objects.using(PRIMARY).order_by('-created_at')[:5],
+        'students_overview': Student.objects.using(PRIMARY).select_related('user', 'student_class')[:5],
+        'events_overview': Event.objects.using(PRIMARY).order_by('-date')[:5],
         'teachers_overview': Teacher.objects.select_related('user').all()[:5],
         'classrooms_overview': Classroom.objects.all(),
-        'events_overview': Event.objects.all().order_by('-date')[:5],
         'petty_cash_overview': PettyCash.objects.all().order_by('-date')[:5],
         'chats_overview': Chat.objects.all().order_by('-sent_at')[:5],
         'group_chats_overview': GroupMessage.objects.all().order_by('-sent_at')[:5],
@@ -31,6 +50,38 @@ def get_dashboard_common_context():
         'add_student_form': UserCreationForm(), # Added for "Add Student" functionality
     }
 
+# --- Compact rows for the long lists (see value/listing.py) ---
+# Only the columns the sections print.
+
+def user_rows():
+    return listing.compact(User.objects.order_by('username'), 'id', 'username', 'email', 'role')
+
+
+def student_rows():
+    return listing.compact(
+        Student.objects.order_by('user__username'), 'id',
+        username=F('user__username'), email=F('user__email'), classroom=F('student_class__name'),
+    )
+
+
+def teacher_rows():
+    return listing.compact(
+        Teacher.objects.order_by('user__username'), 'id', username=F('user__username'), email=F('user__email'),
+    )
+
+
+def teacher_subjects(teachers):
+    return (
+        Teacher.subjects.through.objects.filter(teacher__in=[teacher.id for teacher in teachers])
+        .order_by('subject__name')
+        .values_list('teacher_id', 'subject__name')
+    )
+
+
+def with_subjects(teachers):
+    return listing.attach(teachers, 'subjects', teacher_subjects(teachers))
+
+
 # --- Existing Views (Keep as is unless specified) ---
 
 # Home page
@@ -130,53 +181,54 @@ def logout_view(request):
 
 # Existing Role-Specific Dashboards (admin_dashboard is now largely redundant with dashboard_home)
 @login_required
+@role_required(message="You do not have permission to access the admin dashboard.")
 def admin_dashboard(request):
-    if not request.user.is_superuser and not request.user.is_staff:
-        messages.warning(request, "You do not have permission to access the admin dashboard.")
-        return redirect('value:home')
-
     # This view is now largely superseded by dashboard_home.
     # It's better to just redirect to dashboard_home if admin_dashboard is still mapped in urls.
     return redirect('value:dashboard_home')
 
 
 @login_required
+@role_required('teacher', message="You do not have permission to access the teacher dashboard.")
 def teacher_dashboard(request):
-    if not request.user.role == 'teacher' and not request.user.is_superuser and not request.user.is_staff:
-        messages.warning(request, "You do not have permission to access the teacher dashboard.")
-        return redirect('value:home')
     return render(request, 'teacher/dashboard.html')
 
 @login_required
+@role_required('student', message="You do not have permission to access the student dashboard.")
 def student_dashboard(request):
-    if not request.user.role == 'student' and not request.user.is_superuser and not request.user.is_staff:
-        messages.warning(request, "You do not have permission to access the student dashboard.")
-        return redirect('value:home')
-    student = Student.objects.get(user=request.user)
     context = {
-        'student': student,
+        'student': request.principal.profile,
     }
     return render(request, 'student/dashboard.html', context)
 
 @login_required
+@role_required('parent', message="You do not have permission to access the parent dashboard.")
 def parent_dashboard(request):
-    if not request.user.role == 'parent' and not request.user.is_superuser and not request.user.is_staff:
-        messages.warning(request, "You do not have permission to access the parent dashboard.")
-        return redirect('value:home')
-    parent_profile = get_object_or_404(Parent.objects.select_related('user', 'student__user', 'student__student_class'), user=request.user)
+    parent_profile = request.principal.profile
+    if parent_profile is None:
+        raise Http404("No Parent matches the given query.")
     context = {
         'parent_profile': parent_profile,
+        'children': portal.children_overview(parent_profile),
     }
     return render(request, 'parent/dashboard.html', context)
 
+@login_required
+@role_required('parent', message="You do not have permission to access the parent portal.")
+def parent_portal(request):
+    # Same data as the parent dashboard, as JSON for the portal front end.
+    parent_profile = request.principal.profile
+    if parent_profile is None:
+        raise Http404("No Parent matches the given query.")
+    children = portal.children_overview(parent_profile)
+    return JsonResponse({'children': [portal.child_summary(child) for child in children]})
+
 # --- NEW Comprehensive Admin Dashboard Views (MODIFIED) ---
 
 @login_required
+@role_required(message="You do not have permission to access this dashboard.")
+@use_replica
 def dashboard_home(request):
-    if not request.user.is_superuser and not request.user.is_staff:
-        messages.warning(request, "You do not have permission to access this dashboard.")
-        return redirect('value:home')
-
     context = get_dashboard_common_context()
     context['active_view'] = 'home' # Default to showing the home/overview section
 
@@ -187,19 +239,17 @@ def dashboard_home(request):
 # --- Student Management Actions (New/Modified) ---
 
 @login_required
+@role_required(message="You do not have permission to add students.", redirect_to='value:dashboard_home')
 def add_student(request):
-    if not request.user.is_superuser and not request.user.is_staff:
-        messages.warning(request, "You do not have permission to add students.")
-        return redirect('value:dashboard_home')
-
     if request.method == 'POST':
         form = UserCreationForm(request.POST)
         if form.is_valid():
             try:
-                user = form.save(commit=False)
+                user = form.save(commit=False)  # hashes the password; secrets never go into task arguments
                 user.role = 'student' # Set the role explicitly
                 user.save()
                 Student.objects.create(user=user)
+                audit.log('add_student', actor=request.user, obj=user)
                 messages.success(request, f"Student {user.username} added successfully.")
             except Exception as e:
                 messages.error(request, f"Error adding student: {str(e)}")
@@ -211,17 +261,16 @@ def add_student(request):
 
 
 @login_required
+@role_required(message="You do not have permission to delete students.", redirect_to='value:dashboard_home')
 def delete_student(request):
-    if not request.user.is_superuser and not request.user.is_staff:
-        messages.warning(request, "You do not have permission to delete students.")
-        return redirect('value:dashboard_home')
-
     if request.method == 'POST':
         username = request.POST.get('username')
         if username:
             user = User.objects.filter(username=username, role='student').first()
             if user:
-                user.delete()
+                with transaction.atomic():  # no audit entry unless the delete commits
+                    audit.log('delete_student', actor=request.user, obj=user)
+                    user.delete()
                 messages.success(request, f"Student {username} deleted.")
             else:
                 messages.error(request, "Student not found.")
@@ -231,35 +280,49 @@ def delete_student(request):
 
 
 @login_required
-def user_list(request):
-    if not request.user.is_superuser and not request.user.is_staff:
-        messages.warning(request, "You do not have permission to access this page.")
-        return redirect('value:home')
+@role_required(message="You do not have permission to offboard students.", redirect_to='value:dashboard_home')
+@require_POST
+def offboard_students(request):
+    # classroom=<id> or student=<id>&student=...; delete=1 removes them instead of deactivating.
+    # Runs as a background task; poll the returned status_url.
+    classroom_id = request.POST.get('classroom', '')
+    student_ids = [int(pk) for pk in request.POST.getlist('student') if pk.isdigit()]
+    if not (classroom_id.isdigit() or student_ids):
+        return JsonResponse({'error': "Choose a classroom or at least one student."}, status=400)
+    job = tasks.enqueue(tasks.offboard_students, kwargs={
+        'student_ids': student_ids,
+        'classroom_id': int(classroom_id) if classroom_id.isdigit() else None,
+        'delete': request.POST.get('delete') == '1',
+    }, user=request.user)
+    return JsonResponse({'task': job.pk, 'status_url': reverse('value:task_status', args=[job.pk])}, status=202)
 
+
+@login_required
+@role_required()
+@use_replica
+def user_list(request):
     context = get_dashboard_common_context()
-    context['users'] = User.objects.all().order_by('username')
     context['active_view'] = 'users'
-    return render(request, 'admin/admin_dashboard.html', context)
+    return listing.stream_page(
+        request, 'admin/admin_dashboard.html', context, 'users', user_rows(), 'admin/sections/user_rows.html',
+    )
 
 
 @login_required
+@role_required('parent', 'teacher')
+@use_replica
 def student_list(request):
-    if not (request.user.is_superuser or request.user.is_staff or request.user.role == 'parent' or request.user.role == 'teacher'):
-        messages.warning(request, "You do not have permission to access this page.")
-        return redirect('value:home')
-
     context = get_dashboard_common_context()
-    context['students'] = Student.objects.select_related('user', 'student_class').order_by('user__username')
     context['active_view'] = 'students'
-    return render(request, 'admin/admin_dashboard.html', context)
+    return listing.stream_page(
+        request, 'admin/admin_dashboard.html', context, 'students', student_rows(), 'admin/sections/student_rows.html',
+    )
 
 
 @login_required
+@role_required()
+@use_replica
 def classroom_list(request):
-    if not request.user.is_superuser and not request.user.is_staff:
-        messages.warning(request, "You do not have permission to access this page.")
-        return redirect('value:home')
-
     context = get_dashboard_common_context()
     context['classrooms'] = Classroom.objects.all().order_by('name')
     context['active_view'] = 'classrooms'
@@ -268,15 +331,13 @@ def classroom_list(request):
 
 # --- NEW: Classroom Management Views ---
 @login_required
+@role_required(message="You do not have permission to add classrooms.", redirect_to='value:dashboard_home')
 def add_classroom(request):
-    if not request.user.is_superuser and not request.user.is_staff:
-        messages.warning(request, "You do not have permission to add classrooms.")
-        return redirect('value:dashboard_home') # Redirect to a safe place
-
     if request.method == 'POST':
         form = ClassroomForm(request.POST)
         if form.is_valid():
-            form.save()
+            classroom = form.save()
+            audit.log('add_classroom', actor=request.user, obj=classroom)
             messages.success(request, "Classroom added successfully.")
             return redirect('value:dashboard_classroom_list')
         else:
@@ -291,28 +352,29 @@ def add_classroom(request):
 
 
 @login_required
+@role_required(message="You do not have permission to edit classrooms.", redirect_to='value:dashboard_home')
 def edit_classroom(request, pk):
-    if not request.user.is_superuser and not request.user.is_staff:
-        messages.warning(request, "You do not have permission to edit classrooms.")
-        return redirect('value:dashboard_home')
-
     classroom = get_object_or_404(Classroom, pk=pk)
     if request.method == 'POST':
         form = ClassroomForm(request.POST, instance=classroom)
         if form.is_valid():
-            form.save()
-            messages.success(request, f"Classroom '{classroom.name}' updated successfully.")
-            return redirect('value:dashboard_classroom_list')
-        else:
-            for field, errors in form.errors.items():
-                for error in errors:
-                    messages.error(request, f"{field}: {error}")
-            # If form is invalid, re-render the edit form with errors
-            context = get_dashboard_common_context()
-            context['active_view'] = 'edit_classroom'
-            context['form'] = form
-            context['editing_classroom'] = classroom
-            return render(request, 'admin/admin_dashboard.html', context)
+            try:
+                form.save()
+            except CapacityBelowEnrollment as e:  # students were enrolled after the form was checked
+                form.add_error('capacity', str(e))
+            else:
+                audit.log('edit_classroom', actor=request.user, obj=classroom, diff=audit.form_diff(form))
+                messages.success(request, f"Classroom '{classroom.name}' updated successfully.")
+                return redirect('value:dashboard_classroom_list')
+        for field, errors in form.errors.items():
+            for error in errors:
+                messages.error(request, f"{field}: {error}")
+        # If form is invalid, re-render the edit form with errors
+        context = get_dashboard_common_context()
+        context['active_view'] = 'edit_classroom'
+        context['form'] = form
+        context['editing_classroom'] = classroom
+        return render(request, 'admin/admin_dashboard.html', context)
     else:
         form = ClassroomForm(instance=classroom)
 
@@ -324,15 +386,35 @@ def edit_classroom(request, pk):
 
 
 @login_required
-def delete_classroom(request, pk):
-    if not request.user.is_superuser and not request.user.is_staff:
-        messages.warning(request, "You do not have permission to delete classrooms.")
-        return redirect('value:dashboard_home')
+@role_required(message="You do not have permission to enroll students.", redirect_to='value:dashboard_home')
+@require_POST
+def enroll_students(request, pk):
+    # Either the students listed in 'student', or the whole class 'from_classroom'.
+    classroom = get_object_or_404(Classroom, pk=pk)
+    source = request.POST.get('from_classroom', '')
+    try:
+        if source.isdigit():
+            moved = enrollment.move_cohort(get_object_or_404(Classroom, pk=source), classroom)
+        else:
+            ids = [int(student) for student in request.POST.getlist('student') if student.isdigit()]
+            moved = enrollment.enroll_many(ids, classroom)
+    except enrollment.ClassroomFull as e:
+        messages.error(request, str(e))
+    else:
+        audit.log('enroll_students', actor=request.user, obj=classroom, diff={'moved': moved})
+        messages.success(request, f"{moved} students enrolled in '{classroom.name}'.")
+    return redirect('value:dashboard_classroom_list')
+
 
+@login_required
+@role_required(message="You do not have permission to delete classrooms.", redirect_to='value:dashboard_home')
+def delete_classroom(request, pk):
     classroom = get_object_or_404(Classroom, pk=pk)
     if request.method == 'POST':
         try:
-            classroom.delete()
+            with transaction.atomic():  # no audit entry unless the delete commits
+                audit.log('delete_classroom', actor=request.user, obj=classroom)
+                classroom.delete()
             messages.success(request, f"Classroom '{classroom.name}' deleted successfully.")
         except Exception as e:
             messages.error(request, f"Error deleting classroom: {e}")
@@ -342,11 +424,8 @@ def delete_classroom(request, pk):
 
 # --- Classroom Detail View (If you want a dedicated detail page within dashboard) ---
 @login_required
+@role_required(message="You do not have permission to view classroom details.", redirect_to='value:dashboard_home')
 def classroom_detail(request, pk):
-    if not request.user.is_superuser and not request.user.is_staff:
-        messages.warning(request, "You do not have permission to view classroom details.")
-        return redirect('value:dashboard_home')
-
     classroom = get_object_or_404(Classroom, pk=pk)
     context = get_dashboard_common_context()
     context['active_view'] = 'classroom_detail'
@@ -355,25 +434,23 @@ def classroom_detail(request, pk):
 
 
 @login_required
+@role_required('admin')
+@use_replica
 def teacher_list(request):
-    if not (request.user.is_superuser or request.user.is_staff or request.user.role == 'admin'):
-        messages.warning(request, "You do not have permission to access this page.")
-        return redirect('value:home')
-
     context = get_dashboard_common_context()
-    context['teachers'] = Teacher.objects.select_related('user').prefetch_related('subjects', 'classes').order_by('user__username')
     context['active_view'] = 'teachers'
-    return render(request, 'admin/admin_dashboard.html', context)
+    return listing.stream_page(
+        request, 'admin/admin_dashboard.html', context, 'teachers', teacher_rows(), 'admin/sections/teacher_rows.html',
+        prepare=with_subjects,
+    )
 
 # --- MODIFIED: Events, Payments, Exams, Chats, Group Chats, Friends List ---
 # These now render inside the admin/admin_dashboard.html
 
 @login_required
+@role_required()
+@use_replica
 def event_list(request):
-    if not request.user.is_superuser and not request.user.is_staff:
-        messages.warning(request, "You do not have permission to access this page.")
-        return redirect('value:home')
-
     context = get_dashboard_common_context()
     context['events'] = Event.objects.all().order_by('-date')
     context['active_view'] = 'events'
@@ -388,11 +465,9 @@ def event_detail(request, event_id):
     return render(request, 'admin/admin_dashboard.html', context)
 
 @login_required
+@role_required()
+@use_replica
 def payment_list(request):
-    if not request.user.is_superuser and not request.user.is_staff:
-        messages.warning(request, "You do not have permission to access this page.")
-        return redirect('value:home')
-
     context = get_dashboard_common_context()
     context['payments'] = StudentPayment.objects.all().order_by('-date')
     context['active_view'] = 'payments'
@@ -407,11 +482,9 @@ def payment_detail(request, payment_id):
     return render(request, 'admin/admin_dashboard.html', context)
 
 @login_required
+@role_required()
+@use_replica
 def exam_list(request):
-    if not request.user.is_superuser and not request.user.is_staff:
-        messages.warning(request, "You do not have permission to access this page.")
-        return redirect('value:home')
-
     context = get_dashboard_common_context()
     context['exams'] = Exam.objects.all().order_by('-date')
     context['active_view'] = 'exams'
@@ -426,25 +499,23 @@ def exam_detail(request, exam_id):
     return render(request, 'admin/admin_dashboard.html', context)
 
 @login_required
+@role_required()
+@use_replica
 def petty_cash_list(request):
-    if not request.user.is_superuser and not request.user.is_staff:
-        messages.warning(request, "You do not have permission to access this page.")
-        return redirect('value:home')
-
     context = get_dashboard_common_context()
-    context['petty_cash_entries'] = PettyCash.objects.all().order_by('-date')
+    # Closed months are read from their snapshots; only the open period is listed row by row.
+    context['petty_cash_entries'] = pettycash.open_entries().order_by('-date')
+    context['petty_cash_balance'] = pettycash.current_balance()
+    context['petty_cash_periods'] = pettycash.monthly_report()[:12]
     context['active_view'] = 'petty_cash'
     return render(request, 'admin/admin_dashboard.html', context)
 
 @login_required
+@role_required('teacher', 'student', 'parent')
 def chat_room(request):
-    if not request.user.is_superuser and not request.user.is_staff and not request.user.role in ['teacher', 'student', 'parent']:
-        messages.warning(request, "You do not have permission to access this page.")
-        return redirect('value:home')
-
     context = get_dashboard_common_context()
     # For a general chat_room, you might want messages involving the current user, or all if admin
-    if request.user.is_superuser or request.user.is_staff:
+    if request.principal.is_admin:
         context['chat_messages'] = Chat.objects.all().order_by('sent_at')[:50]
     else:
         # Fetch messages where current user is sender or receiver
@@ -471,11 +542,8 @@ def chat_room(request):
     return render(request, 'admin/admin_dashboard.html', context)
 
 @login_required
+@role_required('teacher', 'student', 'parent')
 def group_chat(request):
-    if not request.user.is_superuser and not request.user.is_staff and not request.user.role in ['teacher', 'student', 'parent']:
-        messages.warning(request, "You do not have permission to access this page.")
-        return redirect('value:home')
-
     context = get_dashboard_common_context()
     context['group_messages'] = GroupMessage.objects.all().order_by('sent_at')[:50]
     context['active_view'] = 'group_chat'
@@ -492,11 +560,8 @@ def group_chat(request):
     return render(request, 'admin/admin_dashboard.html', context)
 
 @login_required
+@role_required('teacher', 'student', 'parent')
 def friends_list(request):
-    if not request.user.is_superuser and not request.user.is_staff and not request.user.role in ['teacher', 'student', 'parent']:
-        messages.warning(request, "You do not have permission to access this page.")
-        return redirect('value:home')
-
     context = get_dashboard_common_context()
     # For an admin, you might want to see all friend relationships,
     # or just the ones involving the current user if the 'friends_list' is universal.
@@ -509,11 +574,8 @@ def friends_list(request):
 
 # Keep student_detail and teacher_detail and integrate them into the admin_dashboard
 @login_required
+@role_required('parent', 'teacher', message="You do not have permission to view student details.")
 def student_detail(request, student_id):
-    if not request.user.is_superuser and not request.user.is_staff and not request.user.role in ['parent', 'teacher']:
-        messages.warning(request, "You do not have permission to view student details.")
-        return redirect('value:home')
-
     student = get_object_or_404(Student.objects.select_related('user', 'student_class'), pk=student_id)
     context = get_dashboard_common_context()
     context['student_detail'] = student
@@ -522,13 +584,173 @@ def student_detail(request, student_id):
 
 
 @login_required
+@role_required('admin', message="You do not have permission to view teacher details.")
 def teacher_detail(request, teacher_id):
-    if not request.user.is_superuser and not request.user.is_staff and not request.user.role in ['admin']:
-        messages.warning(request, "You do not have permission to view teacher details.")
-        return redirect('value:home')
-
     teacher = get_object_or_404(Teacher.objects.select_related('user'), pk=teacher_id)
     context = get_dashboard_common_context()
     context['teacher_detail'] = teacher
     context['active_view'] = 'teacher_detail' # New active_view state for teacher detail
-    return render(request, 'admin/admin_dashboard.html', context)
\ No newline at end of file
+    return render(request, 'admin/admin_dashboard.html', context)
+
+# --- Search ---
+
+@login_required
+def search_view(request):
+    text = request.GET.get('q', '')
+    kinds = [kind for kind in request.GET.getlist('kind') if kind]
+    unknown = set(kinds) - set(search.KINDS)
+    if unknown:
+        return JsonResponse({'error': f"Unknown kind; choose from: {', '.join(search.KINDS)}"}, status=400)
+    try:
+        limit = max(1, min(int(request.GET.get('limit', 20)), 100))
+    except ValueError:
+        limit = 20
+    try:
+        results = search.search(text, user=request.user, kinds=kinds, limit=limit)
+    except search.SearchUnavailable:
+        return JsonResponse({'error': "Search is not available on this database."}, status=503)
+    return JsonResponse({'results': [result._asdict() for result in results]})
+
+
+# --- Calendar ---
+
+@login_required
+@use_replica
+def calendar_view(request):
+    # ?start=&end= as YYYY-MM-DD, end exclusive; defaults to the current week.
+    role = agenda.role_for(request.user)
+    if role is None:
+        return JsonResponse({'error': "No calendar for this account."}, status=403)
+    today = timezone.localdate()
+    try:
+        start = parse_date(request.GET.get('start', '')) or today - timedelta(days=today.weekday())
+        end = parse_date(request.GET.get('end', '')) or start + timedelta(days=7)
+    except ValueError:
+        return JsonResponse({'error': "Dates must be valid YYYY-MM-DD dates."}, status=400)
+    if end <= start or (end - start).days > 366:
+        return JsonResponse({'error': "'end' must be after 'start' and at most a year later."}, status=400)
+    items = agenda.between(start, end, kinds=agenda.ROLE_KINDS[role])
+    return JsonResponse({
+        'items': [item._asdict() for item in items],
+        'feed_url': request.build_absolute_uri(reverse('value:calendar_feed', args=[agenda.feed_token(role)])),
+    })
+
+
+def _feed_version(role):
+    # The window moves daily, so the date is part of the version.
+    return f'{role}:{timezone.localdate()}:{get_version(*agenda.TABLES)}'
+
+
+# No validators when each worker process keeps its own versions (see value.versions.shared).
+
+def _feed_etag(request, token):
+    role = agenda.role_from_token(token)
+    if role is None or not shared():
+        return None
+    return _feed_version(role)
+
+
+def _feed_last_modified(request, token):
+    return last_modified(*agenda.TABLES) if shared() else None
+
+
+@condition(etag_func=_feed_etag, last_modified_func=_feed_last_modified)
+def calendar_feed(request, token):
+    # No login: calendar apps can't carry a session, the signed token stands in for one.
+    # Reads the primary: the body is cached under the data version (see value/routers.py).
+    role = agenda.role_from_token(token)
+    if role is None:
+        raise Http404("Unknown calendar feed.")
+    key = f'calendar-feed:{_feed_version(role)}'
+    body = cache.get(key)
+    if body is None:
+        start, end = agenda.feed_window(timezone.localdate())
+        items = agenda.between(start, end, kinds=agenda.ROLE_KINDS[role])
+        body = agenda.feed(items, stamp=last_modified(*agenda.TABLES))
+        cache.set(key, body, 60 * 60 * 24)
+    return HttpResponse(body, content_type='text/calendar; charset=utf-8')
+
+
+# --- Background tasks ---
+
+@login_required
+def task_status(request, pk):
+    task = get_object_or_404(Task, pk=pk)
+    if task.created_by_id != request.user.pk and not request.principal.is_admin:
+        raise Http404("No Task matches the given query.")
+    return JsonResponse({
+        'id': task.pk,
+        'name': task.name,
+        'status': task.status,
+        'progress': task.progress,
+        'progress_message': task.progress_message,
+        'attempts': task.attempts,
+        'result': task.result,
+        'error': task.error.strip().splitlines()[-1] if task.error else '',
+    })
+
+
+# --- Report cards ---
+
+@login_required
+@role_required()
+@require_POST
+def report_cards(request):
+    # Queues the build; poll the returned status_url, then fetch download_url.
+    try:
+        start = parse_date(request.POST.get('from', ''))
+        end = parse_date(request.POST.get('to', ''))
+    except ValueError:
+        return JsonResponse({'error': "Dates must be valid YYYY-MM-DD dates."}, status=400)
+    if start and end and end < start:
+        return JsonResponse({'error': "'to' must not be before 'from'."}, status=400)
+    job = tasks.enqueue(tasks.build_report_cards, kwargs={
+        'classroom_ids': [int(pk) for pk in request.POST.getlist('classroom') if pk.isdigit()],
+        'start': start and start.isoformat(),
+        'end': end and end.isoformat(),
+    }, user=request.user)
+    return JsonResponse({
+        'task': job.pk,
+        'status_url': reverse('value:task_status', args=[job.pk]),
+        'download_url': reverse('value:report_cards_download', args=[job.pk]),
+    }, status=202)
+
+
+@login_required
+def report_cards_download(request, pk):
+    task = get_object_or_404(Task, pk=pk, name=tasks.build_report_cards.task_name, status=Task.SUCCEEDED)
+    if task.created_by_id != request.user.pk and not request.principal.is_admin:
+        raise Http404("No Task matches the given query.")
+    try:
+        archive = open(task.result['path'], 'rb')
+    except FileNotFoundError:
+        raise Http404("The archive is no longer available.")
+    return FileResponse(archive, as_attachment=True, filename=f'report-cards-{task.pk}.zip')
+
+
+# --- Profiling ---
+
+@login_required
+@role_required()
+def profile_list(request):
+    # ?path=/dashboard/ also shows a signed link that profiles that page.
+    path = request.GET.get('path', '').strip()
+    profiles = profiling.recent(limit=50)
+    for profile in profiles:
+        profile['links'] = [(file, file[len(profile['name']) + 1:]) for file in profile['files']]
+    return render(request, 'value/profiles.html', {
+        'profiles': profiles,
+        'path': path,
+        'profile_link': profiling.profile_url(path) if path.startswith('/') else None,
+        'url_names': profiling.get_option('URL_NAMES'),
+    })
+
+
+@login_required
+@role_required()
+def profile_download(request, name):
+    path = profiling.file_path(name)
+    if path is None:
+        raise Http404("No such profile.")
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename=name)
+
@@ -0,0 +1,84 @@
+"""
+Worker warm-up.
+
+A fresh worker otherwise does a lot of one-off work during its first request:
+- importing the URLconf, and with it the views, forms and admin modules;
+- building the URL resolver's reverse lookup from every pattern;
+- compiling the templates;
+- rendering the dashboard's cached fragments.
+warm_up() does all of this while the worker starts. school_system/wsgi.py and
+asgi.py call it when settings.WARM_UP is on.
+
+Database connections opened here are closed again, so a server that forks
+workers after loading the application (gunicorn --preload) doesn't share one
+connection between them. A warm-up step that fails for any reason, e.g.
+because the database isn't migrated yet or a template doesn't render, is
+logged and otherwise ignored: the first request then simply does the work
+itself, and fails there the same way if the error is real.
+"""
+import logging
+import time
+from pathlib import Path
+
+from django.apps import apps
+from django.db import connections
+from django.http import HttpRequest
+from django.template import TemplateSyntaxError
+from django.template.loader import get_template, render_to_string
+from django.urls import get_resolver, reverse
+
+logger = logging.getLogger(__name__)
+
+
+def templates():
+    """Names of the value app's templates."""
+    root = Path(apps.get_app_config('value').path) / 'templates'
+    return sorted(path.relative_to(root).as_posix() for path in root.rglob('*.html'))
+
+
+def compile_templates():
+    compiled = 0
+    for name in templates():
+        try:
+            get_template(name)  # kept compiled by the cached loader
+        except TemplateSyntaxError:
+            logger.exception("Template %s does not compile", name)
+        else:
+            compiled += 1
+    return compiled
+
+
+def load_urls():
+    resolver = get_resolver()
+    resolver.url_patterns  # imports the URLconf and every views module it names
+    reverse('value:home')  # builds the reverse lookup for all patterns, admin included
+    return len(resolver.reverse_dict) + sum(len(sub.reverse_dict) for _, sub in resolver.namespace_dict.values())
+
+
+def render_dashboard():
+    """Render the dashboard home once: forms, template filters, version counters and fragments."""
+    from django.contrib.auth.models import AnonymousUser
+
+    from .views import get_dashboard_common_context
+
+    request = HttpRequest()
+    request.method, request.path = 'GET', reverse('value:dashboard_home')
+    request.user = AnonymousUser()
+    context = get_dashboard_common_context()
+    context['active_view'] = 'home'
+    return len(render_to_string('admin/admin_dashboard.html', context, request))
+
+
+def warm_up():
+    """Do the first request's one-off work now. Returns what was done, with timings in ms."""
+    done = {}
+    for step in (load_urls, compile_templates, render_dashboard):
+        started = time.perf_counter()
+        try:
+            result = step()
+        except Exception:  # never keep the worker from starting
+            logger.warning("Skipped warm-up step %s", step.__name__, exc_info=True)
+            result = None
+        done[step.__name__] = (result, round((time.perf_counter() - started) * 1000, 1))
+    connections.close_all()
+    return done